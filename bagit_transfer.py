@@ -1,13 +1,338 @@
 from src.helper_functions import *
 from src.database_functions import *
+from concurrent.futures import ThreadPoolExecutor
 import sys
 import bagit
 import time
 import sqlite3
+import threading
 
 logger = logging.getLogger(__name__)
 
 
+class TransferRegistry:
+    """Tracks the manifest hashes of transfers that are in progress.
+
+    Workers processing different collections at the same time claim a manifest hash
+    before copying so that identical folders can't both pass the duplicate check.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_progress = {}
+
+    def claim(self, manifest_hash: str, folder: str, database: str) -> str:
+        """Returns an error message if the manifest hash matches a recorded or in progress
+        transfer, otherwise claims the hash and returns None.
+        """
+        with self._lock:
+            identical_folders = get_transfers_by_manifest_hash(manifest_hash, database)
+            if len(identical_folders) > 0:
+                return (
+                    f"an identical transfer has been identified with UUID {identical_folders[0][2]} "
+                    + f"and transaction id {identical_folders[0][0]} and original folder title {identical_folders[0][9]}"
+                )
+            if manifest_hash in self._in_progress:
+                return f"an identical transfer is in progress from folder {self._in_progress[manifest_hash]}"
+            self._in_progress[manifest_hash] = folder
+            return None
+
+    def release(self, manifest_hash: str) -> None:
+        """Removes a manifest hash once its transfer is recorded or has failed."""
+        with self._lock:
+            self._in_progress.pop(manifest_hash, None)
+
+
+def group_by_collection(transfers: list) -> dict:
+    """Groups TriggerFiles by primary identifier.
+
+    Transfers in the same collection share the t{count} sequence, so each group
+    must be processed in order by a single worker.
+    """
+    groups = {}
+    for tf in transfers:
+        metadata = tf.get_metadata()
+        primary_id = None
+        if metadata is not None:
+            # guess_primary_id sorts a list in place, which would reorder the
+            # identifiers written to bag-info.txt
+            identifiers = metadata.get(PRIMARY_ID)
+            if isinstance(identifiers, list):
+                identifiers = list(identifiers)
+            primary_id = guess_primary_id(identifiers)
+        groups.setdefault(primary_id, []).append(tf)
+    return groups
+
+
+def process_collection(
+    transfers: list, config: dict, registry: TransferRegistry
+) -> None:
+    """Processes the transfers for a single collection one after another. An unexpected
+    error in one transfer is recorded on its trigger file and the rest still run."""
+    for tf in transfers:
+        try:
+            process_trigger_file(tf, config, registry)
+        except Exception as e:
+            logger.error(f"Unexpected error processing {tf.get_directory()}: {e}")
+            tf.set_error(f"Unexpected error processing transfer: {e}")
+
+
+def process_trigger_file(
+    tf: TriggerFile, config: dict, registry: TransferRegistry
+) -> bool:
+    """Bags, copies and records a single validated transfer. Returns True if the transfer
+    was recorded in the database.
+
+    Keyword arguments:
+    tf -- a validated TriggerFile
+    config -- loaded configuration, see load_config
+    registry -- shared record of in progress transfers
+    """
+    archive_dir = config.get("ARCHIVE_DIR")
+    database = config.get("DATABASE")
+    transfer_start = datetime.now()
+    # generate and add a random uuid as External-Identifier
+    metadata = tf.get_metadata()
+    folder = tf.get_directory()
+    if metadata is None:
+        logger.error(f"Error moving bag: metadata could not be generated or read.")
+        tf.set_error(
+            f"Error moving bag to preservation directory: metadata could not be generated or read."
+        )
+        return False
+
+    if get_boolean_config(config.get("STREAM_TRANSFERS")) and tf.can_stream():
+        return stream_new_transfer(tf, transfer_start, config, registry)
+
+    # make a bag
+    try:
+        bag = tf.make_bag()
+    except Exception as e:
+        logger.error(f"Error processing bag: {e}")
+        tf.set_error(f"Error processing bag: {e}")
+        return False
+
+    # check if bag is valid before moving.
+    if not tf.check_bag(bag):
+        logger.error("Bag validation failed.")
+        tf.set_error(f"Bag is invalid. See logfile for more details.")
+        return False
+
+    # Primary id for filing
+    primary_id = guess_primary_id(bag.info[PRIMARY_ID])
+
+    # Hash manifest for dedupe
+    manifest_hash = compute_manifest_hash(folder)
+
+    # check the transfer is unique
+    if not claim_manifest_hash(tf, registry, manifest_hash, folder, database):
+        return False
+
+    try:
+        # an interrupted copy of the same bag is resumed from its journal
+        bag_uuid = bag.info.get(UUID_ID)
+        if type(bag_uuid) == list:
+            bag_uuid = ";".join(bag_uuid)
+        output_folder = reserve_output_folder(tf, primary_id, config, bag_uuid)
+        if output_folder is None:
+            return False
+        output_dir = os.path.join(archive_dir, output_folder)
+        try:
+            journal = CopyJournal(get_journal_path(config, output_folder), bag_uuid)
+        except (ValueError, OSError) as e:
+            logger.error(f"Error opening copy journal for {output_dir}: {e}")
+            tf.set_error(f"Error opening copy journal for {output_dir}: {e}")
+            return False
+
+        # copy folder to output directory
+        if not process_transfer(folder, output_dir, journal=journal):
+            logger.error(f"Failed to copy {folder} to {output_dir}.")
+            tf.set_error(
+                f"Failed to copy {folder} to {output_dir}. Rerun the transfer to resume copying."
+            )
+            return False
+
+        # check copied bag is valid and if so update database
+        try:
+            validate_copied_bag(output_dir, journal)
+        except bagit.BagError as e:
+            logger.error(f"Transferred bag was invalid: {e}")
+            tf.set_error(
+                f"Transferred bag {folder} was invalid. Files that failed verification will be copied again if the transfer is rerun. \n See logfile for details."
+            )
+            return False
+        recorded = record_transfer(
+            tf, bag, output_folder, primary_id, manifest_hash, transfer_start, config
+        )
+        if recorded:
+            journal.remove()
+        return recorded
+    finally:
+        registry.release(manifest_hash)
+
+
+def stream_new_transfer(
+    tf: TriggerFile, transfer_start: datetime, config: dict, registry: TransferRegistry
+) -> bool:
+    """Bags an unbagged folder directly into the archive, reading the source once.
+
+    The manifests are only known once the copy is complete, so duplicates are detected
+    after copying and the copy is removed.
+    """
+    archive_dir = config.get("ARCHIVE_DIR")
+    database = config.get("DATABASE")
+    folder = tf.get_directory()
+    primary_id = guess_primary_id(tf.get_metadata().get(PRIMARY_ID))
+    output_folder = reserve_output_folder(tf, primary_id, config)
+    if output_folder is None:
+        return False
+    output_dir = os.path.join(archive_dir, output_folder)
+
+    try:
+        output_bag = tf.stream_bag(output_dir)
+    except Exception as e:
+        logger.error(f"Error streaming bag to {output_dir}: {e}. Removing transferred data.")
+        tf.set_error(f"Error processing bag: {e}")
+        shutil.rmtree(output_dir, ignore_errors=True)
+        return False
+
+    manifest_hash = compute_manifest_hash(output_dir)
+    if not claim_manifest_hash(tf, registry, manifest_hash, folder, database):
+        shutil.rmtree(output_dir, ignore_errors=True)
+        return False
+
+    try:
+        # single read back of the copy to confirm it matches the digests taken in transit
+        try:
+            output_bag.validate()
+        except bagit.BagValidationError as e:
+            logger.error(f"Transferred bag was invalid: {e}. Removing transferred data.")
+            tf.set_error(
+                f"Transferred bag {folder} was invalid. Removing transferred data... \n See logfile for details."
+            )
+            shutil.rmtree(output_dir, ignore_errors=True)
+            return False
+        return record_transfer(
+            tf, output_bag, output_folder, primary_id, manifest_hash, transfer_start, config
+        )
+    finally:
+        registry.release(manifest_hash)
+
+
+def claim_manifest_hash(
+    tf: TriggerFile,
+    registry: TransferRegistry,
+    manifest_hash: str,
+    folder: str,
+    database: str,
+) -> bool:
+    """Claims the manifest hash for this transfer, setting an error if it's a duplicate."""
+    try:
+        conflict = registry.claim(manifest_hash, folder, database)
+    except sqlite3.DatabaseError as e:
+        tf.set_error(f"DATABASE READ ERROR -- Failed to check for duplicate transfers: {e}")
+        return False
+    if conflict is not None:
+        logger.error(f"Manifest hash conflict: {conflict} matches this transfer.")
+        tf.set_error(f"Folder is a duplicate -- {conflict}.")
+        return False
+    return True
+
+
+def get_journal_path(config: dict, output_folder: str) -> str:
+    """Returns the copy journal location for an output folder. Journals are kept in
+    JOURNAL_DIR, or a journals folder next to the transfers database."""
+    journal_dir = config.get("JOURNAL_DIR")
+    if journal_dir is None:
+        journal_dir = os.path.join(os.path.dirname(config.get("DATABASE")), "journals")
+    return os.path.join(journal_dir, f"{output_folder}.journal")
+
+
+def reserve_output_folder(
+    tf: TriggerFile, primary_id: str, config: dict, bag_uuid: str = None
+) -> str:
+    """Creates the next t{count} folder for the collection and returns its path relative
+    to the archive directory, or None if it can't be created.
+
+    If the folder already exists it is only reused when it has a copy journal for the
+    same bag_uuid, so an interrupted transfer can be resumed. A journal left behind for a
+    folder that no longer exists is removed, as none of the files it lists are in place.
+    """
+    # Get transfer index
+    try:
+        count = get_count_collections_processed(primary_id, config.get("DATABASE"))
+    except Exception as e:
+        return None
+    count += 1
+
+    # Build output folder path
+    output_folder = os.path.join(
+        os.path.basename(os.path.normpath(primary_id)), f"t{count}"
+    )
+
+    # this is the archive directory relative location written to db
+    output_dir = os.path.join(config.get("ARCHIVE_DIR"), output_folder)
+
+    # Test for existing directory
+    logger.info("Testing to see if output folder exists.")
+    journal_path = get_journal_path(config, output_folder)
+    if not os.path.exists(output_dir):
+        if os.path.isfile(journal_path):
+            logger.warning(f"Removing stale copy journal {journal_path}")
+            os.remove(journal_path)
+        logger.info(f"Making the output directory {output_dir}")
+        os.makedirs(output_dir)
+        return output_folder
+
+    if bag_uuid is not None and os.path.isfile(journal_path):
+        try:
+            CopyJournal(journal_path, bag_uuid)
+            logger.info(f"Resuming transfer to {output_dir} from journal {journal_path}")
+            return output_folder
+        except ValueError as e:
+            logger.error(f"{e}")
+    logger.error(f"Output directory {output_dir} already exists. Skipping.")
+    tf.set_error(f"Output directory {output_dir} already exists.")
+    return None
+
+
+def record_transfer(
+    tf: TriggerFile,
+    bag: bagit.Bag,
+    output_folder: str,
+    primary_id: str,
+    manifest_hash: str,
+    transfer_start: datetime,
+    config: dict,
+) -> bool:
+    """Inserts a validated transfer into the database and cleans up the original folder."""
+    folder = tf.get_directory()
+    try:
+        insert_transfer(
+            output_folder,
+            bag,
+            primary_id,
+            manifest_hash,
+            transfer_start,
+            datetime.now(),
+            config.get("DATABASE"),
+        )
+    except Exception as e:
+        logger.error(
+            f"Failed to insert transfer for folder {folder} with Collection Identifier {primary_id}: {e}"
+        )
+        tf.set_error(
+            f"DATABASE WRITE ERROR -- Failed to insert transfer for folder {folder} with Collection Identifier {primary_id}: {e}"
+        )
+        return False
+    try:
+        tf.cleanup_transfer(config.get("APPRAISAL_DIR"))
+    except Exception as e:
+        logger.error(f"Error cleaning up transfer: {e}")
+        tf.set_error(f"Failed to clean up transfer folder: {e}")
+    return True
+
+
 def main():
     # load variables
     config = load_config()
@@ -16,6 +341,7 @@ def main():
     archive_dir = config.get("ARCHIVE_DIR")
     appraisal_dir = config.get("APPRAISAL_DIR")
     database = config.get("DATABASE")
+    workers = get_worker_count(config.get("TRANSFER_WORKERS"))
 
     for variable in [logging_dir, transfer_dir, archive_dir, appraisal_dir, database]:
         if variable == None:
@@ -31,7 +357,7 @@ def main():
     logging.basicConfig(
         filename=logfile,
         level=logging.INFO,
-        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        format="%(asctime)s - %(threadName)s - %(name)s - %(levelname)s - %(message)s",
     )
 
     # check that directories are connected.
@@ -58,130 +384,25 @@ def main():
     # set up database
     try:
         configure_transfer_db(database)
-    except sqlite3.OperationalError as e:
+    except sqlite3.DatabaseError as e:
         print(f"Error configuring database: {e}")
 
-    with get_db_connection(database) as con:
-        cur = con.cursor()
-
-        for tf in valid_transfers:
-            transfer_start = datetime.now()
-            # generate and add a random uuid as External-Identifier
-            metadata = tf.get_metadata()
-            folder = tf.get_directory()
-            if metadata is not None:
-                # make a bag
-                try:
-                    bag = tf.make_bag()
-                except Exception as e:
-                    logger.error(f"Error processing bag: {e}")
-                    tf.set_error(f"Error processing bag: {e}")
-                    continue
-
-                # check if bag is valid before moving.
-                if not bag.is_valid():
-                    logger.error("Bag validation failed.")
-                    tf.set_error(f"Bag is invalid. See logfile for more details.")
-                    continue
-
-                # Primary id for filing
-                primary_id = guess_primary_id(bag.info[PRIMARY_ID])
-
-                # Hash manifest for dedupe
-                manifest_hash = compute_manifest_hash(folder)
-
-                # check the transfer is unique
-                results = cur.execute(
-                    "SELECT * FROM transfers WHERE ManifestSHA256Hash=:id",
-                    {"id": manifest_hash},
-                )
-                identical_folders = results.fetchall()
-                if len(identical_folders) > 0:
-                    logger.error(
-                        f"Manifest hash conflict: transfer with UUID {identical_folders[0][2]} and "
-                        + f"transaction id {identical_folders[0][0]} and original folder title {identical_folders[0][9]} matches this transfer."
-                    )
-                    tf.set_error(
-                        f"Folder is a duplicate -- an identical transfer has been identified with UUID {identical_folders[0][2]} "
-                        + f"and transaction id {identical_folders[0][0]} and original folder title {identical_folders[0][9]}."
-                    )
-                    continue
-
-                # Get transfer index
-                try:
-                    count = get_count_collections_processed(primary_id, database)
-                except Exception as e:
-                    continue
-                count += 1
-
-                # Build output folder path
-                output_folder = os.path.join(
-                    os.path.basename(os.path.normpath(primary_id)), f"t{count}"
-                )
-
-                # this is the archive directory relative location written to db
-                output_dir = os.path.join(archive_dir, output_folder)
-
-                # Test for existing directory
-                logger.info("Testing to see if output folder exists.")
-                if not os.path.exists(output_dir):
-                    logger.info(f"Making the output directory {output_dir}")
-                    os.makedirs(output_dir)
-                else:
-                    logger.error(
-                        f"Output directory {output_dir} already exists. Skipping."
-                    )
-                    tf.set_error(f"Output directory {output_dir} already exists.")
-                    continue
-
-
-                # copy folder to output directory
-                process_transfer(folder, output_dir)
-
-                output_bag = bagit.Bag(output_dir)
-
-                # check copied bag is valid and if so update database
-                try:
-                    output_bag.validate()
-                    try:
-                        insert_transfer(
-                            output_folder,
-                            bag,
-                            primary_id,
-                            manifest_hash,
-                            transfer_start,
-                            datetime.now(),
-                            database,
-                        )
-                    except Exception as e:
-                        logger.error(
-                            f"Failed to insert transfer for folder {folder} with Collection Identifier {primary_id}: {e}"
-                        )
-                        tf.set_error(
-                            f"DATABASE WRITE ERROR -- Failed to insert transfer for folder {folder} with Collection Identifier {primary_id}: {e}"
-                        )
-                        continue
-                    try:
-                        tf.cleanup_transfer(appraisal_dir)
-                    except Exception as e:
-                        logger.error(f"Error cleaning up transfer: {e}")
-                        tf.set_error(f"Failed to clean up transfer folder: {e}")
-                except bagit.BagValidationError as e:
-                    logger.error(
-                        "Transferred bag was invalid. Removing transferred data."
-                    )
-                    tf.set_error(
-                        f"Transferred bag {folder} was invalid. Removing transferred data... \n See logfile for details."
-                    )
-                    os.rmdir(output_dir)
-                    continue
-            else:
-                logger.error(
-                    f"Error moving bag: metadata could not be generated or read."
-                )
-                tf.set_error(
-                    f"Error moving bag to preservation directory: metadata could not be generated or read."
-                )
+    # collections are processed concurrently, transfers within a collection in order
+    registry = TransferRegistry()
+    groups = group_by_collection(valid_transfers)
+    logger.info(f"Processing {len(groups)} collections with {workers} workers.")
+    with ThreadPoolExecutor(
+        max_workers=workers, thread_name_prefix="transfer"
+    ) as executor:
+        futures = {
+            executor.submit(process_collection, transfers, config, registry): primary_id
+            for primary_id, transfers in groups.items()
+        }
+        for future, primary_id in futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                logger.error(f"Unexpected error processing collection {primary_id}: {e}")
     runfile_cleanup(database_dir)
 
 
@@ -1,32 +1,84 @@
 import os
+import csv
+import itertools
 import pandas as pd
 import logging
-import hashlib
 from time import strftime
-import json
 import sys
-from src.helper_functions import load_config
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from src.helper_functions import load_config, get_worker_count, get_hash_cache, hash_file_cached
 
 
-def getHash(path, root):
-    hasher = hashlib.new('MD5')
+# recorded instead of a hash for a report entry with no file, which check_completeness reports
+MISSING_FILE = "File not found"
+
+def getHash(path, root, cache=None):
     location = os.path.join(root,path)
     try:
-        with open(location, "rb") as f:
-            while True:
-                block = f.read((512 * 1024))
-                if not block:
-                    break
-                hasher.update(block)
-        outcome = hasher.hexdigest()
+        outcome = hash_file_cached(location, ["md5"], cache)["md5"]
+    except FileNotFoundError:
+        outcome = MISSING_FILE
     except Exception as e:
         outcome = f"Error getting hash: {e}"
     return outcome
 
+# columns read from DROID reports, any others are ignored
+DROID_COLUMNS = ["ID","PARENT_ID","URI","FILE_PATH","NAME","METHOD","STATUS","SIZE","TYPE","EXT","LAST_MODIFIED","EXTENSION_MISMATCH","MD5_HASH"]
+CATEGORY_COLUMNS = ["METHOD","STATUS","TYPE","EXT","EXTENSION_MISMATCH"]
+NUMERIC_COLUMNS = ["ID","PARENT_ID","SIZE"]
+
+def get_hashes(paths, root, workers=1):
+    """Hashes each path with getHash, in the same order as paths.
+    hashlib releases the GIL while hashing so files are read and hashed on a thread pool.
+    Digests are shared with bagging and validation through the hash cache, if configured."""
+    cache = get_hash_cache()
+    if workers <= 1:
+        hashes = [getHash(path, root, cache) for path in paths]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            hashes = list(executor.map(lambda path: getHash(path, root, cache), paths))
+    if cache is not None:
+        cache.flush()
+    return hashes
+
+def check_completeness(report_paths, directory, report_name):
+    """Compares files on disk with the paths listed in a DROID report in a single pass.
+
+    Report paths are indexed once by their path relative to the directory, counting
+    duplicates, and each file found on disk is looked up in that index. Returns a list
+    of errors for files on disk that aren't in the report and for report entries with
+    no matching file.
+
+    Keyword arguments:
+    report_paths -- file paths from the report, already mapped to the current directory
+    directory -- the folder the report describes
+    report_name -- file name of the report itself, which isn't expected in the report
+    """
+    expected = Counter(
+        os.path.normcase(os.path.relpath(os.path.normpath(p), directory))
+        for p in report_paths
+    )
+    errors = []
+    for root, directories, files in os.walk(directory):
+        for f in files:
+            path = os.path.relpath(os.path.join(root, f), directory)
+            # don't check the droid report
+            if path == report_name:
+                continue
+            key = os.path.normcase(path)
+            if expected[key] > 0:
+                expected[key] -= 1
+            else:
+                errors.append(f"Manifest does not contain file: {path}")
+    for path, count in expected.items():
+        if count > 0:
+            errors.append(f"Manifest lists file not found in folder: {path}")
+    return errors
+
 def check_droid_headers(current_headers: list) -> bool:
-    expected = ["ID","PARENT_ID","URI","FILE_PATH","NAME","METHOD","STATUS","SIZE","TYPE","EXT","LAST_MODIFIED","EXTENSION_MISMATCH","MD5_HASH"]
     missing = []
-    for c in expected:
+    for c in DROID_COLUMNS:
                 if c not in current_headers:
                     missing.append(c)
     if len(missing) > 0:
@@ -91,40 +143,40 @@ def make_ok_file(directory, transfer_dir):
         make_error_file(directory, transfer_dir, "Error making ok file")
     
 
-def handle_irregular_csv(file):
-    # this is a bit hackey :(
-    with open(file, 'r', encoding='utf-8') as f:
-        longest = 0
-        # split assuming we have quoated data and commas
-        data = [line.split('","') for line in f]
-
-        # find the longest line
-        for line in data:
-            if len(line) > longest:
-                longest = len(line)
-
-        # tidy column names
-        col_names = [x.replace('"',"").replace("\n","") for x in data[0]]
-
-        # add column names for extra columns
-        for i in range(len(col_names),longest):
-            col_names.append(f"Column {i+1}")
-        data[0] = col_names
-
-        # add blank entries for any other short columns
-        for i in range(len(data)):
-            if len(data[i]) < longest:
-                to_add = [""] * (longest - len(data[i]))
-                data[i].extend(to_add)   
-        col_names = data[0]
-        data = data[1:]
-
-        # create indexed dictionary and load dataframe
-        total = {}
-        for i in range(longest):
-            total.update({str(i):data[i]})
-        df = pd.DataFrame.from_dict(total, orient="index", columns=col_names)
-        return df
+def read_droid_report(csv_file, chunk_size=100000):
+    """Reads a DROID report with the csv module and yields DataFrames of at most
+    chunk_size rows, so memory use doesn't grow with the size of the report.
+
+    Only the columns in DROID_COLUMNS that are in the header are kept. Rows with extra
+    columns, which DROID adds for files with multiple identifications, are truncated and
+    short rows are padded. Low-cardinality columns are stored as categories and numeric
+    columns as nullable integers. The index continues across chunks.
+    """
+    logging.info(f"Checking report: {csv_file}")
+    with open(csv_file, "r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        columns = [c for c in DROID_COLUMNS if c in header]
+        indexes = [header.index(c) for c in columns]
+        start = 0
+        while True:
+            rows = list(itertools.islice(reader, chunk_size))
+            if not rows:
+                break
+            data = {
+                c: [row[i] if i < len(row) else "" for row in rows]
+                for c, i in zip(columns, indexes)
+            }
+            chunk = pd.DataFrame(data, index=range(start, start + len(rows)))
+            for c in columns:
+                if c in CATEGORY_COLUMNS:
+                    chunk[c] = chunk[c].astype("category")
+                elif c in NUMERIC_COLUMNS:
+                    chunk[c] = pd.to_numeric(chunk[c], errors="coerce").astype("Int64")
+            start += len(rows)
+            yield chunk
 
 def load_directories(dir):
     if dir is None:
@@ -146,27 +198,13 @@ def load_directories(dir):
     logging.info("Final list of directories to be processed: " + ", ".join(dir_list))
     return dir_list
 
-def load_csv(csv_file):
-    readerror = False
-    logging.info(f"Checking report: {csv_file}")
-    try:
-        df = pd.read_csv(csv_file)
-    except Exception as e:
-        logging.error(f"Error parsing as dataframe: {e}")
-        readerror = True
-        #continue
-    
-    if readerror:
-        df = handle_irregular_csv(csv_file)
-
-    return df
-
 def main():
     config = load_config()
     transfer_dir = config.get("TRANSFER_DIR")
     logging_dir = config.get("LOGGING_DIR")
     output_directory = config.get("REPORT_DIR")
     droid_output_dir = config.get("DROID_OUTPUT_DIR")
+    hash_workers = get_worker_count(config.get("DROID_HASH_WORKERS"), 4)
 
     logfilename = f"{strftime('%Y%m%d')}_check_DROID_report.log"
     logfile = os.path.join(logging_dir, logfilename)
@@ -202,77 +240,89 @@ def main():
         for r in droid_report:
             logging.info(f"Processing droid report: {r}")
             csv_file = os.path.join(dir,r)
-            df = load_csv(csv_file)
-            
+            chunks = read_droid_report(csv_file)
+            first = next(chunks, None)
+
             # validate as a DROID report by checking expected headers
-            cols = df.head()
-            if not check_droid_headers(cols):
+            if first is None or not check_droid_headers(first):
+                chunks.close()
                 continue
 
             # DROID report store absolute paths at time of generation
             # script tries to find a legit path to the files
-            root_path = df.iloc[0].FILE_PATH
-            # drop folders
-            files_only = df[df["TYPE"]!="Folder"]
-            rows = len(files_only.index)
-            logging.info(f"Dropping folders - reducing manifest size from {len(df.index)} to {rows}, ")
-            # drop items inside archive formats
-            files_only = files_only[files_only["URI"].str.startswith("file")]
-            logging.info(f"Dropping files within archive formats - reducing manifest size from {rows} to {len(files_only.index)}")
-            example_file = files_only.iloc[0].FILE_PATH
-
-            try:
-                to_replace = find_folder_path(root_path, example_file, dir)
-            except Exception as e:
-                make_error_file(dir, transfer_dir,f"Error: {e} - have files been renamed?")
-                logging.error(f"Error: {e} - have files been renamed?")
-                continue
-            name = os.path.basename(os.path.normpath(dir))
-            files_only.loc[:,'CHECKED_PATH'] = files_only.loc[:,"FILE_PATH"].str.replace(to_replace,dir)
-
-            ## Check all the files in storage are in Droid report. 
-            for root, directory, files in os.walk(dir):
-                name_data = files_only.NAME.copy().to_list()
-                for f in files:
-                    # don't check the droid report
-                    if f == r:
-                        continue
-                    elif f not in name_data:
-                        errors.append(f"Manifest does not contain file: {f}")
-                    else:
-                        name_data.remove(f)
-
-
-            fdf = files_only
-
-            # generate hashes of files in current locations
-            fdf['CURRENT_MD5'] = fdf['CHECKED_PATH'].apply(lambda x: getHash(x, dir))
-
-            # compare generated hashes against existing
-            fdf['STILL_VALID'] = (fdf['MD5_HASH']==fdf['CURRENT_MD5'])
-
-            # filter to relevant fields for report
-            df2 = fdf.loc[:,['STILL_VALID','FILE_PATH', 'MD5_HASH', 'CURRENT_MD5', 'CHECKED_PATH']]
-            df2_error = df2[df2['STILL_VALID']==False]
-
-            # generate reports and write to file.
+            root_path = first.iloc[0].FILE_PATH
             name, ext = os.path.splitext(r)
             all_file = os.path.join(report_dir, f'{name}_all_{strftime("%Y-%m-%d")}.csv')
-            df2.to_csv(all_file)
-            print("Report written to: " + all_file)
-            if len(df2_error) > 0 or len(errors) > 0:
+            read_error_file = os.path.join(report_dir, f'{name}_error_read_{strftime("%Y-%m-%d")}.csv')
+            match_error_file = os.path.join(report_dir, f'{name}_error_match_{strftime("%Y-%m-%d")}.csv')
+            written = set()
+            to_replace = None
+            checked_paths = []
+            total_rows = 0
+            file_rows = 0
+            read_errors = 0
+            match_errors = 0
+            folder_error = None
+
+            # hash and write the report a chunk at a time
+            for chunk in itertools.chain([first], chunks):
+                total_rows += len(chunk.index)
+                # drop folders and items inside archive formats
+                fdf = chunk[(chunk["TYPE"] != "Folder") & chunk["URI"].str.startswith("file")]
+                if fdf.empty:
+                    continue
+                file_rows += len(fdf.index)
+
+                if to_replace is None:
+                    example_file = fdf.iloc[0].FILE_PATH
+                    try:
+                        to_replace = find_folder_path(root_path, example_file, dir)
+                    except Exception as e:
+                        folder_error = e
+                        break
+                fdf = fdf.assign(CHECKED_PATH=fdf["FILE_PATH"].str.replace(to_replace, dir, regex=False))
+                checked_paths.extend(fdf['CHECKED_PATH'])
+
+                # generate hashes of files in current locations
+                fdf['CURRENT_MD5'] = get_hashes(fdf['CHECKED_PATH'].to_list(), dir, hash_workers)
+
+                # compare generated hashes against existing
+                fdf['STILL_VALID'] = (fdf['MD5_HASH']==fdf['CURRENT_MD5'])
+
+                # filter to relevant fields for report and append to the report files
+                df2 = fdf.loc[:,['STILL_VALID','FILE_PATH', 'MD5_HASH', 'CURRENT_MD5', 'CHECKED_PATH']]
+                # missing files are reported once, by check_completeness
+                df2_error = df2[(df2['STILL_VALID']==False) & (df2['CURRENT_MD5']!=MISSING_FILE)]
                 df2_read_error = df2_error[df2_error['CURRENT_MD5'].str.startswith("Error")]
                 df2_match_error = df2_error[~df2_error['CURRENT_MD5'].str.startswith("Error")]
-                read_error_file = os.path.join(report_dir, f'{name}_error_read_{strftime("%Y-%m-%d")}.csv')
-                match_error_file = os.path.join(report_dir, f'{name}_error_match_{strftime("%Y-%m-%d")}.csv')
-                if (len(df2_read_error) > 0):
-                    df2_read_error.to_csv(read_error_file)
+                read_errors += len(df2_read_error.index)
+                match_errors += len(df2_match_error.index)
+                for df_out, out_file in [(df2, all_file), (df2_read_error, read_error_file), (df2_match_error, match_error_file)]:
+                    if len(df_out.index) > 0 or (out_file == all_file and out_file not in written):
+                        df_out.to_csv(out_file, mode="a" if out_file in written else "w", header=out_file not in written)
+                        written.add(out_file)
+
+            chunks.close()
+            if folder_error is not None:
+                make_error_file(dir, transfer_dir,f"Error: {folder_error} - have files been renamed?")
+                logging.error(f"Error: {folder_error} - have files been renamed?")
+                continue
+            logging.info(f"Dropping folders and files within archive formats - reducing manifest size from {total_rows} to {file_rows}")
+
+            ## Check all the files in storage are in Droid report and the reverse.
+            errors.extend(check_completeness(checked_paths, dir, r))
+
+            if all_file in written:
+                print("Report written to: " + all_file)
+            else:
+                logging.info(f"No files listed in {r}, so no report was written.")
+            if read_errors > 0 or match_errors > 0 or len(errors) > 0:
+                if read_errors > 0:
                     logging.warning(f"Read errors identified.")
                     errors.append("Read errors identified.")
                 else:
                     logging.warning("No read errors identified")
-                if (len(df2_match_error) > 0):
-                    df2_match_error.to_csv(match_error_file)
+                if match_errors > 0:
                     logging.warning("File match errors identified.")
                     errors.append("File match errors identified")
                 else:
@@ -0,0 +1,53 @@
+import logging
+from src.shared_constants import *
+from src.export_functions import *
+from src.helper_functions import *
+
+logger = logging.getLogger(__name__)
+
+"""
+Exports the Transfers and ValidationOutcome tables to chunked CSV, JSON Lines and, if
+pyarrow is installed, Parquet files for analysis. Each run only writes rows added since
+the previous run. Pass --full to export everything again.
+"""
+
+
+def main():
+    # load variables
+    config = load_config()
+    logging_dir = config.get("LOGGING_DIR")
+    transfer_db = config.get("DATABASE")
+    validation_db = config.get("VALIDATION_DB")
+    export_dir = config.get("EXPORT_DIR")
+    if export_dir is None:
+        export_dir = os.path.join(config.get("REPORT_DIR"), "exports")
+
+    logfilename = f"{time.strftime('%Y%m%d')}_export_history.log"
+    logfile = os.path.join(logging_dir, logfilename)
+    logging.basicConfig(
+        filename=logfile,
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    database_dir = os.path.dirname(transfer_db)
+    runfile_check(database_dir)
+
+    formats = get_export_formats(config.get("EXPORT_FORMATS"))
+    try:
+        exported = export_history(
+            {"transfer": transfer_db, "validation": validation_db},
+            export_dir,
+            formats,
+            incremental="--full" not in sys.argv,
+        )
+        for table, count in exported.items():
+            print(f"Exported {count} rows from {table} to {export_dir}")
+    except Exception as e:
+        logger.error(f"Failed to export history to {export_dir}: {e}")
+
+    runfile_cleanup(database_dir)
+
+
+if __name__ == "__main__":
+    main()
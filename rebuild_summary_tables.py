@@ -0,0 +1,40 @@
+import logging
+from src.shared_constants import *
+from src.database_functions import *
+from src.helper_functions import *
+
+logger = logging.getLogger(__name__)
+
+"""
+Recalculates the transfer summary tables from the Transfers table. The tables are kept
+up to date as transfers are recorded, so this is only needed if they have been edited
+or the Transfers table has been changed by hand.
+"""
+
+
+def main():
+    # load variables
+    config = load_config()
+    logging_dir = config.get("LOGGING_DIR")
+    transfer_db = config.get("DATABASE")
+
+    logfilename = f"{time.strftime('%Y%m%d')}_rebuild_summary_tables.log"
+    logfile = os.path.join(logging_dir, logfilename)
+    logging.basicConfig(
+        filename=logfile,
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    database_dir = os.path.dirname(transfer_db)
+    runfile_check(database_dir)
+
+    configure_transfer_db(transfer_db)
+    rebuild_summary_tables(transfer_db)
+    print(f"Summary tables rebuilt in: {transfer_db}")
+
+    runfile_cleanup(database_dir)
+
+
+if __name__ == "__main__":
+    main()
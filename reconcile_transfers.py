@@ -0,0 +1,60 @@
+import os
+import sqlite3
+from src.helper_functions import *
+from src.database_functions import *
+from src.report_functions import *
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    # load variables
+    config = load_config()
+    logging_dir = config.get("LOGGING_DIR")
+    archive_dir = config.get("ARCHIVE_DIR")
+    validation_db = config.get("VALIDATION_DB")
+    transfer_db = config.get("DATABASE")
+    report_dir = config.get("REPORT_DIR")
+
+    database_dir = os.path.dirname(transfer_db)
+    runfile_check(database_dir)
+
+    logfilename = f"{time.strftime('%Y%m%d')}_bagit_reconciliation.log"
+    logfile = os.path.join(logging_dir, logfilename)
+    logging.basicConfig(
+        filename=logfile,
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    try:
+        configure_transfer_db(transfer_db)
+        configure_validation_db(validation_db)
+    except sqlite3.OperationalError as e:
+        print(f"Error configuring database: {e}")
+        runfile_cleanup(database_dir)
+
+    # compare bag metadata with the transfers database without hashing anything
+    validation_action_id, failed = reconcile_archive(
+        validation_db, transfer_db, archive_dir
+    )
+
+    # only passing bags are counted, so a report is only worth writing for failures
+    if failed > 0:
+        report = Report(ValidationReport())
+        report_date = time.strftime("%Y%m%d")
+        html = report.build_basic_report(validation_db, validation_action_id)
+
+        report_file = os.path.join(report_dir, f"reconciliation_report_{report_date}.html")
+        try:
+            with open(report_file, "a") as f:
+                f.write(html)
+                print(f"Reconciliation report written to: {report_file}")
+        except Exception as e:
+            logger.error(f"Failed to write report file to {report_file}: {e}")
+
+    runfile_cleanup(database_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -45,17 +45,16 @@ def main():
 
     transfer_tables = ["Collections", "Transfers"]
     validation_tables = ["ValidationActions", "ValidationOutcome"]
-    html = dump_database_tables_to_html(
-        db_paths={"transfer": transfer_db, "validation": validation_db},
-        db_tables={"transfer": transfer_tables, "validation": validation_tables},
-    )
-
-    report_file = os.path.join(report_dir, "full_data_dump.html")
+    output_dir = os.path.join(report_dir, "full_data_dump")
     try:
-        with open(report_file, "a") as f:
-            f.write(html)
+        index = dump_database_tables_to_html_pages(
+            output_dir,
+            db_paths={"transfer": transfer_db, "validation": validation_db},
+            db_tables={"transfer": transfer_tables, "validation": validation_tables},
+        )
+        print(f"Database dump written to: {index}")
     except Exception as e:
-        logger.error(f"Failed to write report file to {report_file}: {e}")
+        logger.error(f"Failed to write database dump to {output_dir}: {e}")
 
     runfile_cleanup(database_dir)
 
@@ -74,10 +74,21 @@ def main():
     database_dir = os.path.dirname(transfer_db)
     runfile_check(database_dir)
 
+    # bring a database made by an earlier version up to date, the report reads newer columns
+    try:
+        configure_transfer_db(transfer_db)
+    except sqlite3.DatabaseError as e:
+        logger.error(f"Error configuring database: {e}")
+        runfile_cleanup(database_dir)
+
     # Build transfer report
     report_builder = Report(TransferReport())
 
     html = report_builder.build_report_between(transfer_db, start_date, end_date)
+    summary = report_builder.report_type.build_summary_between(
+        transfer_db, start_date[:7], end_date[:7]
+    )
+    html = html.replace("<body>", f"<body>{summary}", 1)
 
     transfer_report_filename = f"{report_title}_quarterly_transfer_report.html"
     transfer_report_file = os.path.join(
@@ -98,12 +109,36 @@ def main():
         print(f"Error configuring database: {e}")
         runfile_cleanup(database_dir)
 
-    # run validation process and get id for report
-    validation_action_id = run_validation(validation_db, transfer_db, archive_dir)
-
-    # build a basic report and output to html.
+    # reuse validation already done in the quarter unless configured otherwise
+    validation_mode = get_quarterly_validation_mode(config.get("QUARTERLY_VALIDATION"))
+    validation_action_id = None
+    if validation_mode != "full":
+        validation_action_id = get_latest_validation_action(
+            start_date, end_date, validation_db
+        )
+        if validation_action_id is not None:
+            logging.info(f"Reusing validation action {validation_action_id} for report")
+
+    # the report window ends with the quarter unless validation is run now, after it ends
+    report_end_date = end_date
+    if validation_action_id is None:
+        logging.info("No completed validation in the quarter. Running validation.")
+        report_end_date = datetime.now().strftime("%Y-%m-%d")
+        validation_action_id = run_validation(
+            validation_db,
+            transfer_db,
+            archive_dir,
+            get_fixity_max_age(config.get("FIXITY_MAX_AGE_DAYS")),
+            get_worker_count(config.get("VALIDATION_WORKERS")),
+            get_worker_count(config.get("VALIDATION_PROCESSES")),
+        )
+
+    # build a report and output to html.
     report = Report(ValidationReport())
-    html = report.build_basic_report(validation_db, validation_action_id)
+    if validation_mode == "aggregate":
+        html = report.build_report_between(validation_db, start_date, report_end_date)
+    else:
+        html = report.build_basic_report(validation_db, validation_action_id)
 
     validation_report_filename = f"{report_title}_quarterly_validation_report.html"
     validation_report_file = os.path.join(report_dir, validation_report_filename)
@@ -1,18 +1,35 @@
 import bagit
+import html
+import json
 import sqlite3
+import threading
 import time
 import pandas as pd
 from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from src.shared_constants import *
-from src.helper_functions import validate_bag_at
+from src.helper_functions import (
+    validate_bag_at,
+    check_bag_metadata_at,
+    list_transfer_dirs,
+    parse_payload_oxum,
+    load_config,
+    open_db_connection,
+    FixitySnapshot,
+)
 
 
 class ValidationStatus:
-    def __init__(self, db_path, table_name, transfer_path, archive_dir):
+    def __init__(
+        self, db_path, table_name, transfer_path, archive_dir, fixity=None, processes=1
+    ):
         self.db_path = db_path
         self.table_name = table_name
         self.transfer_path = transfer_path
         self.archive_dir = archive_dir
+        self.fixity = fixity
+        self.processes = processes
         self.bag_uuid = None
         self.errors = []
         self.valid = self._validate()
@@ -42,7 +59,7 @@ class ValidationStatus:
             return False
 
     def _validate_as_bag(self) -> None:
-        baguuid, errors = validate_bag_at(self.transfer_path)
+        baguuid, errors = validate_bag_at(self.transfer_path, self.fixity, self.processes)
         baguuid = ";".join(baguuid)
         if self.bag_uuid is None:
             self.bag_uuid = baguuid
@@ -105,18 +122,162 @@ def get_count_collections_processed(primary_id, db_path):
             raise
 
 
+def get_transfers_by_manifest_hash(manifest_hash, db_path) -> list:
+    """Returns any transfers recorded with the supplied manifest hash."""
+    with get_db_connection(db_path) as con:
+        cur = con.cursor()
+        try:
+            res = cur.execute(
+                "SELECT * FROM transfers WHERE ManifestSHA256Hash=:id",
+                {"id": manifest_hash},
+            )
+            return res.fetchall()
+        except sqlite3.DatabaseError as e:
+            logger.error(f"Error checking for duplicate transfers: {e}")
+            raise
+
+
+# connections are reused within a thread, keyed by database path
+_connections = threading.local()
+
 @contextmanager
 def get_db_connection(db_path):
-    con = sqlite3.connect(db_path)
+    """Provides this thread's connection to a database, opening it on first use.
+
+    The outermost use commits when the block completes and rolls back if it raises, so
+    nested uses share one transaction. Connections aren't shared with forked processes.
+    """
+    if getattr(_connections, "pid", None) != os.getpid():
+        _connections.pid = os.getpid()
+        _connections.open = {}
+    key = os.path.abspath(db_path)
+    if key not in _connections.open:
+        _connections.open[key] = [open_db_connection(db_path), 0]
+    entry = _connections.open[key]
+    con = entry[0]
+    entry[1] += 1
     try:
         yield con
-    except sqlite3.DatabaseError as e:
-        con.rollback()
-        logger.error(f"Database error: {e}")
+    except BaseException as e:
+        if entry[1] == 1:
+            con.rollback()
+        if isinstance(e, sqlite3.DatabaseError):
+            logger.error(f"Database error: {e}")
         raise
+    else:
+        if entry[1] == 1:
+            con.commit()
     finally:
-        con.commit()
+        entry[1] -= 1
+
+
+def close_db_connections():
+    """Closes this thread's cached database connections."""
+    for con, depth in getattr(_connections, "open", {}).values():
         con.close()
+    _connections.open = {}
+
+
+# Running totals of transfers, keyed by the column and the expression over Transfers
+# that groups them. Kept up to date by insert_transfer. Missing values are grouped under
+# an empty string, as NULL keys never conflict so the upsert would add a row each time.
+SUMMARY_TABLES = {
+    "CollectionSummary": ("CollectionIdentifier", "COALESCE(CollectionIdentifier, '')"),
+    "MonthlySummary": ("Month", "COALESCE(substr(TransferDate, 1, 7), '')"),
+    "SourceSummary": ("SourceOrganisation", "COALESCE(SourceOrganisation, '')"),
+}
+
+
+def summary_table_statements(table) -> tuple:
+    """Returns the create, rebuild and per-transfer update statements for a summary table."""
+    key, expression = SUMMARY_TABLES[table]
+    create = f"CREATE TABLE IF NOT EXISTS {table}({key} PRIMARY KEY, TransferCount INT, TotalBytes INT, TotalFiles INT, TotalSeconds REAL)"
+    rebuild = (
+        f"INSERT INTO {table}({key}, TransferCount, TotalBytes, TotalFiles, TotalSeconds) "
+        f"SELECT {expression}, COUNT(*), COALESCE(SUM(PayloadBytes), 0), COALESCE(SUM(PayloadFileCount), 0), TOTAL(DurationSeconds) "
+        f"FROM Transfers GROUP BY {expression}"
+    )
+    update = (
+        f"INSERT INTO {table}({key}, TransferCount, TotalBytes, TotalFiles, TotalSeconds) "
+        f"SELECT {expression}, 1, COALESCE(PayloadBytes, 0), COALESCE(PayloadFileCount, 0), COALESCE(DurationSeconds, 0) "
+        f"FROM Transfers WHERE TransferID=? "
+        f"ON CONFLICT ({key}) DO UPDATE SET TransferCount = TransferCount + 1, "
+        "TotalBytes = TotalBytes + excluded.TotalBytes, TotalFiles = TotalFiles + excluded.TotalFiles, "
+        "TotalSeconds = TotalSeconds + excluded.TotalSeconds"
+    )
+    return (create, rebuild, update)
+
+
+# Schema changes applied after the tables are created. Each entry is a list of
+# statements for one version, tracked with PRAGMA user_version. Only ever append.
+TRANSFER_DB_MIGRATIONS = [
+    [
+        "CREATE INDEX IF NOT EXISTS idx_transfers_manifest_hash ON Transfers(ManifestSHA256Hash)",
+        "CREATE INDEX IF NOT EXISTS idx_transfers_outcome_folder ON Transfers(OutcomeFolderTitle)",
+        "CREATE INDEX IF NOT EXISTS idx_transfers_collection ON Transfers(CollectionIdentifier)",
+        "CREATE INDEX IF NOT EXISTS idx_transfers_transfer_date ON Transfers(TransferDate)",
+    ],
+    [
+        "ALTER TABLE Transfers ADD COLUMN PayloadBytes INTEGER",
+        "ALTER TABLE Transfers ADD COLUMN PayloadFileCount INTEGER",
+        "ALTER TABLE Transfers ADD COLUMN DurationSeconds REAL",
+        "UPDATE Transfers SET "
+        "PayloadBytes = CAST(substr(PayloadOxum, 1, instr(PayloadOxum, '.') - 1) AS INTEGER), "
+        "PayloadFileCount = CAST(substr(PayloadOxum, instr(PayloadOxum, '.') + 1) AS INTEGER) "
+        "WHERE instr(PayloadOxum, '.') > 0",
+        "UPDATE Transfers SET DurationSeconds = ROUND((julianday(EndTime) - julianday(StartTime)) * 86400, 3)",
+    ],
+    [
+        statement
+        for table in SUMMARY_TABLES
+        for statement in summary_table_statements(table)[:2]
+    ],
+]
+
+VALIDATION_DB_MIGRATIONS = [
+    [
+        "CREATE INDEX IF NOT EXISTS idx_outcome_action_uuid ON ValidationOutcome(ValidationActionsId, BagUUID)",
+    ],
+    [
+        # Full actions hash every bag, Reconcile actions only compare metadata
+        "ALTER TABLE ValidationActions ADD COLUMN ActionType DEFAULT 'Full'",
+    ],
+]
+
+
+def migrate_database(database_path, migrations) -> int:
+    """Applies any migrations newer than the database's user_version, each in its own
+    transaction, and returns the resulting version.
+
+    Each step takes the write lock before checking user_version again, so when several
+    scripts start at once only one of them applies a migration and the others skip it.
+
+    Keyword arguments:
+    database_path -- path to the database
+    migrations -- list of lists of SQL statements, one list per version
+    """
+    with get_db_connection(database_path) as con:
+        version = con.execute("PRAGMA user_version").fetchone()[0]
+        while version < len(migrations):
+            number = version + 1
+            try:
+                con.execute("BEGIN IMMEDIATE")
+                current = con.execute("PRAGMA user_version").fetchone()[0]
+                if current >= number:
+                    # applied by another process since user_version was read
+                    con.commit()
+                    version = current
+                    continue
+                for statement in migrations[version]:
+                    con.execute(statement)
+                con.execute(f"PRAGMA user_version = {number:d}")
+                con.commit()
+            except sqlite3.DatabaseError as e:
+                logger.error(f"Error migrating {database_path} to version {number}: {e}")
+                raise
+            logger.info(f"Migrated {database_path} to version {number}")
+            version = number
+    return version
 
 
 def configure_transfer_db(database_path):
@@ -136,6 +297,7 @@ def configure_transfer_db(database_path):
         except sqlite3.OperationalError as e:
             logger.error(f"Error creating table transfers: {e}")
             raise
+    migrate_database(database_path, TRANSFER_DB_MIGRATIONS)
 
 
 def configure_validation_db(database_path):
@@ -155,203 +317,544 @@ def configure_validation_db(database_path):
         except sqlite3.OperationalError as e:
             logger.error(f"Error creating table ValidationOutcome: {e}")
             raise
-
-
-def start_validation(begin_time, db_path):
-    with get_db_connection(db_path) as con:
-        cur = con.cursor()
         try:
             cur.execute(
-                "INSERT INTO ValidationActions(CountBagsValidated, CountBagsWithErrors, StartAction, EndAction, Status) VALUES (?, ?, ?, ?, ?)",
-                (0, 0, begin_time, None, "Running"),
+                "CREATE TABLE IF NOT EXISTS FileFixity(BagPath, FilePath, Size INT, ModifiedNs INT, Inode INT, Digests, LastVerified, PRIMARY KEY (BagPath, FilePath))"
             )
-        except sqlite3.DatabaseError as e:
-            logger.error(f"Error inserting record into ValidationOutcome table: {e}")
-            return None
+        except sqlite3.OperationalError as e:
+            logger.error(f"Error creating table FileFixity: {e}")
+            raise
+    migrate_database(database_path, VALIDATION_DB_MIGRATIONS)
+
+
+def get_latest_validation_action(start, end, db_path):
+    """Returns the identifier of the most recent completed full validation action started
+    between two dates inclusive, in the format YYYY-MM-DD, or None if there isn't one."""
+    with get_db_connection(db_path) as con:
+        result = con.execute(
+            "SELECT ValidationActionsId FROM ValidationActions WHERE Status='Complete' "
+            "AND ActionType='Full' AND StartAction >= ? AND StartAction < date(?, '+1 day') "
+            "ORDER BY StartAction DESC LIMIT 1",
+            (start, end),
+        ).fetchone()
+    if result is None:
+        return None
+    return result[0]
+
+
+# number of FileFixity records read at once while a bag is validated
+FIXITY_LOOKUP_BATCH = 10000
+
+
+class FixityRecords:
+    """Reads a bag's FileFixity records on demand, for FixitySnapshot.
+
+    Validation looks files up in manifest order, so records are read a batch of
+    consecutive paths at a time from the FileFixity primary key. Only one batch is held in
+    memory, so large bags don't load every record at once. Looking up a path outside the
+    current batch reads the batch starting at that path.
+
+    Keyword arguments:
+    bag_path -- bag location relative to the archive directory
+    db_path -- path to the validation database
+    batch_size -- number of records read at once (default 10000)
+    """
+
+    def __init__(self, bag_path, db_path, batch_size=FIXITY_LOOKUP_BATCH):
+        self.bag_path = bag_path
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.batch = {}
+        # range of paths the batch covers, last is None if it runs to the end of the bag
+        self.first = None
+        self.last = None
+
+    def _covers(self, path) -> bool:
+        return (
+            self.first is not None
+            and path >= self.first
+            and (self.last is None or path <= self.last)
+        )
+
+    def _read_from(self, path) -> None:
+        self.batch = {}
+        self.first = path
+        self.last = None
         try:
-            i = cur.execute(
-                "SELECT ValidationActionsId FROM ValidationActions ORDER BY ValidationActionsId DESC"
-            )
-            identifier = i.fetchone()[0]
-            return identifier
+            with get_db_connection(self.db_path) as con:
+                rows = con.execute(
+                    "SELECT FilePath, Size, ModifiedNs, Inode, Digests, LastVerified FROM FileFixity "
+                    "WHERE BagPath=? AND FilePath >= ? ORDER BY FilePath LIMIT ?",
+                    (self.bag_path, path, self.batch_size),
+                ).fetchall()
         except sqlite3.DatabaseError as e:
-            logger.error(f"Error inserting record into ValidationActions table: {e}")
-            return None
+            # nothing is trusted, so every file in the bag is hashed
+            logger.error(f"Error loading fixity records for {self.bag_path}: {e}")
+            return
+        for file_path, size, mtime_ns, inode, digests, last_verified in rows:
+            self.batch[file_path] = {
+                "size": size,
+                "mtime_ns": mtime_ns,
+                "inode": inode,
+                "digests": json.loads(digests),
+                "last_verified": datetime.fromisoformat(last_verified),
+            }
+        if len(rows) == self.batch_size:
+            self.last = rows[-1][0]
 
+    def get(self, path) -> dict:
+        """Returns the record for a file path relative to the bag, or None."""
+        if not self._covers(path):
+            self._read_from(path)
+        return self.batch.get(path)
 
-def end_validation(validation_action_id, end_time, db_path):
-    with get_db_connection(db_path) as con:
-        cur = con.cursor()
+
+def load_fixity_snapshot(bag_path, max_age, db_path) -> FixitySnapshot:
+    """Returns a snapshot of the stat details recorded for a bag's files by earlier
+    validation runs. Records are read as they are needed, see FixityRecords.
+
+    Keyword arguments:
+    bag_path -- bag location relative to the archive directory
+    max_age -- timedelta after which unchanged files are hashed again
+    db_path -- path to the validation database
+    """
+    return FixitySnapshot(FixityRecords(bag_path, db_path), max_age)
+
+
+def fixity_rows(bag_path, records: dict):
+    """Yields FileFixity rows for FixitySnapshot records."""
+    for file_path, record in records.items():
+        yield (
+            bag_path,
+            file_path,
+            record["size"],
+            record["mtime_ns"],
+            record["inode"],
+            json.dumps(record["digests"]),
+            record["last_verified"].isoformat(sep=" "),
+        )
+
+
+UPSERT_FIXITY = (
+    "INSERT INTO FileFixity(BagPath, FilePath, Size, ModifiedNs, Inode, Digests, LastVerified) VALUES (?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT (BagPath, FilePath) DO UPDATE SET Size=excluded.Size, ModifiedNs=excluded.ModifiedNs, "
+    "Inode=excluded.Inode, Digests=excluded.Digests, LastVerified=excluded.LastVerified"
+)
+
+
+# attempts to write a batch of outcomes to a locked database, and the first delay in seconds
+FLUSH_RETRIES = 3
+FLUSH_RETRY_DELAY = 1
+
+
+class ValidationWriter:
+    """Records a validation action over a single connection to the validation database.
+
+    Outcomes and fixity records are buffered and written in one transaction per batch,
+    together with the change to the action's pass and fail counts, instead of opening a
+    connection and committing for every bag. Use as a context manager so anything still
+    buffered is written and the connection closed.
+
+    Keyword arguments:
+    db_path -- path to the validation database
+    batch_size -- number of buffered outcomes that triggers a write (default 500)
+    fixity_batch_size -- number of buffered fixity rows that triggers a write (default 50000)
+    record_passes -- write an outcome row for bags that pass, otherwise they are only
+    counted (default True)
+    """
+
+    def __init__(self, db_path, batch_size=500, record_passes=True, fixity_batch_size=50000):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.fixity_batch_size = fixity_batch_size
+        self.record_passes = record_passes
+        self.validation_action_id = None
+        self.outcomes = []
+        self.fixity = []
+        self.passed = 0
+        self.failed = 0
+        self.con = open_db_connection(db_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+            return
+        # keep what can still be written, and mark the action so it isn't reported as running
         try:
-            cur.execute(
-                "UPDATE ValidationActions SET EndAction =?, Status='Complete' WHERE ValidationActionsId =?",
-                (
-                    end_time,
-                    validation_action_id,
-                ),
-            )
+            self.flush()
+            with self.con:
+                self.con.execute(
+                    "UPDATE ValidationActions SET EndAction =?, Status='Failed' WHERE ValidationActionsId =?",
+                    (datetime.now(), self.validation_action_id),
+                )
         except sqlite3.DatabaseError as e:
-            logger.error(f"Error inserting record into ValidationOutcome table: {e}")
-            return None
+            logger.error(f"Error marking validation action {self.validation_action_id} failed: {e}")
+        self.con.close()
+
+    def start(self, begin_time, action_type="Full") -> int:
+        """Creates the ValidationActions entry and returns its identifier."""
         try:
-            i = cur.execute(
-                "SELECT ValidationActionsId FROM ValidationActions ORDER BY ValidationActionsId DESC"
-            )
-            identifier = i.fetchone()[0]
-            return identifier
+            with self.con:
+                cur = self.con.execute(
+                    "INSERT INTO ValidationActions(CountBagsValidated, CountBagsWithErrors, StartAction, EndAction, Status, ActionType) VALUES (?, ?, ?, ?, ?, ?)",
+                    (0, 0, begin_time, None, "Running", action_type),
+                )
         except sqlite3.DatabaseError as e:
             logger.error(f"Error inserting record into ValidationActions table: {e}")
             return None
+        self.validation_action_id = cur.lastrowid
+        return self.validation_action_id
 
-
-def insert_validation_outcome(
-    validation_action_id,
-    baguuid,
-    outcome,
-    errors,
-    bag_path,
-    validation_start_time,
-    validation_end_time,
-    db_path,
-):
-    with get_db_connection(db_path) as con:
-        cur = con.cursor()
+    def add_outcome(
+        self, baguuid, outcome, errors, bag_path, validation_start_time, validation_end_time
+    ) -> None:
         if outcome:
-            try:
-                cur.execute(
-                    "UPDATE ValidationActions SET CountBagsValidated = CountBagsValidated + 1 WHERE ValidationActionsId =?",
-                    (validation_action_id,),
-                )
-            except sqlite3.DatabaseError as e:
-                logger.error(
-                    f"Error updating record into ValidationActions table for action {validation_action_id}: {e}"
-                )
+            self.passed += 1
+            if not self.record_passes:
+                return
         else:
+            self.failed += 1
+        self.outcomes.append(
+            (
+                self.validation_action_id,
+                baguuid,
+                "Pass" if outcome else "Fail",
+                errors,
+                bag_path,
+                validation_start_time,
+                validation_end_time,
+            )
+        )
+        if len(self.outcomes) >= self.batch_size:
+            self.flush()
+
+    def add_fixity(self, bag_path, records: dict) -> None:
+        """Buffers a bag's fixity records. A bag with many files is written in several
+        batches, so neither the buffer nor a transaction grows with the size of the bag."""
+        for row in fixity_rows(bag_path, records):
+            self.fixity.append(row)
+            if len(self.fixity) >= self.fixity_batch_size:
+                self.flush()
+
+    def flush(self) -> None:
+        """Writes buffered outcomes, counts and fixity records in one transaction.
+        A locked database is retried with a backoff. If the write still fails the
+        error is raised and nothing buffered is discarded."""
+        if not self.outcomes and not self.fixity and not self.passed:
+            return
+        for attempt in range(FLUSH_RETRIES + 1):
             try:
-                cur.execute(
-                    "UPDATE ValidationActions SET CountBagsWithErrors = CountBagsWithErrors + 1 WHERE ValidationActionsId =?",
-                    (validation_action_id,),
+                with self.con:
+                    self.con.executemany(
+                        "INSERT INTO ValidationOutcome(ValidationActionsId, BagUUID, Outcome, Errors, BagPath, StartTime, EndTime) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        self.outcomes,
+                    )
+                    self.con.execute(
+                        "UPDATE ValidationActions SET CountBagsValidated = CountBagsValidated + ?, CountBagsWithErrors = CountBagsWithErrors + ? WHERE ValidationActionsId =?",
+                        (self.passed, self.failed, self.validation_action_id),
+                    )
+                    self.con.executemany(UPSERT_FIXITY, self.fixity)
+                break
+            except sqlite3.OperationalError as e:
+                if attempt == FLUSH_RETRIES:
+                    logger.error(
+                        f"Error writing {len(self.outcomes)} outcomes for action {self.validation_action_id}: {e}"
+                    )
+                    raise
+                delay = FLUSH_RETRY_DELAY * 2**attempt
+                logger.warning(
+                    f"Error writing outcomes for action {self.validation_action_id}: {e}. Retrying in {delay} seconds."
                 )
+                time.sleep(delay)
             except sqlite3.DatabaseError as e:
                 logger.error(
-                    f"Error updating record into ValidationActions table for action {validation_action_id}: {e}"
+                    f"Error writing {len(self.outcomes)} outcomes for action {self.validation_action_id}: {e}"
                 )
-        outcome = "Pass" if outcome else "Fail"
+                raise
+        self.outcomes = []
+        self.fixity = []
+        self.passed = 0
+        self.failed = 0
+
+    def end(self, end_time) -> None:
+        """Writes anything buffered and marks the validation action complete."""
+        self.flush()
         try:
-            cur.execute(
-                "INSERT INTO ValidationOutcome(ValidationActionsId, BagUUID, Outcome, Errors, BagPath, StartTime, EndTime) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                (
-                    validation_action_id,
-                    baguuid,
-                    outcome,
-                    errors,
-                    bag_path,
-                    validation_start_time,
-                    validation_end_time,
-                ),
-            )
+            with self.con:
+                self.con.execute(
+                    "UPDATE ValidationActions SET EndAction =?, Status='Complete' WHERE ValidationActionsId =?",
+                    (end_time, self.validation_action_id),
+                )
         except sqlite3.DatabaseError as e:
-            logger.error(f"Error inserting record into ValidationOutcome table: {e}")
+            logger.error(f"Error updating record into ValidationActions table: {e}")
+
+    def close(self) -> None:
+        try:
+            self.flush()
+        finally:
+            self.con.close()
+
+
+def get_transfers_not_in(paths, db_path):
+    """Yields transfers whose OutcomeFolderTitle isn't one of the supplied paths.
+
+    The paths are loaded into an indexed temporary table and anti-joined against the
+    transfers table, so any number of paths can be checked without hitting SQLite's
+    limit on query parameters.
+
+    Keyword arguments:
+    paths -- iterable of folder paths relative to the archive directory
+    db_path -- path to the transfers database
+    """
+    with get_db_connection(db_path) as con:
+        cur = con.cursor()
+        cur.execute("DROP TABLE IF EXISTS temp.CheckedPaths")
+        cur.execute("CREATE TEMP TABLE CheckedPaths(Path PRIMARY KEY)")
+        cur.executemany(
+            "INSERT OR IGNORE INTO CheckedPaths(Path) VALUES (?)", ((p,) for p in paths)
+        )
+        result = cur.execute(
+            "SELECT TransferID, BagUUID, OutcomeFolderTitle, OriginalFolderTitle, TransferDate, ContactName "
+            "FROM transfers WHERE OutcomeFolderTitle IS NOT NULL AND NOT EXISTS "
+            "(SELECT 1 FROM CheckedPaths WHERE CheckedPaths.Path = transfers.OutcomeFolderTitle)"
+        )
+        yield from result
+
 
-def run_validation(validation_db, transfer_db, archive_dir) -> str:
+def validate_transfer(
+    transfer_dir, transfer_db, validation_db, archive_dir, fixity_max_age=None, processes=1
+):
+    """Validates a single transfer. Runs in a worker process when validating in parallel,
+    so it returns the outcome for the caller to record rather than writing it.
+
+    Returns a tuple of relative path, bag UUID, outcome, errors, start time, end time and
+    the fixity records of files hashed (empty unless fixity_max_age is set), or None if the
+    transfer isn't a directory.
+
+    Keyword arguments:
+    transfer_dir -- path to the transfer in the archive directory
+    transfer_db -- path to the transfers database
+    validation_db -- path to the validation database, fixity records are read from here
+    archive_dir -- the archive directory
+    fixity_max_age -- optional timedelta for incremental fixity checks
+    processes -- number of files within the bag hashed at once
+    """
+    # start tracking validation time
+    validation_start_time = datetime.now()
+
+    # load what earlier runs recorded about the files in this bag
+    fixity = None
+    if fixity_max_age is not None and os.path.isdir(transfer_dir):
+        fixity = load_fixity_snapshot(
+            os.path.relpath(transfer_dir, archive_dir), fixity_max_age, validation_db
+        )
+
+    # run the validation process
+    try:
+        validation_status = ValidationStatus(
+            transfer_db, "transfers", transfer_dir, archive_dir, fixity, processes
+        )
+    except ValueError as e:
+        logger.error(f"ValueError: {e}")
+        return None
+
+    return (
+        validation_status.get_relative_path(),
+        validation_status.get_bag_uuid(),
+        validation_status.is_valid(),
+        validation_status.get_error_string(),
+        validation_start_time,
+        datetime.now(),
+        fixity.updated if fixity is not None else {},
+    )
+
+
+def run_validation(
+    validation_db, transfer_db, archive_dir, fixity_max_age=None, workers=1, processes=1
+) -> str:
     """Runs a basic validation comparing data in storage vs contents of transfer db
-    and validating all bags."""
+    and validating all bags.
+
+    If fixity_max_age (a timedelta) is supplied, files whose size, modification time and
+    inode are unchanged since they were last hashed within that age are not hashed again.
+
+    Keyword arguments:
+    validation_db -- path to the validation database
+    transfer_db -- path to the transfers database
+    archive_dir -- the archive directory containing collection/transfer folders
+    fixity_max_age -- optional timedelta for incremental fixity checks
+    workers -- number of bags validated at once, each in its own process (default 1)
+    processes -- number of files within each bag hashed at once (default 1)
+    """
     # get list of transfers
-    collections = os.listdir(archive_dir)
+    transfer_dirs = list(list_transfer_dirs(archive_dir))
 
     # add variable to track which paths have been checked in transfers db
     db_paths_checked = set()
 
-    # create the ValidationAction entry here. Get the Primary key to pass to the next function
-    validation_action_begin = datetime.now()
-    validation_action_id = start_validation(validation_action_begin, validation_db)
+    validate = partial(
+        validate_transfer,
+        transfer_db=transfer_db,
+        validation_db=validation_db,
+        archive_dir=archive_dir,
+        fixity_max_age=fixity_max_age,
+        processes=processes,
+    )
 
-    for collection in collections:
-        col_dir = os.path.join(archive_dir, collection)
+    with ValidationWriter(validation_db) as writer:
+        # create the ValidationAction entry here. Get the Primary key to pass to the next function
+        validation_action_begin = datetime.now()
+        validation_action_id = writer.start(validation_action_begin)
 
-        # skip things that are just files in the top-level directory
-        if os.path.isfile(col_dir):
-            continue
-
-        # get a list of subfolders
-        transfers = os.listdir(col_dir)
+        # outcomes are recorded here as bags finish so only this process writes them
+        executor = None
+        if workers > 1 and len(transfer_dirs) > 1:
+            executor = ProcessPoolExecutor(max_workers=min(workers, len(transfer_dirs)))
+            results = executor.map(validate, transfer_dirs)
+        else:
+            results = map(validate, transfer_dirs)
 
-        # iterate through each transfer
-        for transfer in transfers:
+        try:
+            for transfer_dir, result in zip(transfer_dirs, results):
+                if result is None:
+                    continue
+                relative_path, bag_uuid, outcome, errors, start_time, end_time, fixity = (
+                    result
+                )
 
-            # build the path
-            transfer_dir = os.path.join(col_dir, transfer)
+                # update both tables to reflect bag validation outcome.
+                writer.add_outcome(
+                    bag_uuid, outcome, errors, transfer_dir, start_time, end_time
+                )
+                writer.add_fixity(relative_path, fixity)
 
-            # start tracking validation time
-            validation_start_time = datetime.now()
+                # log directory as checked
+                logger.info(f"Checked transfer at {relative_path} with outcome {outcome}")
+                db_paths_checked.add(relative_path)
+        finally:
+            if executor is not None:
+                executor.shutdown()
 
-            # run the validation process
-            try:
-                validation_status = ValidationStatus(
-                    transfer_db, "transfers", transfer_dir, archive_dir
+        # find any transfers in the database that weren't on the filesystem
+        # add a row and validation error for each
+        query_time = datetime.now()
+        unmatched = 0
+        try:
+            for match in get_transfers_not_in(db_paths_checked, transfer_db):
+                unmatched += 1
+                writer.add_outcome(
+                    match[1],
+                    False,
+                    f"Transfer {match[0]} in database but not found on system. Submitted on {match[4]} by {match[5]} in folder {match[3]}.",
+                    match[2],
+                    query_time,
+                    query_time,
                 )
-            except ValueError as e:
-                logger.error(f"ValueError: {e}")
-                continue
+        except Exception as e:
+            logger.error(f"Error connecting to database. {e}")
+        if unmatched == 0:
+            logger.info("No unmatched transfers in database.")
 
-            # assign set variables from validation
-            bag_uuid = validation_status.get_bag_uuid()
-            errors = validation_status.get_error_string()
-            outcome = validation_status.is_valid()
+        validation_action_end = datetime.now()
+        writer.end(validation_action_end)
+    return validation_action_id
 
-            # now the validation process is done
-            validation_end_time = datetime.now()
 
-            # update both tables to reflect bag validation outcome.
-            insert_validation_outcome(
-                validation_action_id,
-                bag_uuid,
-                outcome,
-                errors,
-                transfer_dir,
-                validation_start_time,
-                validation_end_time,
-                validation_db,
-            )
+def reconcile_archive(validation_db, transfer_db, archive_dir) -> tuple[int, int]:
+    """Quick check of the archive against the transfers database using only metadata.
+
+    Each bag's bag-info.txt is read and its payload size and file count taken from stat,
+    then its UUID and Payload-Oxum are compared with its record in the transfers database.
+    Nothing is hashed, so this finds missing, misfiled and truncated bags in minutes but not
+    changed file contents, which run_validation still checks.
+
+    Recorded as a validation action with ActionType 'Reconcile'. Only failures get an outcome
+    row, passing bags are counted. Returns the action's identifier and number of failures.
+
+    Keyword arguments:
+    validation_db -- path to the validation database
+    transfer_db -- path to the transfers database
+    archive_dir -- the archive directory containing collection/transfer folders
+    """
+    # load the transfer records once rather than querying for every bag
+    by_path = {}
+    by_uuid = {}
+    with get_db_connection(transfer_db) as con:
+        for record in con.execute(
+            "SELECT TransferID, BagUUID, OutcomeFolderTitle, PayloadBytes, PayloadFileCount FROM transfers"
+        ):
+            by_path.setdefault(record[2], []).append(record)
+            by_uuid.setdefault(record[1], []).append(record)
 
-            # log directory as checked
-            relative_path = validation_status.get_relative_path()
-            logger.info(f"Checked transfer at {relative_path} with outcome {outcome}")
+    db_paths_checked = set()
+    failed = 0
+    with ValidationWriter(validation_db, record_passes=False) as writer:
+        validation_action_id = writer.start(datetime.now(), "Reconcile")
+
+        for transfer_dir in list_transfer_dirs(archive_dir):
+            start_time = datetime.now()
+            relative_path = os.path.relpath(transfer_dir, archive_dir)
             db_paths_checked.add(relative_path)
+            bag_uuid, found, errors = check_bag_metadata_at(transfer_dir)
+            bag_uuid = ";".join(bag_uuid)
 
-    # find any transfers in the database that weren't on the filesystem
-    # add a row and validation error for each
-    with get_db_connection(transfer_db) as tbd:
-        cur = tbd.cursor()
-        params = ["? " for i in range(len(db_paths_checked))]
-        query_time = datetime.now()
-        select_statement = (
-            "SELECT TransferID, BagUUID, OutcomeFolderTitle, OriginalFolderTitle, TransferDate, ContactName "
-            + f"from transfers WHERE OutcomeFolderTitle not in ({','.join(params)})"
-        )
-        try:
-            result = cur.execute(select_statement, list(db_paths_checked))
-            matches = result.fetchall()
+            matches = by_path.get(relative_path, [])
             if len(matches) == 0:
-                logger.info("No unmatched transfers in database.")
+                errors.append("Bag path not found in transfers database.")
+                for match in by_uuid.get(bag_uuid, []) if bag_uuid else []:
+                    errors.append(
+                        f"UUID recorded for transfer {match[0]} in folder {match[2]}"
+                    )
+            elif len(matches) > 1:
+                transfers = [str(match[0]) for match in matches]
+                errors.append(f"Too many transfers in database: {'; '.join(transfers)}")
             else:
-                for match in matches:
-                    insert_validation_outcome(
-                        validation_action_id,
-                        match[1],
-                        False,
-                        f"Transfer {match[0]} in database but not found on system. Submitted on {match[4]} by {match[5]} in folder {match[3]}.",
-                        match[2],
-                        query_time,
-                        query_time,
-                        validation_db,
+                transfer_id, db_uuid, _, db_bytes, db_files = matches[0]
+                if bag_uuid != db_uuid:
+                    errors.append(
+                        f"UUID conflict in database for transfer {transfer_id} with UUID {db_uuid}"
+                    )
+                if (
+                    found != (None, None)
+                    and db_bytes is not None
+                    and (db_bytes, db_files) != found
+                ):
+                    errors.append(
+                        f"Payload differs from transfer {transfer_id}. Recorded {db_files} files and {db_bytes} bytes but found {found[1]} files and {found[0]} bytes"
                     )
-        except Exception as e:
-            logger.error(f"Error connecting to database. {e}")
 
-    validation_action_end = datetime.now()
-    end_validation(validation_action_id, validation_action_end, validation_db)
-    return validation_action_id
+            if errors:
+                failed += 1
+                logger.warning(f"Reconciliation failed for {relative_path}: {errors}")
+            writer.add_outcome(
+                bag_uuid,
+                len(errors) == 0,
+                ";".join(errors),
+                transfer_dir,
+                start_time,
+                datetime.now(),
+            )
+
+        # transfers recorded in the database that aren't on the filesystem
+        query_time = datetime.now()
+        for match in get_transfers_not_in(db_paths_checked, transfer_db):
+            failed += 1
+            writer.add_outcome(
+                match[1],
+                False,
+                f"Transfer {match[0]} in database but not found on system. Submitted on {match[4]} by {match[5]} in folder {match[3]}.",
+                match[2],
+                query_time,
+                query_time,
+            )
+
+        writer.end(datetime.now())
+    logger.info(f"Reconciled {len(db_paths_checked)} bags with {failed} failures")
+    return (validation_action_id, failed)
+
 
 def insert_transfer(
     output_folder,
@@ -373,12 +876,17 @@ def insert_transfer(
     end_time -- when the transfer completed
     db_path -- path to the database"""
     collection_id = primary_id
+    payload_bytes, payload_file_count = parse_payload_oxum(bag.info["Payload-Oxum"])
+    try:
+        duration = (end_time - start_time).total_seconds()
+    except TypeError:
+        duration = None
     with get_db_connection(db_path) as con:
         cur = con.cursor()
         try:
             cur.execute(
-                "INSERT INTO transfers (CollectionIdentifier, BagUUID, TransferDate, BagDate, PayloadOxum, ManifestSHA256Hash, StartTime, EndTime, OriginalFolderTitle, OutcomeFolderTitle, ContactName, SourceOrganisation) "
-                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                "INSERT INTO transfers (CollectionIdentifier, BagUUID, TransferDate, BagDate, PayloadOxum, ManifestSHA256Hash, StartTime, EndTime, OriginalFolderTitle, OutcomeFolderTitle, ContactName, SourceOrganisation, PayloadBytes, PayloadFileCount, DurationSeconds) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
                 (
                     collection_id,
                     bag.info[UUID_ID],  # UUID field
@@ -392,8 +900,12 @@ def insert_transfer(
                     output_folder,
                     bag.info.get(CONTACT, "Not recorded"),
                     bag.info.get(SOURCE_ORGANIZATION, "Not recorded"),
+                    payload_bytes,
+                    payload_file_count,
+                    duration,
                 ),
             )
+            transfer_id = cur.lastrowid
         except sqlite3.DatabaseError as e:
             logger.error(f"Error inserting transfer record: {e}")
             raise  # Reraise the exception to handle it outside if necessary
@@ -405,6 +917,35 @@ def insert_transfer(
         except sqlite3.DatabaseError as e:
             logger.error(f"Error inserting collections record: {e}")
             raise  # Reraise the exception to handle it outside if necessary
+        try:
+            for table in SUMMARY_TABLES:
+                cur.execute(summary_table_statements(table)[2], (transfer_id,))
+        except sqlite3.DatabaseError as e:
+            logger.error(f"Error updating summary tables: {e}")
+            raise
+
+
+def rebuild_summary_tables(db_path) -> None:
+    """Recalculates the summary tables from the Transfers table in one transaction."""
+    with get_db_connection(db_path) as con:
+        cur = con.cursor()
+        for table in SUMMARY_TABLES:
+            create, rebuild, update = summary_table_statements(table)
+            cur.execute(create)
+            cur.execute(f"DELETE FROM {table}")
+            cur.execute(rebuild)
+            logger.info(f"Rebuilt summary table {table}")
+
+
+def get_monthly_summary(start_month, end_month, db_path) -> dict:
+    """Totals the transfers recorded between two months inclusive, in the format YYYY-MM."""
+    with get_db_connection(db_path) as con:
+        result = con.execute(
+            "SELECT COALESCE(SUM(TransferCount), 0), COALESCE(SUM(TotalBytes), 0), COALESCE(SUM(TotalFiles), 0), COALESCE(SUM(TotalSeconds), 0) "
+            "FROM MonthlySummary WHERE Month BETWEEN ? AND ?",
+            (start_month, end_month),
+        ).fetchone()
+    return dict(zip(["TransferCount", "TotalBytes", "TotalFiles", "TotalSeconds"], result))
 
 
 def html_header(title: str):
@@ -449,6 +990,87 @@ def dump_database_tables_to_html(
     return html
 
 
+def write_html_table_pages(
+    output_dir, name, title, cursor, page_size=1000
+) -> tuple[int, int]:
+    """Writes the rows of an executed cursor to numbered HTML pages named {name}_{n}.html,
+    holding at most two pages of rows in memory. Returns the number of rows and pages.
+
+    Keyword arguments:
+    output_dir -- directory the pages are written to
+    name -- file name prefix for the pages
+    title -- heading for each page
+    cursor -- a cursor that has executed a SELECT
+    page_size -- rows per page (default 1000)
+    """
+    columns = [html.escape(str(c[0])) for c in cursor.description]
+    header_row = "".join(f"<th>{c}</th>" for c in columns)
+    rows = cursor.fetchmany(page_size)
+    page = 1
+    count = 0
+    while True:
+        next_rows = cursor.fetchmany(page_size) if rows else []
+        links = '<p><a href="index.html">Index</a>'
+        if page > 1:
+            links += f' | <a href="{name}_{page - 1}.html">Previous</a>'
+        if next_rows:
+            links += f' | <a href="{name}_{page + 1}.html">Next</a>'
+        links += "</p>"
+        with open(os.path.join(output_dir, f"{name}_{page}.html"), "w", encoding="utf-8") as f:
+            f.write(html_header(title))
+            f.write(f"<body><h2>{html.escape(title)} (page {page})</h2>{links}")
+            f.write(f'<table border="1" class="dataframe"><thead><tr>{header_row}</tr></thead><tbody>')
+            for row in rows:
+                cells = "".join(
+                    f"<td>{'None' if v is None else html.escape(str(v))}</td>" for v in row
+                )
+                f.write(f"<tr>{cells}</tr>\n")
+            f.write(f"</tbody></table>{links}</body></html>")
+        count += len(rows)
+        if not next_rows:
+            return (count, page)
+        rows = next_rows
+        page += 1
+
+
+def dump_database_tables_to_html_pages(
+    output_dir,
+    title: str = "Data Archive Report",
+    db_paths: dict = {"transfer": None, "validation": None},
+    db_tables: dict = {"transfer": [], "validation": []},
+    page_size: int = 1000,
+) -> str:
+    """Streams the specified transfer and validation database tables to paginated HTML
+    files in output_dir, with an index.html linking to them. Rows are read from a cursor a
+    page at a time, so memory use doesn't grow with the size of the tables.
+    Returns the path to the index page.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    index_body = f"<body><h1>{html.escape(title)}</h1>"
+    for database in ["transfer", "validation"]:
+        if db_paths.get(database) is None:
+            continue
+        tables = db_tables.get(database)
+        if tables is None:
+            continue
+        index_body += f"<h2>Records of {database}</h2><ul>"
+        with get_db_connection(db_paths.get(database)) as con:
+            for table in tables:
+                cursor = con.execute(f'SELECT * from "{table}"')
+                name = f"{database}_{table}"
+                rows, pages = write_html_table_pages(
+                    output_dir, name, f"Contents of table {table}", cursor, page_size
+                )
+                index_body += f'<li><a href="{name}_1.html">{html.escape(table)}</a> - {rows} rows in {pages} pages</li>'
+                logger.info(f"Wrote {rows} rows from {table} to {pages} pages")
+        index_body += "</ul>"
+    index = os.path.join(output_dir, "index.html")
+    with open(index, "w", encoding="utf-8") as f:
+        f.write(html_header(title))
+        f.write(index_body + "</body></html>")
+    return index
+
+
 def return_db_query_as_html(db_path: str, sql_query: str):
     with get_db_connection(db_path) as con:
         df = pd.read_sql_query(sql_query, con)
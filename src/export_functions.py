@@ -0,0 +1,219 @@
+import csv
+import re
+from src.database_functions import *
+from src.shared_constants import *
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# tables that can be exported, with the database they live in and the
+# increasing key used as the high-water mark between exports
+EXPORT_TABLES = {
+    "Transfers": ("transfer", "TransferID"),
+    "ValidationOutcome": ("validation", "OutcomeIdentifier"),
+}
+
+EXPORT_FORMATS = ["csv", "jsonl", "parquet"]
+
+STATE_FILE = "export_state.json"
+
+
+def get_export_formats(string_input) -> list:
+    """Parses EXPORT_FORMATS, defaulting to csv and jsonl. Parquet is dropped if pyarrow
+    isn't installed."""
+    if string_input is None:
+        return ["csv", "jsonl"]
+    formats = []
+    for export_format in string_input.split(","):
+        export_format = export_format.strip().lower()
+        if export_format not in EXPORT_FORMATS:
+            logger.warning(f"Export format {export_format} isn't valid. Removing from export config.")
+        elif export_format == "parquet" and pyarrow is None:
+            logger.warning("Parquet export requires pyarrow, which isn't installed.")
+        else:
+            formats.append(export_format)
+    if len(formats) == 0:
+        logger.warning("No valid export formats supplied. Using csv.")
+        formats = ["csv"]
+    return formats
+
+
+def load_export_state(output_dir) -> dict:
+    """Returns the last exported key for each table, from the previous export to output_dir."""
+    path = os.path.join(output_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_export_state(output_dir, state: dict) -> None:
+    path = os.path.join(output_dir, STATE_FILE)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(temp_path, path)
+
+
+def get_column_types(con, table) -> dict:
+    """Returns the type of each column in a table as "integer", "real" or "text", from
+    its declared type using SQLite's affinity rules. Columns declared without a type can
+    hold any value, so they are exported as text."""
+    column_types = {}
+    for cid, name, declared, notnull, default, pk in con.execute(f"PRAGMA table_info({table})"):
+        declared = (declared or "").upper()
+        if "INT" in declared:
+            column_types[name] = "integer"
+        elif any(t in declared for t in ("REAL", "FLOA", "DOUB")):
+            column_types[name] = "real"
+        else:
+            column_types[name] = "text"
+    return column_types
+
+
+def convert_value(value, column_type: str):
+    """Converts a value to a column type from get_column_types. Values that can't be
+    converted to a number are left empty."""
+    if value is None:
+        return None
+    try:
+        if column_type == "integer":
+            return int(value)
+        if column_type == "real":
+            return float(value)
+    except (TypeError, ValueError):
+        return None
+    return str(value)
+
+
+def get_parquet_schema(columns, column_types: dict):
+    """Returns a pyarrow schema for the columns, so every chunk of a table has the same
+    schema whatever values it holds."""
+    arrow_types = {
+        "integer": pyarrow.int64(),
+        "real": pyarrow.float64(),
+        "text": pyarrow.string(),
+    }
+    return pyarrow.schema(
+        [pyarrow.field(column, arrow_types[column_types[column]]) for column in columns]
+    )
+
+
+def write_export_chunk(prefix, columns, rows, formats, column_types=None) -> None:
+    """Writes one chunk of rows to a file per format, named {prefix}.{format}.
+
+    Parquet files use the column types from get_column_types, or text for every column
+    if they aren't supplied."""
+    if column_types is None:
+        column_types = {column: "text" for column in columns}
+    for export_format in formats:
+        path = f"{prefix}.{export_format}"
+        if export_format == "csv":
+            with open(path, "w", encoding="utf-8", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(columns)
+                writer.writerows(rows)
+        elif export_format == "jsonl":
+            with open(path, "w", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps(dict(zip(columns, row)), default=str) + "\n")
+        elif export_format == "parquet":
+            table = pyarrow.Table.from_pydict(
+                {
+                    column: [convert_value(row[i], column_types[column]) for row in rows]
+                    for i, column in enumerate(columns)
+                },
+                schema=get_parquet_schema(columns, column_types),
+            )
+            pyarrow.parquet.write_table(table, path)
+
+
+def remove_export_chunks(output_dir, table) -> int:
+    """Deletes the chunk files of every format left in output_dir by earlier exports of
+    a table. Returns the number of files removed."""
+    pattern = re.compile(rf"{re.escape(table)}_\d+\.({'|'.join(EXPORT_FORMATS)})")
+    removed = 0
+    for name in os.listdir(output_dir):
+        if pattern.fullmatch(name):
+            os.remove(os.path.join(output_dir, name))
+            removed += 1
+    return removed
+
+
+def export_table(
+    db_path, table, output_dir, formats, since=None, chunk_size=100000
+) -> tuple[int, int]:
+    """Streams rows of an export table with a key greater than since to chunked files,
+    named by table and the first key in the chunk. Exporting everything first removes
+    the table's chunk files from earlier exports, so they don't repeat the same rows.
+    Returns the number of rows written and the highest key written, or since if there
+    were no new rows.
+
+    Keyword arguments:
+    db_path -- path to the database containing the table
+    table -- a key of EXPORT_TABLES
+    output_dir -- directory the files are written to
+    formats -- list of formats from EXPORT_FORMATS
+    since -- high-water mark from the previous export, or None to export everything
+    chunk_size -- rows per file (default 100000)
+    """
+    key = EXPORT_TABLES[table][1]
+    if since is None:
+        removed = remove_export_chunks(output_dir, table)
+        if removed:
+            logger.info(f"Removed {removed} files from a previous export of {table}")
+    count = 0
+    last_key = since
+    with get_db_connection(db_path) as con:
+        cursor = con.execute(
+            f"SELECT * FROM {table} WHERE {key} > ? ORDER BY {key}",
+            (since if since is not None else -1,),
+        )
+        columns = [c[0] for c in cursor.description]
+        column_types = get_column_types(con, table)
+        key_index = columns.index(key)
+        part = 0
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            part += 1
+            # named by the first key so incremental exports never overwrite earlier files
+            prefix = os.path.join(output_dir, f"{table}_{rows[0][key_index]:010d}")
+            write_export_chunk(prefix, columns, rows, formats, column_types)
+            count += len(rows)
+            last_key = rows[-1][key_index]
+    logger.info(f"Exported {count} rows from {table} in {part} files")
+    return (count, last_key)
+
+
+def export_history(db_paths: dict, output_dir, formats, incremental=True) -> dict:
+    """Exports the transfer and validation history to output_dir and records the
+    high-water mark for each table, so the next incremental export only writes new rows.
+    Returns the number of rows written per table.
+
+    Keyword arguments:
+    db_paths -- maps "transfer" and "validation" to database paths
+    output_dir -- directory the files and export state are written to
+    formats -- list of formats from EXPORT_FORMATS
+    incremental -- only export rows newer than the last export (default True)
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    state = load_export_state(output_dir) if incremental else {}
+    exported = {}
+    for table, (database, key) in EXPORT_TABLES.items():
+        db_path = db_paths.get(database)
+        if db_path is None:
+            continue
+        count, last_key = export_table(
+            db_path, table, output_dir, formats, state.get(table)
+        )
+        exported[table] = count
+        if last_key is not None:
+            state[table] = last_key
+        # record progress after each table so a failure doesn't repeat finished work
+        save_export_state(output_dir, state)
+    return exported
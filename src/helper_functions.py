@@ -1,14 +1,26 @@
 import os
 import re
+import atexit
+import heapq
+import itertools
+import mmap
+import queue
+import sqlite3
 import uuid
 import bagit
 import time
 import platform
 import shutil
+import tempfile
 import hashlib
+import json
 import subprocess
 import logging
+import threading
+from array import array
 from pathlib import Path
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 from abc import ABC, abstractmethod
 from src.shared_constants import *
 from src.id_parser import IdParser
@@ -28,13 +40,34 @@ def load_config() -> dict:
         "SOURCE_ORG": os.getenv("SOURCE_ORG"),
         "REPORT_DIR": os.getenv("REPORT_DIR"),
         "APPRAISAL_DIR": os.getenv("APPRAISAL_DIR"),
-        "DROID_OUTPUT_DIR": os.getenv("DROID_OUTPUT_DIR")
+        "DROID_OUTPUT_DIR": os.getenv("DROID_OUTPUT_DIR"),
+        "TRANSFER_WORKERS": os.getenv("TRANSFER_WORKERS"),
+        "STREAM_TRANSFERS": os.getenv("STREAM_TRANSFERS"),
+        "COPY_ENGINE": os.getenv("COPY_ENGINE"),
+        "COPY_WORKERS": os.getenv("COPY_WORKERS"),
+        "JOURNAL_DIR": os.getenv("JOURNAL_DIR"),
+        "FIXITY_MAX_AGE_DAYS": os.getenv("FIXITY_MAX_AGE_DAYS"),
+        "VALIDATION_WORKERS": os.getenv("VALIDATION_WORKERS"),
+        "VALIDATION_PROCESSES": os.getenv("VALIDATION_PROCESSES"),
+        "DB_JOURNAL_MODE": os.getenv("DB_JOURNAL_MODE"),
+        "EXPORT_DIR": os.getenv("EXPORT_DIR"),
+        "EXPORT_FORMATS": os.getenv("EXPORT_FORMATS"),
+        "QUARTERLY_VALIDATION": os.getenv("QUARTERLY_VALIDATION"),
+        "DROID_HASH_WORKERS": os.getenv("DROID_HASH_WORKERS"),
+        "HASH_CACHE_DB": os.getenv("HASH_CACHE_DB"),
+        "HASH_CACHE_TRUST_DAYS": os.getenv("HASH_CACHE_TRUST_DAYS"),
+        "HASH_CACHE_MAX_ENTRIES": os.getenv("HASH_CACHE_MAX_ENTRIES"),
     }
     return config
 
 
 config = load_config()
 
+# size of the buffer used when copying and hashing payload files
+COPY_BLOCK_SIZE = 1024 * 1024
+
+# size of each of the two page-aligned buffers used when hashing large files
+HASH_BLOCK_SIZE = 8 * 1024 * 1024
 
 class TriggerFile:
     """A class for managing BagIt transfer status using files in a directory.
@@ -227,6 +260,25 @@ class TriggerFile:
         bag = self.transfer_type.make_bag(self.name, self.metadata)
         return bag
 
+    def check_bag(self, bag: bagit.Bag) -> bool:
+        """Returns True if a bag made by make_bag is valid and ready to copy."""
+        return self.transfer_type.check_bag(bag)
+
+    def can_stream(self) -> bool:
+        """Returns True if the transfer is an unbagged folder that can be bagged in transit."""
+        return isinstance(self.transfer_type.transfer, NewTransfer)
+
+    def stream_bag(self, output_dir: str) -> bagit.Bag:
+        """Builds a bag at output_dir from the unbagged folder, reading each file once.
+
+        The original folder is left unbagged.
+        """
+        if not self.can_stream():
+            raise ValueError("Only unbagged folders can be streamed to a new bag.")
+        self._set_status(".processing")
+        bag = stream_bag(self.name, output_dir, self.metadata, get_hash_config())
+        return bag
+
     def cleanup_transfer(self, appraisal_dir: str = None) -> None:
         """Remove trigger file and directory. Won't work on collections with an error status.
 
@@ -254,14 +306,17 @@ class Transfer(ABC):
     def make_bag(self, path: str, metadata: dict):
         pass
 
+    @abstractmethod
+    def check_bag(self, bag: bagit.Bag) -> bool:
+        pass
+
 
 class BagTransfer(Transfer):
     """Concrete Transfer class for handling Bagged data."""
 
     def build_metadata(self, path: str, id_parser: IdParser) -> dict:
-        """Loads metadata from baginfo.txt"""
-        bag = bagit.Bag(path)
-        metadata = bag.info
+        """Loads metadata from baginfo.txt, without loading the bag's manifests."""
+        metadata = read_bag_info(path)
         return metadata
 
     def make_bag(self, path: str, metadata: dict) -> bagit.Bag:
@@ -269,18 +324,51 @@ class BagTransfer(Transfer):
         bag = bagit.Bag(path)
         for key in metadata.keys():
             bag.info[key] = metadata.get(key)
-        bag.save()
+        save_bag_info(bag)
         return bag
 
+    def check_bag(self, bag: bagit.Bag) -> bool:
+        """Fully validates an existing bag, as its contents may have changed since it was made."""
+        return bag.is_valid()
+
 
 class NewTransfer(Transfer):
     """Concrete Transfer class for handling unbagged folders of data."""
 
+    def __init__(self) -> None:
+        # payload digests and sizes calculated by make_bag
+        self.entries = None
+
     def make_bag(self, path: str, metadata: dict) -> bagit.Bag:
-        """Run BagIt on a folder with supplied metadata dictionary."""
-        bag = bagit.make_bag(path, bag_info=metadata, checksums=get_hash_config())
+        """Bags a folder with supplied metadata dictionary, keeping the payload digests and
+        sizes so the new bag doesn't need to be hashed again."""
+        bag, self.entries = make_bag_in_place(path, metadata, get_hash_config())
         return bag
 
+    def check_bag(self, bag: bagit.Bag) -> bool:
+        """Checks a bag made by make_bag without rehashing the payload.
+
+        The digests were calculated by make_bag, so this confirms the bag is complete, the
+        manifests match those digests and no payload file has changed size.
+        """
+        if self.entries is None:
+            return bag.is_valid()
+        try:
+            bag.validate(completeness_only=True)
+        except bagit.BagError as e:
+            logger.error(f"Bag at {bag.path} is incomplete: {e}")
+            return False
+        for path, (digests, size) in self.entries.items():
+            manifest_path = os.path.normpath(path)
+            for alg, digest in digests.items():
+                if bag.entries.get(manifest_path, {}).get(alg) != digest:
+                    logger.error(f"{alg} manifest entry for {path} doesn't match the digest calculated when bagging.")
+                    return False
+            if os.path.getsize(os.path.join(bag.path, manifest_path)) != size:
+                logger.error(f"{path} has changed size since it was bagged.")
+                return False
+        return True
+
     def build_metadata(self, path: str, id_parser: IdParser) -> dict:
         """Parses and structures key metadata values based on folder properties.
         Folder name must contain identifier.
@@ -372,6 +460,9 @@ class TransferType:
         bag = self._transfer.make_bag(path, metadata)
         return bag
 
+    def check_bag(self, bag: bagit.Bag) -> bool:
+        return self._transfer.check_bag(bag)
+
 
 def guess_primary_id(
     identifiers: list, identifier_prefixes: list = ["RA", "PA", "SC", "POL", "H", "MS"]
@@ -401,39 +492,219 @@ def process_transfer(
     output_folder: str,
     rsync_flags: str = "-vrlt",
     robocopy_flags: str = "/e /z /copy:DAT /dcopy:DAT /v",
+    copy_engine: str = None,
+    journal: "CopyJournal" = None,
 ) -> bool:
-    """Copies data from folder to output folder using Robocopy for Windows or rsync for
-    Linux. Default flags are provided in each the respective functions.
+    """Copies data from folder to output folder using the configured copy engine.
+
+    The native engine copies files concurrently in Python using kernel copy calls where
+    available. The system engine uses Robocopy for Windows or rsync for Linux, with default
+    flags provided in each of the respective functions. The other engine is tried if the
+    preferred one fails, then shutil.copytree.
+
+    Keyword arguments:
+    source_folder -- folder to copy
+    output_folder -- destination, may already exist
+    copy_engine -- "native" or "system", defaults to COPY_ENGINE from config
+    journal -- CopyJournal used by the native engine to verify files and skip those
+    verified by an earlier attempt
     """
     WORKING_OS = platform.system()
+    config = load_config()
+    if copy_engine is None:
+        copy_engine = get_copy_engine(config.get("COPY_ENGINE"), WORKING_OS)
     logger.warning(
         f"attempting to transfer collection from {source_folder} to {output_folder}"
     )
-    if WORKING_OS == "Linux":
-        logger.info("Platform is Linux. Attempting to copy using rsync...")
-        try:
-            rsync_copy(source_folder, output_folder, rsync_flags)
-            return True
-        except Exception as e:
-            logger.info(f"Rsync failed with exception: {e}")
-    elif WORKING_OS == "Windows":
-        logger.info("Platform is Windows. Attempting to copy using Robocopy...")
-        try:
-            robocopy_copy(source_folder, output_folder, robocopy_flags)
-            return True
-        except Exception as e:
-            logger.info(f"Robocopy failed with exception: {e}")
+    engines = ["native", "system"] if copy_engine == "native" else ["system", "native"]
+    for engine in engines:
+        if engine == "native":
+            logger.info("Attempting to copy using native copy engine...")
+            try:
+                copy_tree(
+                    source_folder,
+                    output_folder,
+                    get_worker_count(config.get("COPY_WORKERS"), default=4),
+                    journal,
+                )
+                return True
+            except Exception as e:
+                logger.info(f"Native copy failed with exception: {e}")
+        elif WORKING_OS == "Linux":
+            logger.info("Platform is Linux. Attempting to copy using rsync...")
+            try:
+                rsync_copy(source_folder, output_folder, rsync_flags)
+                return True
+            except Exception as e:
+                logger.info(f"Rsync failed with exception: {e}")
+        elif WORKING_OS == "Windows":
+            logger.info("Platform is Windows. Attempting to copy using Robocopy...")
+            try:
+                robocopy_copy(source_folder, output_folder, robocopy_flags)
+                return True
+            except Exception as e:
+                logger.info(f"Robocopy failed with exception: {e}")
     try:
         logger.warning(
             f"Copy methods failed, attempting to copy with shutil.copytree(). This may cause loss of date metadata. Followup required."
         )
-        shutil.copytree(source_folder, output_folder)
+        shutil.copytree(source_folder, output_folder, dirs_exist_ok=True)
         return True
     except Exception as e:
         logger.error(f"Copying with shutil.copytree failed.")
         return False
 
 
+def get_copy_engine(string_input, working_os: str) -> str:
+    """Returns the configured copy engine. Defaults to Robocopy on Windows, which preserves
+    creation dates, and the native engine everywhere else.
+    """
+    if string_input is None:
+        return "system" if working_os == "Windows" else "native"
+    engine = string_input.strip().lower()
+    if engine not in ["native", "system"]:
+        logger.warning(f"Copy engine {string_input} isn't valid. Using native.")
+        return "native"
+    return engine
+
+
+def copy_tree(
+    source_folder: str,
+    output_dir: str,
+    workers: int = 4,
+    journal: "CopyJournal" = None,
+) -> tuple[int, int]:
+    """Copies a folder into output_dir, copying several files at once.
+
+    Symbolic links are copied as links and modification times are preserved for files
+    and directories. Logs throughput once complete and returns a tuple of the number of
+    files and bytes copied.
+
+    If a journal is supplied the source is treated as a bag: each copied file listed in
+    its manifests is hashed and recorded in the journal if it matches, and files the
+    journal already lists as verified are skipped.
+
+    Keyword arguments:
+    source_folder -- folder to copy
+    output_dir -- destination, created if it doesn't exist
+    workers -- number of files copied at the same time (default 4)
+    journal -- CopyJournal for a resumable copy (default None)
+    """
+    start = time.perf_counter()
+    manifest = {}
+    if journal is not None:
+        bag = bagit.Bag(source_folder)
+        manifest = {
+            bagit.normalize_unicode(path): digests for path, digests in bag.entries.items()
+        }
+    copied_dirs = []
+    jobs = []
+    for root, dirs, files in os.walk(source_folder):
+        target_root = os.path.normpath(
+            os.path.join(output_dir, os.path.relpath(root, source_folder))
+        )
+        os.makedirs(target_root, exist_ok=True)
+        copied_dirs.append((root, target_root))
+        for name in dirs + files:
+            source = os.path.join(root, name)
+            target = os.path.join(target_root, name)
+            if os.path.islink(source):
+                if os.path.lexists(target):
+                    os.remove(target)
+                os.symlink(os.readlink(source), target)
+        for name in files:
+            source = os.path.join(root, name)
+            if not os.path.islink(source):
+                jobs.append((source, os.path.join(target_root, name)))
+
+    def copy_job(job):
+        source, target = job
+        if journal is None:
+            return copy_file_fast(source, target)
+        path = bagit.normalize_unicode(os.path.relpath(target, output_dir))
+        source_stat = os.stat(source)
+        if journal.is_verified(path, source_stat, target):
+            return 0
+        copied = copy_file_fast(source, target)
+        expected = manifest.get(path)
+        if expected is not None:
+            target_stat = os.stat(target)
+            found = hash_file(target, expected.keys())
+            if all(found[alg] == expected[alg].lower() for alg in expected):
+                journal.record(path, source_stat, found, target_stat)
+            else:
+                logger.warning(f"Copied file {target} doesn't match the manifest.")
+        return copied
+
+    byte_count = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for copied in executor.map(copy_job, jobs):
+            byte_count += copied
+
+    # directory times are set last, as writing files inside them updates the mtime
+    for source_dir, target_dir in reversed(copied_dirs):
+        shutil.copystat(source_dir, target_dir)
+
+    seconds = time.perf_counter() - start
+    rate = byte_count / seconds if seconds > 0 else byte_count
+    logger.info(
+        f"Copied {len(jobs)} files ({byte_count} bytes) from {source_folder} in {seconds:.2f}s "
+        + f"({rate / (1024 ** 2):.2f} MiB/s)"
+    )
+    return (len(jobs), byte_count)
+
+
+def copy_file_fast(source: str, destination: str) -> int:
+    """Copies a single file and its modification time, returning the bytes copied.
+
+    Uses os.copy_file_range, then os.sendfile, so data doesn't pass through Python where
+    the platform supports it. Falls back to a buffered copy from wherever the previous
+    method stopped.
+    """
+    with open(source, "rb") as src, open(destination, "wb") as dst:
+        size = os.fstat(src.fileno()).st_size
+        offset = 0
+        for kernel_copy in [_copy_file_range, _sendfile]:
+            try:
+                offset = kernel_copy(src.fileno(), dst.fileno(), offset, size)
+                break
+            except (AttributeError, OSError) as e:
+                logger.debug(f"{kernel_copy.__name__} unavailable for {source}: {e}")
+        if offset < size:
+            src.seek(offset)
+            dst.seek(offset)
+            while True:
+                block = src.read(COPY_BLOCK_SIZE)
+                if not block:
+                    break
+                dst.write(block)
+                offset += len(block)
+    shutil.copystat(source, destination)
+    logger.debug(f"Copied {offset} bytes from {source} to {destination}")
+    return offset
+
+
+def _copy_file_range(src_fd: int, dst_fd: int, offset: int, size: int) -> int:
+    while offset < size:
+        copied = os.copy_file_range(
+            src_fd, dst_fd, size - offset, offset_src=offset, offset_dst=offset
+        )
+        if copied == 0:
+            break
+        offset += copied
+    return offset
+
+
+def _sendfile(src_fd: int, dst_fd: int, offset: int, size: int) -> int:
+    os.lseek(dst_fd, offset, os.SEEK_SET)
+    while offset < size:
+        copied = os.sendfile(dst_fd, src_fd, offset, min(size - offset, 2**30))
+        if copied == 0:
+            break
+        offset += copied
+    return offset
+
+
 def robocopy_copy(
     folder: str, output_dir: str, flags: str = "/e /z /copy:DAT /dcopy:DAT"
 ) -> None:
@@ -482,6 +753,720 @@ def rsync_copy(folder: str, output_dir: str, flags: str = "-vrlt") -> None:
         raise
 
 
+def advise_file(fd: int, advice: str, offset: int = 0, length: int = 0) -> None:
+    """Passes an access pattern hint such as "POSIX_FADV_SEQUENTIAL" to the kernel where
+    posix_fadvise is available. Hints are only advisory so failures are ignored."""
+    if hasattr(os, "posix_fadvise"):
+        try:
+            os.posix_fadvise(fd, offset, length, getattr(os, advice))
+        except OSError:
+            pass
+
+
+def hash_file(path: str, algorithms: list, block_size: int = HASH_BLOCK_SIZE) -> dict:
+    """Returns hex digests of a file keyed by algorithm, reading the file once and updating
+    every digest from the same buffers.
+
+    Files larger than block_size are read into two page-aligned buffers by a reader thread
+    while the previous buffer is hashed, with each algorithm updated on its own thread,
+    so reading and hashing overlap. Smaller files are read and hashed in one go.
+
+    Keyword arguments:
+    path -- file to hash
+    algorithms -- hashlib algorithm names
+    block_size -- size of each buffer (default 8 MiB)
+    """
+    hashers = [hashlib.new(alg) for alg in algorithms]
+    with open(path, "rb", buffering=0) as f:
+        fd = f.fileno()
+        advise_file(fd, "POSIX_FADV_SEQUENTIAL")
+        if os.fstat(fd).st_size <= block_size:
+            data = f.readall()
+            for hasher in hashers:
+                hasher.update(data)
+        else:
+            hash_stream(f, hashers, block_size)
+            # don't let one very large file push everything else out of the page cache
+            advise_file(fd, "POSIX_FADV_DONTNEED")
+    return {alg: hasher.hexdigest() for alg, hasher in zip(algorithms, hashers)}
+
+
+def hash_stream(f, hashers: list, block_size: int = HASH_BLOCK_SIZE) -> None:
+    """Updates each hasher with the rest of an unbuffered binary file, double buffered.
+
+    A reader thread fills one buffer while the other is hashed. hashlib releases the GIL
+    for large updates, so with several hashers each is updated on its own thread.
+    """
+    buffers = [mmap.mmap(-1, block_size) for _ in range(2)]
+    empty = queue.Queue()
+    filled = queue.Queue()
+    stop = threading.Event()
+    for buffer in buffers:
+        empty.put(buffer)
+
+    def read():
+        try:
+            while not stop.is_set():
+                buffer = empty.get()
+                if stop.is_set():
+                    break
+                count = f.readinto(buffer)
+                filled.put((buffer, count))
+                if not count:
+                    break
+        except BaseException as e:
+            filled.put((e, 0))
+
+    reader = threading.Thread(target=read, daemon=True)
+    reader.start()
+    executor = ThreadPoolExecutor(max_workers=len(hashers)) if len(hashers) > 1 else None
+    try:
+        while True:
+            buffer, count = filled.get()
+            if isinstance(buffer, BaseException):
+                raise buffer
+            if not count:
+                break
+            with memoryview(buffer)[:count] as view:
+                if executor is None:
+                    hashers[0].update(view)
+                else:
+                    list(executor.map(lambda hasher: hasher.update(view), hashers))
+            empty.put(buffer)
+    finally:
+        stop.set()
+        for buffer in buffers:
+            empty.put(buffer)
+        reader.join()
+        if executor is not None:
+            executor.shutdown()
+        for buffer in buffers:
+            buffer.close()
+
+
+JOURNAL_MODES = ["DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"]
+
+
+def get_journal_mode(string_input) -> str:
+    """Parses DB_JOURNAL_MODE, defaulting to WAL. WAL lets reports and validation read
+    while transfers write, but needs the database on a local disk rather than a network share.
+    """
+    if string_input is None:
+        return "WAL"
+    journal_mode = string_input.strip().upper()
+    if journal_mode not in JOURNAL_MODES:
+        logger.warning(f"Journal mode {string_input} not recognised. Using WAL.")
+        return "WAL"
+    return journal_mode
+
+
+def open_db_connection(db_path, check_same_thread=True) -> sqlite3.Connection:
+    """Opens a connection to a database with the journal mode and pragmas used by the
+    workflow. Pass check_same_thread=False for a connection shared between threads that
+    serialise their own access."""
+    con = sqlite3.connect(db_path, timeout=30, check_same_thread=check_same_thread)
+    journal_mode = get_journal_mode(load_config().get("DB_JOURNAL_MODE"))
+    con.execute(f"PRAGMA journal_mode={journal_mode}")
+    if journal_mode == "WAL":
+        # safe with WAL, and avoids an fsync on every commit
+        con.execute("PRAGMA synchronous=NORMAL")
+    con.execute("PRAGMA cache_size=-16384")
+    con.execute("PRAGMA temp_store=MEMORY")
+    return con
+
+
+class HashCache:
+    """A persistent cache of file digests shared by the DROID check, bagging and validation.
+
+    Digests are keyed on the file's device, inode, size and modification time, so a file
+    that hasn't changed since it was hashed by any stage isn't read again for the same
+    algorithm. Entries older than the trust window are ignored and rehashed. New entries
+    are written in batches, and the least recently used entries are evicted once the
+    cache holds more than max_entries digests.
+
+    Keyword arguments:
+    db_path -- path to the SQLite cache, created if it doesn't exist
+    trust_window -- timedelta after which a cached digest is no longer trusted
+    max_entries -- maximum number of digests kept (default 1,000,000)
+    batch_size -- number of new entries that triggers a write (default 500)
+    """
+
+    def __init__(self, db_path, trust_window: timedelta, max_entries=1000000, batch_size=500):
+        self.db_path = db_path
+        self.trust_window = trust_window
+        self.max_entries = max_entries
+        self.batch_size = batch_size
+        self.pending = {}
+        self.used = []
+        self.lock = threading.Lock()
+        # honours DB_JOURNAL_MODE, as WAL doesn't work for a cache on a network share
+        self.con = open_db_connection(db_path, check_same_thread=False)
+        self.con.execute(
+            "CREATE TABLE IF NOT EXISTS FileHashes(Device INT, Inode INT, Size INT, ModifiedNs INT, Algorithm, Digest, Verified, LastUsed, "
+            "PRIMARY KEY (Device, Inode, Size, ModifiedNs, Algorithm))"
+        )
+        self.con.execute("CREATE INDEX IF NOT EXISTS idx_filehashes_lastused ON FileHashes(LastUsed)")
+        self.con.commit()
+
+    @staticmethod
+    def _key(stat) -> tuple:
+        return (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+    def lookup(self, stat, algorithms) -> dict:
+        """Returns trusted cached digests for a file's stat result, keyed by algorithm.
+        Nothing is trusted if the trust window is zero."""
+        if self.trust_window <= timedelta(0):
+            return {}
+        key = self._key(stat)
+        oldest = (datetime.now() - self.trust_window).isoformat(sep=" ")
+        with self.lock:
+            result = self.con.execute(
+                "SELECT Algorithm, Digest FROM FileHashes WHERE Device=? AND Inode=? AND Size=? AND ModifiedNs=? AND Verified >= ?",
+                key + (oldest,),
+            ).fetchall()
+            found = {alg: digest for alg, digest in result if alg in algorithms}
+            # entries not yet written
+            for alg in algorithms:
+                if key + (alg,) in self.pending:
+                    found[alg] = self.pending[key + (alg,)][5]
+            if found:
+                self.used.append(key)
+        return found
+
+    def store(self, stat, digests: dict) -> None:
+        now = datetime.now().isoformat(sep=" ")
+        key = self._key(stat)
+        with self.lock:
+            for alg, digest in digests.items():
+                self.pending[key + (alg,)] = key + (alg, digest, now, now)
+            if len(self.pending) >= self.batch_size:
+                self._flush()
+
+    def flush(self) -> None:
+        with self.lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self.pending and not self.used:
+            return
+        now = datetime.now().isoformat(sep=" ")
+        try:
+            with self.con:
+                self.con.executemany(
+                    "INSERT OR REPLACE INTO FileHashes(Device, Inode, Size, ModifiedNs, Algorithm, Digest, Verified, LastUsed) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    list(self.pending.values()),
+                )
+                self.con.executemany(
+                    "UPDATE FileHashes SET LastUsed=? WHERE Device=? AND Inode=? AND Size=? AND ModifiedNs=?",
+                    ((now,) + key for key in self.used),
+                )
+                excess = self.con.execute("SELECT COUNT(*) FROM FileHashes").fetchone()[0] - self.max_entries
+                if excess > 0:
+                    self.con.execute(
+                        "DELETE FROM FileHashes WHERE rowid IN (SELECT rowid FROM FileHashes ORDER BY LastUsed LIMIT ?)",
+                        (excess,),
+                    )
+        except sqlite3.DatabaseError as e:
+            logger.warning(f"Error writing to hash cache {self.db_path}: {e}")
+        self.pending = {}
+        self.used = []
+
+    def close(self) -> None:
+        self.flush()
+        self.con.close()
+
+
+_hash_cache = {}
+
+
+def get_hash_cache() -> HashCache:
+    """Returns this process's HashCache if HASH_CACHE_DB is configured, otherwise None."""
+    config = load_config()
+    db_path = config.get("HASH_CACHE_DB")
+    if db_path is None:
+        return None
+    key = (os.getpid(), db_path)
+    if key not in _hash_cache:
+        trust_days = get_non_negative_int(config.get("HASH_CACHE_TRUST_DAYS"), 30, "HASH_CACHE_TRUST_DAYS")
+        max_entries = get_non_negative_int(config.get("HASH_CACHE_MAX_ENTRIES"), 1000000, "HASH_CACHE_MAX_ENTRIES")
+        cache = HashCache(db_path, timedelta(days=trust_days), max_entries)
+        atexit.register(cache.close)
+        _hash_cache[key] = cache
+    return _hash_cache[key]
+
+
+def hash_file_cached(path: str, algorithms: list, cache: HashCache = None) -> dict:
+    """Returns hex digests of a file keyed by algorithm like hash_file, reusing digests
+    from the cache for an unchanged file and only reading it for algorithms not cached."""
+    if cache is None:
+        return hash_file(path, algorithms)
+    stat = os.stat(path)
+    digests = cache.lookup(stat, algorithms)
+    missing = [alg for alg in algorithms if alg not in digests]
+    if missing:
+        found = hash_file(path, missing)
+        cache.store(stat, found)
+        digests.update(found)
+    return {alg: digests[alg] for alg in algorithms}
+
+
+class CopyJournal:
+    """A per-transfer record of files that have been copied and verified.
+
+    The journal is a JSON lines file. The first line identifies the bag being copied
+    and each following line records a verified file with the size and modification time
+    of its source and the modification time and inode of its copy, so a rerun can skip
+    files whose source and copy haven't changed since they were verified.
+    Paths are stored "/" separated, as in bag manifests, so journals are portable.
+
+    Keyword arguments:
+    path -- location of the journal file, created if it doesn't exist
+    bag_uuid -- UUID of the bag being copied. Raises ValueError if an existing journal
+    belongs to a different bag.
+    """
+
+    def __init__(self, path: str, bag_uuid: str):
+        self.path = path
+        self.bag_uuid = bag_uuid
+        self.entries = {}
+        self._lock = threading.Lock()
+        if os.path.isfile(path):
+            self._load()
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._append({"bag": bag_uuid})
+
+    def _load(self) -> None:
+        path = self.path
+        with open(path, "r", encoding="utf-8") as f:
+            lines = f.readlines()
+        if len(lines) == 0 or json.loads(lines[0]).get("bag") != self.bag_uuid:
+            raise ValueError(f"Journal {path} belongs to a different bag.")
+        for line in lines[1:]:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # the last line may be incomplete if the copy was interrupted
+                logger.warning(f"Skipping incomplete journal line in {path}")
+                continue
+            entry["path"] = self._key(entry["path"])
+            self.entries[entry["path"]] = entry
+        logger.info(f"Loaded {len(self.entries)} verified files from journal {path}")
+
+    def _append(self, entry: dict) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    @staticmethod
+    def _key(path: str) -> str:
+        return path.replace(os.sep, "/")
+
+    def get(self, path: str) -> dict:
+        """Returns the recorded entry for a path relative to the bag, or None."""
+        return self.entries.get(self._key(path))
+
+    def is_verified(self, path: str, source_stat: os.stat_result, target: str) -> bool:
+        """Returns True if the source file is unchanged since it was verified and the
+        copy is still in place and unchanged."""
+        entry = self.entries.get(self._key(path))
+        if entry is None:
+            return False
+        return (
+            entry["size"] == source_stat.st_size
+            and entry["mtime_ns"] == source_stat.st_mtime_ns
+            and self.copy_unchanged(path, target)
+        )
+
+    def copy_unchanged(self, path: str, target: str) -> bool:
+        """Returns True if the copy at target has the size, modification time and inode
+        recorded when it was verified. A copy overwritten with the same size is rehashed."""
+        entry = self.entries.get(self._key(path))
+        if entry is None:
+            return False
+        try:
+            target_stat = os.stat(target)
+        except OSError:
+            return False
+        return (
+            target_stat.st_size == entry["size"]
+            and target_stat.st_mtime_ns == entry.get("target_mtime_ns")
+            and target_stat.st_ino == entry.get("target_inode")
+        )
+
+    def record(
+        self, path: str, source_stat: os.stat_result, digests: dict, target_stat: os.stat_result
+    ) -> None:
+        """Records a file as copied and verified, with the stat result of the verified copy."""
+        path = self._key(path)
+        entry = {
+            "path": path,
+            "size": source_stat.st_size,
+            "mtime_ns": source_stat.st_mtime_ns,
+            "target_mtime_ns": target_stat.st_mtime_ns,
+            "target_inode": target_stat.st_ino,
+            "digests": digests,
+        }
+        with self._lock:
+            self._append(entry)
+            self.entries[path] = entry
+
+    def remove(self) -> None:
+        """Deletes the journal once the transfer is complete."""
+        if os.path.isfile(self.path):
+            os.remove(self.path)
+
+
+def validate_copied_bag(output_dir: str, journal: CopyJournal = None) -> bagit.Bag:
+    """Validates a copied bag, only hashing files the journal hasn't already verified.
+
+    Checks the bag structure, Payload-Oxum and manifest completeness first. Raises
+    bagit.BagValidationError if the bag is invalid, otherwise returns the bag.
+    """
+    bag = bagit.Bag(output_dir)
+    bag.validate(completeness_only=True)
+
+    def verified_during_copy(path, full_path, expected):
+        if journal is None:
+            return False
+        path = bagit.normalize_unicode(path)
+        entry = journal.get(path)
+        return (
+            entry is not None
+            and journal.copy_unchanged(path, full_path)
+            and all(entry["digests"].get(alg) == expected[alg].lower() for alg in expected)
+        )
+
+    errors, rehashed = verify_bag_entries(bag, verified_during_copy)
+    logger.info(
+        f"Validated copied bag {output_dir}: {len(bag.entries) - rehashed} files verified during copy, {rehashed} rehashed"
+    )
+    if errors:
+        raise bagit.BagValidationError("Bag validation failed", errors)
+    return bag
+
+
+def verify_bag_entries(
+    bag: bagit.Bag, trusted=None, on_verified=None, workers: int = 1
+) -> tuple[list, int]:
+    """Hashes the files listed in a bag's manifests and compares them to the manifests.
+    Returns a tuple of bagit errors and the number of files hashed.
+
+    The bag should have passed a completeness check first so filesystem names are loaded.
+
+    Keyword arguments:
+    bag -- the bag to check
+    trusted -- optional callable taking (path, full_path, expected digests) that returns
+    True if the file can be skipped
+    on_verified -- optional callable taking (path, full_path, digests) for each file that
+    matched its manifest entries
+    workers -- number of files hashed at once (default 1)
+
+    Digests are read from and added to the hash cache if one is configured.
+    """
+    entries = (
+        (
+            path,
+            os.path.join(
+                bag.path,
+                bag.normalized_filesystem_names.get(bagit.normalize_unicode(path), path),
+            ),
+            expected,
+        )
+        for path, expected in bag.entries.items()
+    )
+    return verify_entries(entries, trusted, on_verified, workers)
+
+
+def verify_entries(entries, trusted=None, on_verified=None, workers: int = 1) -> tuple[list, int]:
+    """Hashes files and compares them to their manifest digests, as verify_bag_entries, for
+    any iterable of (path, full_path, expected digests). Entries are consumed as they are
+    hashed, a batch at a time when hashing on several threads, so a generator of entries is
+    never held in memory."""
+    cache = get_hash_cache()
+    if trusted is not None:
+        entries = (entry for entry in entries if not trusted(*entry))
+
+    def verify(entry) -> list:
+        path, full_path, expected = entry
+        try:
+            found = hash_file_cached(full_path, list(expected.keys()), cache)
+        except OSError as e:
+            logger.warning(f"Could not read {full_path}: {e}")
+            return [bagit.FileMissing(path)]
+        errors = []
+        for alg, digest in found.items():
+            if digest != expected[alg].lower():
+                e = bagit.ChecksumMismatch(path, alg, expected[alg].lower(), digest)
+                logger.warning(str(e))
+                errors.append(e)
+        if not errors and on_verified is not None:
+            on_verified(path, full_path, found)
+        return errors
+
+    errors = []
+    hashed = 0
+    entries = iter(entries)
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while batch := list(itertools.islice(entries, workers * 64)):
+                for result in executor.map(verify, batch):
+                    errors.extend(result)
+                hashed += len(batch)
+    else:
+        for entry in entries:
+            errors.extend(verify(entry))
+            hashed += 1
+    if cache is not None:
+        cache.flush()
+    return (errors, hashed)
+
+
+class FixitySnapshot:
+    """Stat snapshots and digests of a bag's files from the last time they were hashed.
+
+    A file is current if its size, modification time and inode are unchanged, the digests
+    recorded for it still match the manifests, and it was verified within max_age. Current
+    files don't need to be hashed again.
+
+    Keyword arguments:
+    records -- mapping, or any object with a get method, from file paths relative to the
+    bag to dicts with size, mtime_ns, inode, digests and last_verified (a datetime)
+    max_age -- files verified longer ago than this are always hashed
+    """
+
+    def __init__(self, records: dict, max_age: timedelta):
+        self.records = records
+        self.max_age = max_age
+        self.updated = {}
+        self.now = datetime.now()
+
+    def is_current(self, path: str, full_path: str, expected: dict) -> bool:
+        record = self.records.get(path)
+        if record is None or self.now - record["last_verified"] > self.max_age:
+            return False
+        try:
+            stat = os.stat(full_path)
+        except OSError:
+            return False
+        return (
+            record["size"] == stat.st_size
+            and record["mtime_ns"] == stat.st_mtime_ns
+            and record["inode"] == stat.st_ino
+            and all(record["digests"].get(alg) == expected[alg].lower() for alg in expected)
+        )
+
+    def update(self, path: str, full_path: str, digests: dict) -> None:
+        stat = os.stat(full_path)
+        self.updated[path] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "inode": stat.st_ino,
+            "digests": digests,
+            "last_verified": self.now,
+        }
+
+
+def copy_and_hash_file(
+    source: str, destination: str, algorithms: list, block_size: int = COPY_BLOCK_SIZE
+) -> tuple[dict, int]:
+    """Copies a file while updating a digest for each algorithm from the same buffer.
+    Returns a tuple of hex digests keyed by algorithm and the number of bytes copied.
+
+    Keyword arguments:
+    source -- file to read
+    destination -- file to write, will be overwritten
+    algorithms -- hashlib algorithm names
+    block_size -- size of each read (default 1 MiB)
+    """
+    hashers = {alg: hashlib.new(alg) for alg in algorithms}
+    byte_count = 0
+    with open(source, "rb") as src, open(destination, "wb") as dst:
+        while True:
+            block = src.read(block_size)
+            if not block:
+                break
+            for hasher in hashers.values():
+                hasher.update(block)
+            dst.write(block)
+            byte_count += len(block)
+    shutil.copystat(source, destination)
+    digests = {alg: hasher.hexdigest() for alg, hasher in hashers.items()}
+    return (digests, byte_count)
+
+
+def manifest_sort_key(path: str) -> list:
+    """Sort key that puts "/" separated payload paths in the order bagit.make_bag writes
+    them, a top-down os.walk with sorted names, so each directory's files come before its
+    subdirectories. Manifests written in another order hash differently, which would stop
+    duplicate transfers being found by manifest hash."""
+    *dirs, name = path.split("/")
+    return [(1, d) for d in dirs] + [(0, name)]
+
+
+def write_tagmanifests(bag_dir: str, algorithms: list, encoding: str = "utf-8") -> None:
+    """Writes a tag manifest for each algorithm covering every tag file in bag_dir, as
+    bagit does, without changing the working directory."""
+    tag_files = []
+    for root, dirs, files in os.walk(bag_dir):
+        if root == bag_dir:
+            dirs[:] = [d for d in dirs if d != "data"]
+        for file in files:
+            if file.startswith("tagmanifest-"):
+                continue
+            tag_files.append(
+                os.path.relpath(os.path.join(root, file), bag_dir).replace(os.sep, "/")
+            )
+    for alg in algorithms:
+        lines = []
+        for tag_file in sorted(tag_files):
+            hasher = hashlib.new(alg)
+            with open(os.path.join(bag_dir, tag_file), "rb") as f:
+                for chunk in iter(lambda: f.read(COPY_BLOCK_SIZE), b""):
+                    hasher.update(chunk)
+            lines.append(f"{hasher.hexdigest()} {tag_file}\n")
+        tagmanifest = os.path.join(bag_dir, f"tagmanifest-{alg}.txt")
+        with bagit.open_text_file(tagmanifest, "w", encoding=encoding) as f:
+            f.writelines(lines)
+
+
+def save_bag_info(bag: bagit.Bag) -> None:
+    """Writes a bag's metadata to bag-info.txt and updates its tag manifests, like
+    bagit.Bag.save, which changes the working directory of the whole process while
+    it runs and so isn't safe to call while other threads use relative paths."""
+    bagit._make_tag_file(os.path.join(bag.path, bag.tag_file_name), bag.info)
+    write_tagmanifests(bag.path, bag.algorithms, bag.encoding)
+    bag._load_manifests()
+
+
+def write_bag_files(
+    bag_dir: str, entries: dict, metadata: dict, algorithms: list
+) -> bagit.Bag:
+    """Writes the bag declaration, manifests, bag-info.txt and tag manifests for a payload
+    that is already in bag_dir/data. Unlike bagit.make_bag this doesn't rehash the payload
+    or change the working directory.
+
+    Keyword arguments:
+    bag_dir -- path to the bag
+    entries -- maps each payload path (relative to bag_dir, "/" separated) to a tuple of
+    digests keyed by algorithm and size in bytes
+    metadata -- values for bag-info.txt
+    algorithms -- hashlib algorithm names, each must be present in the entry digests
+    """
+    with bagit.open_text_file(os.path.join(bag_dir, "bagit.txt"), "w") as f:
+        f.write("BagIt-Version: 0.97\nTag-File-Character-Encoding: UTF-8\n")
+
+    paths = sorted(entries.keys(), key=manifest_sort_key)
+    for alg in algorithms:
+        manifest = os.path.join(bag_dir, f"manifest-{alg}.txt")
+        with bagit.open_text_file(manifest, "w") as f:
+            for path in paths:
+                digests, size = entries[path]
+                f.write(f"{digests[alg]}  {bagit._encode_filename(path)}\n")
+
+    bag_info = dict(metadata)
+    if BAGGING_DATE not in bag_info:
+        bag_info[BAGGING_DATE] = time.strftime("%Y-%m-%d")
+    if "Bag-Software-Agent" not in bag_info:
+        bag_info["Bag-Software-Agent"] = (
+            f"bagit.py v{bagit.VERSION} <{bagit.PROJECT_URL}>"
+        )
+    total_bytes = sum(size for digests, size in entries.values())
+    bag_info["Payload-Oxum"] = f"{total_bytes}.{len(entries)}"
+    bagit._make_tag_file(os.path.join(bag_dir, "bag-info.txt"), bag_info)
+
+    write_tagmanifests(bag_dir, algorithms)
+
+    return bagit.Bag(bag_dir)
+
+
+def make_bag_in_place(
+    bag_dir: str, metadata: dict, algorithms: list
+) -> tuple[bagit.Bag, dict]:
+    """Converts a folder into a bag in the same way as bagit.make_bag, without changing the
+    working directory. Returns a tuple of the bag and the payload entries used to write its
+    manifests (see write_bag_files).
+
+    Keyword arguments:
+    bag_dir -- folder to convert into a bag
+    metadata -- values for bag-info.txt
+    algorithms -- hashlib algorithm names for the manifests
+    """
+    bag_dir = os.path.abspath(bag_dir)
+    if not os.path.isdir(bag_dir):
+        raise RuntimeError(f"Bag directory {bag_dir} does not exist")
+    logger.info(f"Creating bag for directory {bag_dir}")
+
+    temp_data = tempfile.mkdtemp(dir=bag_dir)
+    for name in os.listdir(bag_dir):
+        full_path = os.path.join(bag_dir, name)
+        if full_path == temp_data:
+            continue
+        os.rename(full_path, os.path.join(temp_data, name))
+    data_dir = os.path.join(bag_dir, "data")
+    os.rename(temp_data, data_dir)
+    # permissions for the payload directory should match those of the original directory
+    os.chmod(data_dir, os.stat(bag_dir).st_mode)
+
+    cache = get_hash_cache()
+    entries = {}
+    for root, dirs, files in os.walk(data_dir):
+        dirs.sort()
+        files.sort()
+        for file in files:
+            full_path = os.path.join(root, file)
+            path = os.path.relpath(full_path, bag_dir).replace(os.sep, "/")
+            size = os.path.getsize(full_path)
+            entries[path] = (hash_file_cached(full_path, algorithms, cache), size)
+    if cache is not None:
+        cache.flush()
+    bag = write_bag_files(bag_dir, entries, metadata, algorithms)
+    return (bag, entries)
+
+
+def stream_bag(
+    source_folder: str, output_dir: str, metadata: dict, algorithms: list
+) -> bagit.Bag:
+    """Copies an unbagged folder into output_dir/data and makes output_dir a bag.
+
+    Each source file is read once: digests for every algorithm are updated from the
+    same buffer that is written to the destination, and the manifests are built from
+    those digests. Modification times are preserved. The source folder is not changed.
+
+    Keyword arguments:
+    source_folder -- unbagged folder to transfer
+    output_dir -- location of the new bag, created if it doesn't exist
+    metadata -- values for bag-info.txt
+    algorithms -- hashlib algorithm names for the manifests
+    """
+    logger.info(f"Streaming {source_folder} to new bag at {output_dir}")
+    data_dir = os.path.join(output_dir, "data")
+    os.makedirs(data_dir, exist_ok=True)
+    entries = {}
+    copied_dirs = []
+    for root, dirs, files in os.walk(source_folder):
+        # sorted so manifests are written in a stable order
+        dirs.sort()
+        files.sort()
+        relative_root = os.path.relpath(root, source_folder)
+        target_root = os.path.normpath(os.path.join(data_dir, relative_root))
+        os.makedirs(target_root, exist_ok=True)
+        copied_dirs.append((root, target_root))
+        for file in files:
+            target = os.path.join(target_root, file)
+            digests, byte_count = copy_and_hash_file(
+                os.path.join(root, file), target, algorithms
+            )
+            path = os.path.relpath(target, output_dir).replace(os.sep, "/")
+            entries[path] = (digests, byte_count)
+    # directory times are set last, as writing files inside them updates the mtime
+    for source_dir, target_dir in reversed(copied_dirs):
+        shutil.copystat(source_dir, target_dir)
+    logger.info(f"Streamed {len(entries)} files to {data_dir}")
+    return write_bag_files(output_dir, entries, metadata, algorithms)
+
+
 def compute_manifest_hash(folder: str, target_manifest="manifest-sha256.txt") -> str:
     """Creates a single hash using sha256 of a target manifest for comparing bag content similarity."""
     hash_sha256 = hashlib.sha256()
@@ -536,6 +1521,80 @@ def get_hash_algorithms(string_input) -> str:
     return valid_hashes
 
 
+def get_boolean_config(string_input, default: bool = False) -> bool:
+    """Parses an optional true/false setting from config."""
+    if string_input is None:
+        return default
+    return string_input.strip().lower() in ["1", "true", "yes", "on"]
+
+
+def get_quarterly_validation_mode(string_input) -> str:
+    """Parses QUARTERLY_VALIDATION, defaulting to "latest".
+
+    latest -- report on the most recent completed validation in the quarter
+    aggregate -- report on every completed validation in the quarter
+    full -- always validate the whole archive for the report
+    Both latest and aggregate run a validation if none was completed in the quarter.
+    """
+    modes = ["latest", "aggregate", "full"]
+    if string_input is None:
+        return "latest"
+    mode = string_input.strip().lower()
+    if mode not in modes:
+        logger.warning(f"Quarterly validation mode {string_input} not recognised. Using latest.")
+        return "latest"
+    return mode
+
+
+def get_fixity_max_age(string_input) -> timedelta:
+    """Parses FIXITY_MAX_AGE_DAYS. Returns None, meaning every file is hashed on every
+    validation run, if it isn't set or isn't a number."""
+    if string_input is None:
+        return None
+    try:
+        return timedelta(days=float(string_input))
+    except ValueError:
+        logger.warning(f"Fixity max age {string_input} isn't a number. Hashing all files.")
+        return None
+
+
+def get_worker_count(string_input, default: int = 1) -> int:
+    """Parses a worker count from config, falling back to the default if it isn't a positive integer."""
+    if string_input is None:
+        return default
+    try:
+        workers = int(string_input)
+    except ValueError:
+        logger.warning(f"Worker count {string_input} isn't an integer. Using {default}.")
+        return default
+    if workers < 1:
+        logger.warning(f"Worker count {workers} must be at least 1. Using {default}.")
+        return default
+    return workers
+
+
+def get_non_negative_int(string_input, default: int, name: str) -> int:
+    """Parses a setting that must be a whole number of zero or more, falling back to the
+    default if it isn't set or isn't valid.
+
+    Keyword arguments:
+    string_input -- value from config, or None if it isn't set
+    default -- value used if the setting is missing or invalid
+    name -- setting name used in warnings
+    """
+    if string_input is None:
+        return default
+    try:
+        value = int(string_input)
+    except ValueError:
+        logger.warning(f"{name} {string_input} isn't an integer. Using {default}.")
+        return default
+    if value < 0:
+        logger.warning(f"{name} {value} can't be negative. Using {default}.")
+        return default
+    return value
+
+
 def runfile_check(directory):
     runfile = os.path.join(directory, RUNNING)
 
@@ -567,16 +1626,22 @@ def parse_uuids(list):
     return valid
 
 
-def validate_bag_at(directory) -> tuple[list, list]:
+def validate_bag_at(
+    directory, fixity: FixitySnapshot = None, processes: int = 1
+) -> tuple[list, list]:
     """Multi-step process that validates the bag and returns a tuple of UUID and errors.
 
     Keyword arguments:
-    directory -- path to bag to be checked"""
+    directory -- path to bag to be checked
+    fixity -- optional snapshot of files verified by earlier runs. Unchanged files verified
+    recently are not hashed, and the snapshot is updated with every file that is.
+    processes -- number of files within the bag hashed at once (default 1)"""
     bag_uuid = []
     errors = []
 
+    # read bag-info.txt alone first, the manifests are only loaded to validate the bag
     try:
-        bag = bagit.Bag(directory)
+        info = read_bag_info(directory)
     except Exception as e:
         logger.error(f"Error validating bag {directory}: {e}")
         errors.append(f"{e}")
@@ -585,7 +1650,7 @@ def validate_bag_at(directory) -> tuple[list, list]:
 
     # try getting the UUID
     try:
-        bag_uuid = bag.info[UUID_ID]
+        bag_uuid = info[UUID_ID]
         if type(bag_uuid) == list:
             bag_uuid = parse_uuids(bag_uuid)
         else:
@@ -598,12 +1663,432 @@ def validate_bag_at(directory) -> tuple[list, list]:
         logger.error(f"Error parsing UUID from bag {directory}: {e}")
         errors.append("Bag UUID not present in bag-info.txt")
 
+    # the manifests are needed from here on, loaded into a compact index rather than a
+    # bagit.Bag so memory stays small for bags with millions of files
+    try:
+        index = ManifestIndex(directory)
+    except Exception as e:
+        logger.error(f"Error validating bag {directory}: {e}")
+        errors.append(f"{e}")
+        return (bag_uuid, errors)
+
     # finally try validating the bag
     try:
-        bag.validate()
+        # check completeness, then stream the entries through the shared hasher
+        index.check_completeness(info)
+        if fixity is None:
+            mismatches, hashed = verify_entries(index.entries(), workers=processes)
+        else:
+            mismatches, hashed = verify_entries(
+                index.entries(), fixity.is_current, fixity.update, processes
+            )
+        logger.info(
+            f"Hashed {hashed} of {len(index)} files in {directory}, others unchanged since last verified."
+        )
+        if mismatches:
+            raise bagit.BagValidationError("Bag validation failed", mismatches)
         logger.info(f"Validated bag at: {directory}")
-    except bagit.BagValidationError as e:
+    except bagit.BagError as e:
         logger.warning(f"Error validating bag at {directory} with UUID {bag_uuid}: {e}")
         errors.append(f"{e}")
 
     return (bag_uuid, errors)
+
+
+def list_transfer_dirs(archive_dir):
+    """Yields the collection/transfer folders in the archive directory, skipping loose
+    files at either level."""
+    with os.scandir(archive_dir) as collections:
+        for collection in collections:
+            if not collection.is_dir():
+                continue
+            with os.scandir(collection.path) as transfers:
+                for transfer in transfers:
+                    if transfer.is_dir():
+                        yield transfer.path
+
+
+def read_tag_file(path, encoding="utf-8-sig") -> dict:
+    """Parses a bagit tag file. Values are strings, or lists of strings for repeated tags,
+    as in bagit.Bag.info."""
+    tags = []
+    with open(path, "r", encoding=encoding) as f:
+        for line in f:
+            line = line.rstrip("\r\n")
+            if not line.strip():
+                continue
+            if line[0].isspace() and tags:
+                # indented lines continue the previous value, as bagit folds them
+                tags[-1][1] += line
+            elif ":" in line:
+                name, value = line.strip().split(":", 1)
+                tags.append([name.strip(), value])
+    info = {}
+    for name, value in tags:
+        value = value.strip()
+        if name not in info:
+            info[name] = value
+        elif isinstance(info[name], list):
+            info[name].append(value)
+        else:
+            info[name] = [info[name], value]
+    return info
+
+
+def read_bag_declaration(directory) -> dict:
+    """Reads a bag's bagit.txt. Raises bagit.BagError if the directory isn't a bag."""
+    bagit_file_path = os.path.abspath(os.path.join(directory, "bagit.txt"))
+    if not os.path.isfile(bagit_file_path):
+        raise bagit.BagError(f"Expected bagit.txt does not exist: {bagit_file_path}")
+    return read_tag_file(bagit_file_path)
+
+
+def read_bag_info(directory) -> dict:
+    """Reads a bag's bag-info.txt without loading its manifests, which bagit.Bag parses in
+    full on open. Returns the same dictionary as bagit.Bag.info, which is empty if the bag
+    has no bag-info.txt. Raises bagit.BagError if the directory isn't a bag."""
+    declaration = read_bag_declaration(directory)
+    info_file_path = os.path.join(directory, "bag-info.txt")
+    if not os.path.isfile(info_file_path):
+        return {}
+    return read_tag_file(
+        info_file_path, declaration.get("Tag-File-Character-Encoding", "utf-8")
+    )
+
+
+def walk_payload_files(directory):
+    """Yields the path relative to the bag and os.DirEntry of each file in a bag's data
+    directory. As in bagit, symlinks to directories are neither followed nor counted."""
+    pending = ["data"]
+    while pending:
+        relative_dir = pending.pop()
+        with os.scandir(os.path.join(directory, relative_dir)) as entries:
+            for entry in entries:
+                relative_path = os.path.join(relative_dir, entry.name)
+                if entry.is_dir():
+                    if not entry.is_symlink():
+                        pending.append(relative_path)
+                else:
+                    yield (relative_path, entry)
+
+
+def payload_stats_at(directory) -> tuple[int, int]:
+    """Returns the total size and number of files in a bag's data directory from stat
+    alone, without reading any of the files."""
+    octets = 0
+    files = 0
+    for relative_path, entry in walk_payload_files(directory):
+        octets += entry.stat().st_size
+        files += 1
+    return (octets, files)
+
+
+def parse_payload_oxum(payload_oxum) -> tuple:
+    """Splits a Payload-Oxum of the form octet_count.file_count into integers.
+    Returns (None, None) if it can't be parsed."""
+    try:
+        octets, files = payload_oxum.split(".")
+        return (int(octets), int(files))
+    except (AttributeError, ValueError):
+        return (None, None)
+
+
+def check_bag_metadata_at(directory) -> tuple[list, tuple, list]:
+    """Quick check of a bag using only bag-info.txt and stat. Returns a tuple of UUIDs,
+    the payload size and file count found on disk, and errors.
+
+    Nothing is hashed, so this finds missing, misfiled and truncated bags and bags with the
+    wrong UUID, but not changed file contents. Use validate_bag_at for that.
+
+    Keyword arguments:
+    directory -- path to bag to be checked"""
+    bag_uuid = []
+    errors = []
+    try:
+        info = read_bag_info(directory)
+    except (bagit.BagError, OSError, UnicodeDecodeError, LookupError) as e:
+        logger.error(f"Error reading bag-info.txt in {directory}: {e}")
+        return (bag_uuid, (None, None), [f"{e}"])
+
+    bag_uuid = info.get(UUID_ID, [])
+    bag_uuid = parse_uuids(bag_uuid if type(bag_uuid) == list else [bag_uuid])
+    if len(bag_uuid) == 0:
+        errors.append("Bag UUID not present in bag-info.txt")
+    elif len(bag_uuid) > 1:
+        errors.append(f"Too many UUIDs parsed from bag: {';'.join(bag_uuid)}")
+
+    try:
+        found = payload_stats_at(directory)
+    except OSError as e:
+        logger.error(f"Error reading payload of {directory}: {e}")
+        errors.append(f"Could not read payload directory: {e}")
+        return (bag_uuid, (None, None), errors)
+
+    expected = parse_payload_oxum(info.get("Payload-Oxum"))
+    if expected == (None, None):
+        errors.append("Payload-Oxum missing or invalid in bag-info.txt")
+    elif expected != found:
+        errors.append(
+            f"Payload-Oxum validation failed. Expected {expected[1]} files and {expected[0]} bytes but found {found[1]} files and {found[0]} bytes"
+        )
+    return (bag_uuid, found, errors)
+
+
+# manifest lines sorted in memory at once before being spilled to a temporary file
+MANIFEST_SORT_CHUNK = 250000
+
+
+def read_manifest(path, algorithm, encoding="utf-8"):
+    """Yields the path and digest of each entry in a bagit manifest a line at a time,
+    parsed as bagit.Bag does. Raises bagit.BagError for paths outside the bag."""
+    with open(path, "r", encoding=encoding) as f:
+        for line in f:
+            line = line.strip().lstrip("\ufeff")
+            # ignore blank lines and comments
+            if line == "" or line.startswith("#"):
+                continue
+            entry = line.split(None, 1)
+            if len(entry) != 2:
+                logger.error(f"Invalid {algorithm} manifest entry in {path}: {line}")
+                continue
+            entry_path = os.path.normpath(entry[1].lstrip("*"))
+            entry_path = entry_path.replace("%0D", "\r").replace("%0A", "\n")
+            if (
+                os.path.isabs(entry_path)
+                or entry_path.split(os.sep)[0] == ".."
+                or os.path.expanduser(entry_path) != entry_path
+            ):
+                raise bagit.BagError(
+                    f'Path "{entry_path}" in manifest "{os.path.basename(path)}" is unsafe'
+                )
+            yield (entry_path, entry[0])
+
+
+def merge_sorted_chunks(records, chunk_size=MANIFEST_SORT_CHUNK):
+    """Yields byte strings in sorted order. Chunks of chunk_size are sorted in memory and
+    all but the last written to temporary files, then merged, so memory use is bounded by
+    the chunk size rather than the number of records."""
+    spilled = []
+    try:
+        while True:
+            chunk = list(itertools.islice(records, chunk_size))
+            chunk.sort()
+            if len(chunk) < chunk_size:
+                break
+            f = tempfile.TemporaryFile()
+            spilled.append(f)
+            for record in chunk:
+                f.write(len(record).to_bytes(4, "big"))
+                f.write(record)
+            f.seek(0)
+
+        def read_spilled(f):
+            while length := f.read(4):
+                yield f.read(int.from_bytes(length, "big"))
+
+        yield from heapq.merge(*[read_spilled(f) for f in spilled], chunk)
+    finally:
+        for f in spilled:
+            f.close()
+
+
+class ManifestIndex:
+    """Compact table of a bag's manifest and tag manifest entries, for validating bags with
+    millions of files.
+
+    bagit.Bag keeps a dict of paths to dicts of hex digest strings, which takes several GB
+    for millions of entries. Here the Unicode normalized paths are kept sorted in one
+    UTF-8 buffer with an array of offsets, so they can be binary searched, and each
+    algorithm's digests are kept in binary in one buffer in the same order. The manifests
+    are sorted with merge_sorted_chunks, so building the index doesn't hold every line in
+    memory either. An all zero digest marks a path missing from that algorithm's manifest.
+
+    Keyword arguments:
+    directory -- path to the bag
+    chunk_size -- manifest lines sorted in memory at once (default 250000)
+    """
+
+    def __init__(self, directory, chunk_size=MANIFEST_SORT_CHUNK):
+        self.path = os.path.abspath(directory)
+        declaration = read_bag_declaration(directory)
+        self.version = declaration.get("BagIt-Version", "")
+        self.encoding = declaration.get("Tag-File-Character-Encoding", "utf-8")
+        algorithms = sorted(bagit.CHECKSUM_ALGOS)
+        manifests = [f"manifest-{alg}.txt" for alg in algorithms]
+        self.manifest_files = [
+            name for name in manifests if os.path.isfile(os.path.join(self.path, name))
+        ]
+        if self.version_info >= (0, 97):
+            manifests += [f"tagmanifest-{alg}.txt" for alg in algorithms]
+        manifests = [
+            (name, name.split("-", 1)[1][:-4])
+            for name in manifests
+            if os.path.isfile(os.path.join(self.path, name))
+        ]
+        self.algorithms = list(dict.fromkeys(alg for name, alg in manifests))
+        self.digest_sizes = {alg: hashlib.new(alg).digest_size for alg in self.algorithms}
+        self.paths = bytearray()
+        self.offsets = array("Q", [0])
+        self.digests = {alg: bytearray() for alg in self.algorithms}
+        # filesystem names that differ from their normalized form, found by check_completeness
+        self.filesystem_names = {}
+        self._build(manifests, chunk_size)
+
+    @property
+    def version_info(self) -> tuple:
+        try:
+            return tuple(int(i) for i in self.version.split(".", 1))
+        except ValueError:
+            raise bagit.BagError(
+                f"Bag version numbers must be MAJOR.MINOR numbers, not {self.version}"
+            )
+
+    def _records(self, manifests):
+        """Yields one record per manifest line, the normalized path then a NUL separator,
+        the algorithm's position in self.algorithms and the binary digest."""
+        for name, alg in manifests:
+            alg_byte = bytes([self.algorithms.index(alg)])
+            for path, digest in read_manifest(
+                os.path.join(self.path, name), alg, self.encoding
+            ):
+                try:
+                    digest = bytes.fromhex(digest)
+                except ValueError:
+                    digest = b""
+                if len(digest) != self.digest_sizes[alg]:
+                    raise bagit.BagError(f"Invalid {alg} digest for {path} in {name}")
+                key = bagit.normalize_unicode(path).encode("utf-8")
+                yield key + b"\0" + alg_byte + digest
+
+    def _build(self, manifests, chunk_size) -> None:
+        key = None
+        digests = {}
+        for record in merge_sorted_chunks(self._records(manifests), chunk_size):
+            record_key, record = record.split(b"\0", 1)
+            if record_key != key:
+                if key is not None:
+                    self._append(key, digests)
+                key = record_key
+                digests = {}
+            alg = self.algorithms[record[0]]
+            if alg in digests:
+                message = f"{alg} manifest lists {key.decode()} multiple times"
+                if digests[alg] != record[1:]:
+                    raise bagit.BagError(f"{message} with conflicting values")
+                if self.version_info >= (1,):
+                    raise bagit.BagError(f"{message} with the same value")
+                logger.warning(f"{message} with the same value")
+            digests[alg] = record[1:]
+        if key is not None:
+            self._append(key, digests)
+
+    def _append(self, key: bytes, digests: dict) -> None:
+        self.paths += key
+        self.offsets.append(len(self.paths))
+        for alg, buffer in self.digests.items():
+            buffer += digests.get(alg, bytes(self.digest_sizes[alg]))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def _key(self, i) -> bytes:
+        return bytes(self.paths[self.offsets[i] : self.offsets[i + 1]])
+
+    def get_path(self, i) -> str:
+        return self._key(i).decode("utf-8")
+
+    def find(self, path: str) -> int:
+        """Returns the position of a path in the index, or -1 if it isn't listed."""
+        key = bagit.normalize_unicode(path).encode("utf-8")
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self) and self._key(low) == key:
+            return low
+        return -1
+
+    def get_expected(self, i) -> dict:
+        """Returns the hex digests listed for the entry at position i, keyed by algorithm."""
+        expected = {}
+        for alg, buffer in self.digests.items():
+            size = self.digest_sizes[alg]
+            digest = buffer[i * size : (i + 1) * size]
+            if any(digest):
+                expected[alg] = digest.hex()
+        return expected
+
+    def entries(self):
+        """Yields (path, full_path, expected digests) for every entry, in sorted order."""
+        for i in range(len(self)):
+            path = self.get_path(i)
+            full_path = os.path.join(self.path, self.filesystem_names.get(path, path))
+            yield (path, full_path, self.get_expected(i))
+
+    def check_completeness(self, info: dict) -> None:
+        """Checks the bag's structure, Payload-Oxum and that its files match its manifests,
+        as bagit.Bag.validate(completeness_only=True) does, in one walk of the payload.
+        Raises bagit.BagValidationError if they don't.
+
+        Keyword arguments:
+        info -- the bag's bag-info.txt, from read_bag_info
+        """
+        data_dir_path = os.path.join(self.path, "data")
+        if not os.path.isdir(data_dir_path):
+            raise bagit.BagValidationError(
+                f"Expected data directory {data_dir_path} does not exist"
+            )
+        if not self.manifest_files:
+            raise bagit.BagValidationError("No manifest files found")
+        with open(os.path.join(self.path, "bagit.txt"), "rb") as f:
+            if f.read(4).startswith(b"\xef\xbb\xbf"):
+                raise bagit.BagValidationError("bagit.txt must not contain a byte-order mark")
+
+        # one byte per entry recording whether it was found on the filesystem
+        found = bytearray(len(self))
+        unexpected = []
+        total_bytes = 0
+        total_files = 0
+        for relative_path, entry in walk_payload_files(self.path):
+            total_bytes += entry.stat().st_size
+            total_files += 1
+            normalized = bagit.normalize_unicode(relative_path)
+            if normalized != relative_path:
+                self.filesystem_names[normalized] = relative_path
+            i = self.find(normalized)
+            if i == -1:
+                unexpected.append(relative_path)
+            else:
+                found[i] = 1
+
+        oxum = info.get("Payload-Oxum")
+        if isinstance(oxum, list):
+            logger.warning("bag-info.txt defines multiple Payload-Oxum values!")
+            oxum = oxum[0]
+        if oxum is not None:
+            oxum_byte_count, _, oxum_file_count = oxum.partition(".")
+            if not oxum_byte_count.isdigit() or not oxum_file_count.isdigit():
+                raise bagit.BagError(f"Malformed Payload-Oxum value: {oxum}")
+            if (int(oxum_file_count), int(oxum_byte_count)) != (total_files, total_bytes):
+                raise bagit.BagValidationError(
+                    f"Payload-Oxum validation failed. Expected {int(oxum_file_count)} files and {int(oxum_byte_count)} bytes but found {total_files} files and {total_bytes} bytes"
+                )
+
+        errors = []
+        i = found.find(0)
+        while i != -1:
+            path = self.get_path(i)
+            # tag files aren't in the payload walk, so check them directly
+            if path.startswith("data" + os.sep) or not os.path.isfile(
+                os.path.join(self.path, path)
+            ):
+                errors.append(bagit.FileMissing(path))
+            i = found.find(0, i + 1)
+        errors.extend(bagit.UnexpectedFile(path) for path in unexpected)
+        for e in errors:
+            logger.warning(str(e))
+        if errors:
+            raise bagit.BagValidationError("Bag is incomplete", errors)
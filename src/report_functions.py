@@ -65,15 +65,47 @@ class ValidationReport(ReportType):
         return html_start + html_body
 
 
+    def build_report_between(self, validation_db, start, end=datetime.now().strftime('%Y-%m-%d')) -> str:
+        """Summarises every completed full validation action started between two dates, in
+        the format YYYY-MM-DD, with one row per bag aggregating its outcomes across those runs.
+        """
+        window = (
+            "SELECT ValidationActionsId FROM ValidationActions WHERE Status='Complete' "
+            "AND ActionType='Full' AND StartAction >= ? AND StartAction < date(?, '+1 day')"
+        )
+        html_start = html_header("Validation Report")
+        with get_db_connection(validation_db) as con:
+            actions = pd.read_sql_query(
+                "SELECT * FROM ValidationActions WHERE ValidationActionsId IN "
+                f"({window}) ORDER BY ValidationActionsId",
+                con,
+                params=(start, end),
+            )
+            outcomes = pd.read_sql_query(
+                "SELECT BagPath, MAX(BagUUID) AS BagUUID, COUNT(*) AS TimesChecked, "
+                "SUM(Outcome = 'Fail') AS TimesFailed, MAX(EndTime) AS LastChecked, "
+                "(SELECT Outcome FROM ValidationOutcome AS latest WHERE latest.BagPath = o.BagPath "
+                f"AND latest.ValidationActionsId IN ({window}) "
+                "ORDER BY latest.ValidationActionsId DESC LIMIT 1) AS LastOutcome "
+                f"FROM ValidationOutcome AS o WHERE ValidationActionsId IN ({window}) "
+                "GROUP BY BagPath ORDER BY TimesFailed DESC, BagPath",
+                con,
+                params=(start, end, start, end),
+            )
+        html_body = f"<body><h2>Validation actions between {start} and {end}</h2>{actions.to_html()}"
+        html_body += f"<h2>Validation outcomes by bag</h2>{outcomes.to_html()}</body></html>"
+        return html_start + html_body
+
+
 class TransferReport(ReportType):
     """
     Generates transfer reports
     """
 
-    def _get_data(self, db, query) -> pd.DataFrame:
+    def _get_data(self, db, query, params=()) -> pd.DataFrame:
         with get_db_connection(db) as con:
-            df = pd.read_sql_query(query, con)
-            df = self._tidy_transfer_df(df)
+            df = pd.read_sql_query(query, con, params=params)
+        df = self._tidy_transfer_df(df)
         return df
 
     def _build_html(self, df, title="Records of transfer") -> str:
@@ -92,11 +124,25 @@ class TransferReport(ReportType):
     def build_report_between(self, transfer_db, start, end=datetime.now().strftime('%Y-%m-%d')) -> str:
         """Specify a time bounding in the format YYYY-MM-DD
         """
-        df = self._get_data(transfer_db, "Select * from transfers")
-        df['filter_date'] = pd.to_datetime(df['TransferDate'])
-        df_filtered = df[df['filter_date'].dt.strftime('%Y-%m-%d').between(start, end)]
-        df_final = df_filtered.drop('filter_date',axis=1)
-        return self._build_html(df_final, f"Records of transfer between {start} and {end}")
+        df = self._get_data(
+            transfer_db,
+            "Select * from transfers WHERE TransferDate >= ? AND TransferDate < date(?, '+1 day') ORDER BY TransferID",
+            (start, end),
+        )
+        return self._build_html(df, f"Records of transfer between {start} and {end}")
+
+    def build_summary_between(self, transfer_db, start_month, end_month) -> str:
+        """Totals for the months between start_month and end_month inclusive, in the format
+        YYYY-MM, read from the MonthlySummary table."""
+        summary = get_monthly_summary(start_month, end_month, transfer_db)
+        html_body = f"<h2>Summary of transfers from {start_month} to {end_month}</h2>"
+        html_body += "<table border=\"1\" class=\"dataframe\">"
+        html_body += f"<tr><th>Transfers</th><td>{summary['TransferCount']}</td></tr>"
+        html_body += f"<tr><th>Size</th><td>{self._round_up_units(summary['TotalBytes'])}</td></tr>"
+        html_body += f"<tr><th>Files</th><td>{summary['TotalFiles']}</td></tr>"
+        html_body += f"<tr><th>Transfer time (seconds)</th><td>{summary['TotalSeconds']:.0f}</td></tr>"
+        html_body += "</table>"
+        return html_body
 
     def _round_up_units(self, value):
         if int(value) < 1024:
@@ -109,15 +155,15 @@ class TransferReport(ReportType):
             return f"{(int(value) / (1024 ** 3)):.3f} GiB"
 
     def _tidy_transfer_df(self, dataframe):
-        dataframe[["Bytes", "FileCount"]] = dataframe.PayloadOxum.str.split(
-            ".", expand=True
+        dataframe = dataframe.rename(
+            columns={
+                "PayloadFileCount": "FileCount",
+                "DurationSeconds": "TransferTimeSeconds",
+            }
+        )
+        dataframe.loc[:, "Size"] = dataframe.PayloadBytes.apply(
+            lambda value: self._round_up_units(value) if pd.notna(value) else None
         )
-        dataframe.loc[:, "Size"] = dataframe.Bytes.apply(self._round_up_units)
-        dataframe["StartTime"] = pd.to_datetime(dataframe.StartTime, format="ISO8601")
-        dataframe["EndTime"] = pd.to_datetime(dataframe.EndTime, format="ISO8601")
-        dataframe.loc[:, "TransferTimeSeconds"] = (
-            dataframe.EndTime - dataframe.StartTime
-        ).dt.total_seconds()
         col_order = [
             "TransferID",
             "TransferDate",
@@ -117,4 +117,172 @@ def test_invalid_bag_handling(stable_path, invalid_bag, mock_config, monkeypatch
         and len(in_transfer) == 2
         and not os.path.exists(in_appraisal)
         and os.path.exists(error_file)
-    )
\ No newline at end of file
+    )
+
+def test_registry_blocks_in_progress_duplicate(mock_config):
+    database = mock_config.get("DATABASE")
+    configure_transfer_db(database)
+    registry = TransferRegistry()
+    first = registry.claim("abc", "folder_a", database)
+    second = registry.claim("abc", "folder_b", database)
+    assert first is None
+    assert second == "an identical transfer is in progress from folder folder_a"
+
+
+def test_registry_release_allows_claim(mock_config):
+    database = mock_config.get("DATABASE")
+    configure_transfer_db(database)
+    registry = TransferRegistry()
+    registry.claim("abc", "folder_a", database)
+    registry.release("abc")
+    assert registry.claim("abc", "folder_b", database) is None
+
+
+def test_group_by_collection(stable_path):
+    class StubTrigger:
+        def __init__(self, ids):
+            self.ids = ids
+
+        def get_metadata(self):
+            return {PRIMARY_ID: self.ids}
+
+    a = StubTrigger("RA-9999-99")
+    b = StubTrigger(["SC1234", "RA-9999-99"])
+    c = StubTrigger("SC1234")
+    groups = group_by_collection([a, b, c])
+    assert groups == {"RA-9999-99": [a, b], "SC1234": [c]}
+    # the identifiers are written to bag-info.txt in their original order
+    assert b.ids == ["SC1234", "RA-9999-99"]
+
+
+def test_process_collection_continues_after_error(mock_config, monkeypatch):
+    class StubTrigger:
+        def __init__(self, name):
+            self.name = name
+            self.error = None
+
+        def get_directory(self):
+            return self.name
+
+        def set_error(self, error):
+            self.error = error
+
+    def process(tf, config, registry):
+        if tf.name == "first":
+            raise TypeError("expected str, bytes or os.PathLike object, not NoneType")
+        return True
+
+    monkeypatch.setattr("bagit_transfer.process_trigger_file", process)
+    first, second = StubTrigger("first"), StubTrigger("second")
+    process_collection([first, second], mock_config, TransferRegistry())
+    assert first.error.startswith("Unexpected error processing transfer: expected str")
+    assert second.error is None
+
+
+def test_parallel_run_same_collection_in_order(stable_path, mock_config, monkeypatch):
+    transfer_dir = mock_config.get("TRANSFER_DIR")
+    archive_dir = mock_config.get("ARCHIVE_DIR")
+    for name in ["RA-9999-99_first", "RA-9999-99_second", "SC1234_third"]:
+        folder = os.path.join(transfer_dir, name)
+        os.mkdir(folder)
+        with open(os.path.join(folder, "file.txt"), "w") as f:
+            f.write(f"Text in {name}.")
+        with open(os.path.join(transfer_dir, f"{name}.ok"), "w") as f:
+            f.write("")
+
+    mock_config.update({"TRANSFER_WORKERS": "2"})
+    monkeypatch.setattr("bagit_transfer.load_config", lambda: mock_config)
+    with pytest.raises(SystemExit):
+        main()
+
+    assert sorted(os.listdir(os.path.join(archive_dir, "RA-9999-99"))) == ["t1", "t2"]
+    assert os.listdir(os.path.join(archive_dir, "SC1234")) == ["t1"]
+    assert os.listdir(transfer_dir) == []
+
+
+def test_streamed_run_bag(stable_path, mock_config, monkeypatch):
+    transfer_dir = mock_config.get("TRANSFER_DIR")
+    archive_dir = mock_config.get("ARCHIVE_DIR")
+    appraisal_dir = mock_config.get("APPRAISAL_DIR")
+    folder = os.path.join(transfer_dir, "RA-9999-99_streamed")
+    os.mkdir(folder)
+    with open(os.path.join(folder, "file.txt"), "w") as f:
+        f.write("Text in file.")
+    with open(os.path.join(transfer_dir, "RA-9999-99_streamed.ok"), "w") as f:
+        f.write("")
+
+    mock_config.update({"STREAM_TRANSFERS": "true"})
+    monkeypatch.setattr("bagit_transfer.load_config", lambda: mock_config)
+    with pytest.raises(SystemExit):
+        main()
+
+    output_bag = bagit.Bag(os.path.join(archive_dir, "RA-9999-99", "t1"))
+    database = mock_config.get("DATABASE")
+    assert output_bag.is_valid()
+    assert len(get_transfers_by_manifest_hash(compute_manifest_hash(output_bag.path), database)) == 1
+    assert os.listdir(transfer_dir) == []
+    assert os.path.isfile(os.path.join(appraisal_dir, "RA-9999-99_streamed", "file.txt"))
+
+
+def test_interrupted_transfer_resumes(stable_path, existing_bag, mock_config, monkeypatch):
+    transfer_dir = mock_config.get("TRANSFER_DIR")
+    archive_dir = mock_config.get("ARCHIVE_DIR")
+    shutil.move(str(existing_bag), transfer_dir)
+    with open(os.path.join(transfer_dir, "test_bag.ok"), "w") as f:
+        f.write("")
+    # a previous run copied the payload file before failing
+    output_dir = os.path.join(archive_dir, "RA-9999-99", "t1")
+    os.makedirs(os.path.join(output_dir, "data"))
+    source = os.path.join(transfer_dir, "test_bag", "data", "file.txt")
+    target = os.path.join(output_dir, "data", "file.txt")
+    shutil.copy2(source, target)
+    journal_path = get_journal_path(mock_config, os.path.join("RA-9999-99", "t1"))
+    journal = CopyJournal(journal_path, SET_UUID_1)
+    journal.record(
+        os.path.join("data", "file.txt"),
+        os.stat(source),
+        hash_file(source, ["sha256"]),
+        os.stat(target),
+    )
+
+    monkeypatch.setattr("bagit_transfer.load_config", lambda: mock_config)
+    with pytest.raises(SystemExit):
+        main()
+
+    assert bagit.Bag(output_dir).is_valid()
+    assert os.listdir(transfer_dir) == []
+    assert not os.path.exists(journal_path)
+
+
+def test_stale_journal_for_new_folder_is_removed(
+    stable_path, existing_bag, mock_config, monkeypatch
+):
+    transfer_dir = mock_config.get("TRANSFER_DIR")
+    archive_dir = mock_config.get("ARCHIVE_DIR")
+    shutil.move(str(existing_bag), transfer_dir)
+    with open(os.path.join(transfer_dir, "test_bag.ok"), "w") as f:
+        f.write("")
+    # left behind by a different bag whose output folder has since been removed
+    journal_path = get_journal_path(mock_config, os.path.join("RA-9999-99", "t1"))
+    CopyJournal(journal_path, "another-bag")
+
+    monkeypatch.setattr("bagit_transfer.load_config", lambda: mock_config)
+    with pytest.raises(SystemExit):
+        main()
+
+    assert bagit.Bag(os.path.join(archive_dir, "RA-9999-99", "t1")).is_valid()
+    assert os.listdir(transfer_dir) == []
+    assert not os.path.exists(journal_path)
+
+
+def test_copy_journal_stores_portable_paths(stable_path):
+    journal_path = os.path.join(stable_path, "journals", "t1.journal")
+    source = os.path.join(stable_path, "file.txt")
+    with open(source, "w") as f:
+        f.write("Text in file.")
+    journal = CopyJournal(journal_path, SET_UUID_1)
+    journal.record(os.path.join("data", "sub", "file.txt"), os.stat(source), {}, os.stat(source))
+    with open(journal_path) as f:
+        assert json.loads(f.readlines()[1])["path"] == "data/sub/file.txt"
+    reloaded = CopyJournal(journal_path, SET_UUID_1)
+    assert reloaded.get(os.path.join("data", "sub", "file.txt")) is not None
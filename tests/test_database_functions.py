@@ -1,4 +1,5 @@
 from src.database_functions import *
+from datetime import timedelta
 from src.helper_functions import compute_manifest_hash
 import pytest
 import shutil
@@ -88,14 +89,6 @@ def validation_db(stable_path):
     yield database
 
 
-@pytest.fixture()
-def configured_validation_db_started(validation_db):
-    configure_validation_db(validation_db)
-    time = "now"
-    validation_action_id = start_validation(time, validation_db)
-    yield (validation_db, validation_action_id)
-
-
 # test Transfer class
 def test_init_ValidationStatus_valid(transfers_db_with_entry, existing_bag, tmp_path):
     validation_status = ValidationStatus(
@@ -183,7 +176,14 @@ def test_configure_transfer_db(database_path):
         "SELECT name FROM sqlite_master WHERE type='table';"
     ).fetchall()
     tables = sorted(list(zip(*result))[0])
-    assert tables == ["Collections", "Transfers", "sqlite_sequence"]
+    assert tables == [
+        "CollectionSummary",
+        "Collections",
+        "MonthlySummary",
+        "SourceSummary",
+        "Transfers",
+        "sqlite_sequence",
+    ]
 
 
 def test_configure_transfer_db_twice_is_fine(database_path):
@@ -195,7 +195,14 @@ def test_configure_transfer_db_twice_is_fine(database_path):
         "SELECT name FROM sqlite_master WHERE type='table';"
     ).fetchall()
     tables = sorted(list(zip(*result))[0])
-    assert tables == ["Collections", "Transfers", "sqlite_sequence"]
+    assert tables == [
+        "CollectionSummary",
+        "Collections",
+        "MonthlySummary",
+        "SourceSummary",
+        "Transfers",
+        "sqlite_sequence",
+    ]
 
 
 # test_insert_transfer
@@ -215,7 +222,7 @@ def test_insert_transfer_valid_data_right_length_transfers(existing_bag, databas
     db = sqlite3.connect(database_path)
     cur = db.cursor()
     result = cur.execute("SELECT * FROM Transfers;").fetchall()
-    assert len(result[0]) == 13
+    assert len(result[0]) == 16
 
 
 def test_insert_transfer_valid_data_right_columns_transfers(
@@ -251,6 +258,9 @@ def test_insert_transfer_valid_data_right_columns_transfers(
         "OutcomeFolderTitle",
         "ContactName",
         "SourceOrganisation",
+        "PayloadBytes",
+        "PayloadFileCount",
+        "DurationSeconds",
     ]
 
 
@@ -306,25 +316,18 @@ def test_insert_transfer_valid_data_right_columns_collections(
 def test_validation_db_return_primary_key(validation_db):
     configure_validation_db(validation_db)
     time = "now"
-    validation_action_id = start_validation(time, validation_db)
-    validation_action_id_2 = start_validation(time, validation_db)
+    with ValidationWriter(validation_db) as writer:
+        validation_action_id = writer.start(time)
+    with ValidationWriter(validation_db) as writer:
+        validation_action_id_2 = writer.start(time)
     assert validation_action_id == 1 and validation_action_id_2 == 2
 
 
 def test_add_validation_outcome_updates_action_pass(validation_db):
     configure_validation_db(validation_db)
-    time = "now"
-    validation_action_id = start_validation(time, validation_db)
-    insert_validation_outcome(
-        validation_action_id,
-        "1234",
-        True,
-        None,
-        "bag/path",
-        "now",
-        "later",
-        validation_db,
-    )
+    with ValidationWriter(validation_db) as writer:
+        validation_action_id = writer.start("now")
+        writer.add_outcome("1234", True, None, "bag/path", "now", "later")
     db = sqlite3.connect(validation_db)
     cur = db.cursor()
     result_pass = cur.execute(
@@ -340,18 +343,9 @@ def test_add_validation_outcome_updates_action_pass(validation_db):
 
 def test_add_validation_outcome_updates_action_fail(validation_db):
     configure_validation_db(validation_db)
-    time = "now"
-    validation_action_id = start_validation(time, validation_db)
-    insert_validation_outcome(
-        validation_action_id,
-        "1234",
-        False,
-        None,
-        "bag/path",
-        "now",
-        "later",
-        validation_db,
-    )
+    with ValidationWriter(validation_db) as writer:
+        validation_action_id = writer.start("now")
+        writer.add_outcome("1234", False, None, "bag/path", "now", "later")
     db = sqlite3.connect(validation_db)
     cur = db.cursor()
     result_pass = cur.execute(
@@ -367,44 +361,466 @@ def test_add_validation_outcome_updates_action_fail(validation_db):
 
 def test_add_validation_outcome_updates_outcome(validation_db):
     configure_validation_db(validation_db)
-    time = "now"
-    validation_action_id = start_validation(time, validation_db)
-    insert_validation_outcome(
-        validation_action_id,
-        "2222",
-        True,
-        None,
-        "bag/path/1",
-        "now",
-        "later",
-        validation_db,
-    )
-    insert_validation_outcome(
-        validation_action_id,
-        "1234",
-        False,
-        "Error validating bag",
-        "bag/path",
-        "now",
-        "later",
-        validation_db,
-    )
+    with ValidationWriter(validation_db) as writer:
+        writer.start("now")
+        writer.add_outcome("2222", True, None, "bag/path/1", "now", "later")
+        writer.add_outcome("1234", False, "Error validating bag", "bag/path", "now", "later")
     db = sqlite3.connect(validation_db)
     cur = db.cursor()
     # OutcomeIdentifier, ValidationActionsId, BagUUID, Outcome, Errors, BagPath, StartTime, EndTime
     outcomes = cur.execute("SELECT * FROM ValidationOutcome;").fetchall()
-    print(outcomes[0])
     assert outcomes == [
         (1, 1, "2222", "Pass", None, "bag/path/1", "now", "later"),
         (2, 1, "1234", "Fail", "Error validating bag", "bag/path", "now", "later"),
     ]
 
 
-def test_end_validation_sets_status_to_complete(configured_validation_db_started):
-    validation_action_id = configured_validation_db_started[1]
-    end_validation(validation_action_id, "now", configured_validation_db_started[0])
-    db = sqlite3.connect(configured_validation_db_started[0])
+def test_end_validation_sets_status_to_complete(validation_db):
+    configure_validation_db(validation_db)
+    with ValidationWriter(validation_db) as writer:
+        writer.start("now")
+        writer.end("now")
+    db = sqlite3.connect(validation_db)
     cur = db.cursor()
     # ValidationActionsId INTEGER PRIMARY KEY AUTOINCREMENT, CountBagsValidated INT, CountBagsWithErrors INT, StartAction, EndAction, Status
     outcomes = cur.execute("SELECT * FROM ValidationActions;").fetchall()
     assert len(outcomes) == 1 and outcomes[0][5] == "Complete"
+
+
+def save_fixity(validation_db, fixity):
+    with ValidationWriter(validation_db) as writer:
+        writer.start("now")
+        writer.add_fixity(BAG_DIR, fixity.updated)
+
+
+def test_fixity_snapshot_round_trip(validation_db, existing_bag, stable_path):
+    configure_validation_db(validation_db)
+    fixity = FixitySnapshot({}, timedelta(days=30))
+    validate_bag_at(str(existing_bag), fixity)
+    assert "data/file.txt" in fixity.updated
+    save_fixity(validation_db, fixity)
+    loaded = load_fixity_snapshot(BAG_DIR, timedelta(days=30), validation_db)
+    assert loaded.records.get("data/file.txt") == fixity.updated["data/file.txt"]
+    assert loaded.records.get("data/other.txt") is None
+
+
+def test_fixity_records_read_in_batches(validation_db):
+    configure_validation_db(validation_db)
+    now = datetime.now()
+    records = {
+        f"data/{i}.txt": {"size": i, "mtime_ns": i, "inode": i, "digests": {}, "last_verified": now}
+        for i in range(5)
+    }
+    with get_db_connection(validation_db) as con:
+        con.executemany(UPSERT_FIXITY, fixity_rows(BAG_DIR, records))
+    fixity = FixityRecords(BAG_DIR, validation_db, batch_size=2)
+    assert fixity.get("data/0.txt")["size"] == 0
+    assert list(fixity.batch) == ["data/0.txt", "data/1.txt"]
+    assert fixity.get("data/1.txt")["size"] == 1
+    # a path after the batch reads the next one, and only that batch is kept
+    assert fixity.get("data/3.txt")["size"] == 3
+    assert list(fixity.batch) == ["data/3.txt", "data/4.txt"]
+    assert fixity.get("data/35.txt") is None
+    assert fixity.get("data/0.txt")["size"] == 0
+    assert fixity.get("other/1.txt") is None
+
+
+def test_fixity_snapshot_skips_unchanged_files(validation_db, existing_bag):
+    configure_validation_db(validation_db)
+    fixity = FixitySnapshot({}, timedelta(days=30))
+    validate_bag_at(str(existing_bag), fixity)
+    save_fixity(validation_db, fixity)
+    fixity = load_fixity_snapshot(BAG_DIR, timedelta(days=30), validation_db)
+    uuid, errors = validate_bag_at(str(existing_bag), fixity)
+    assert errors == [] and fixity.updated == {}
+
+
+def test_fixity_snapshot_rehashes_modified_files(validation_db, existing_bag, stable_path):
+    configure_validation_db(validation_db)
+    fixity = FixitySnapshot({}, timedelta(days=30))
+    validate_bag_at(str(existing_bag), fixity)
+    save_fixity(validation_db, fixity)
+    file = stable_path / BAG_DIR / "data" / "file.txt"
+    with open(file, "w") as f:
+        f.write("Text in fil3.")
+    fixity = load_fixity_snapshot(BAG_DIR, timedelta(days=30), validation_db)
+    uuid, errors = validate_bag_at(str(existing_bag), fixity)
+    assert len(errors) == 1 and "data/file.txt" not in fixity.updated
+
+
+def test_fixity_snapshot_rehashes_stale_files(validation_db, existing_bag):
+    configure_validation_db(validation_db)
+    fixity = FixitySnapshot({}, timedelta(days=30))
+    validate_bag_at(str(existing_bag), fixity)
+    save_fixity(validation_db, fixity)
+    fixity = load_fixity_snapshot(BAG_DIR, timedelta(days=0), validation_db)
+    uuid, errors = validate_bag_at(str(existing_bag), fixity)
+    assert errors == [] and "data/file.txt" in fixity.updated
+
+
+@pytest.fixture()
+def archive_with_transfers(stable_path, existing_bag):
+    archive = stable_path / "archive"
+    database = stable_path / "transfer.db"
+    configure_transfer_db(database)
+    for transfer in ["t1", "t2"]:
+        shutil.copytree(str(existing_bag), archive / "RA-9999-99" / transfer)
+        bag = bagit.Bag(str(archive / "RA-9999-99" / transfer))
+        insert_transfer(
+            os.path.join("RA-9999-99", transfer),
+            bag,
+            "RA-9999-99",
+            compute_manifest_hash(bag.path),
+            datetime.now(),
+            datetime.now(),
+            database,
+        )
+    yield (archive, database)
+
+
+@pytest.mark.parametrize("workers,processes", [(1, 1), (2, 2)])
+def test_run_validation_records_outcomes(
+    archive_with_transfers, validation_db, workers, processes
+):
+    archive, transfer_db = archive_with_transfers
+    configure_validation_db(validation_db)
+    action_id = run_validation(
+        validation_db, transfer_db, archive, workers=workers, processes=processes
+    )
+    db = sqlite3.connect(validation_db)
+    outcomes = db.execute(
+        "SELECT ValidationActionsId, Outcome, BagPath FROM ValidationOutcome"
+    ).fetchall()
+    assert sorted(outcomes) == [
+        (action_id, "Pass", os.path.join(archive, "RA-9999-99", "t1")),
+        (action_id, "Pass", os.path.join(archive, "RA-9999-99", "t2")),
+    ]
+
+
+def test_reconcile_archive_only_counts_passes(archive_with_transfers, validation_db):
+    archive, transfer_db = archive_with_transfers
+    configure_validation_db(validation_db)
+    action_id, failed = reconcile_archive(validation_db, transfer_db, archive)
+    assert failed == 0
+    db = sqlite3.connect(validation_db)
+    action = db.execute(
+        "SELECT CountBagsValidated, CountBagsWithErrors, Status, ActionType FROM ValidationActions WHERE ValidationActionsId=?",
+        (action_id,),
+    ).fetchone()
+    assert action == (2, 0, "Complete", "Reconcile")
+    assert db.execute("SELECT COUNT(*) FROM ValidationOutcome").fetchone() == (0,)
+
+
+def test_reconcile_archive_finds_changed_and_misfiled_bags(
+    archive_with_transfers, validation_db
+):
+    archive, transfer_db = archive_with_transfers
+    configure_validation_db(validation_db)
+    with open(archive / "RA-9999-99" / "t1" / "data" / "extra.txt", "w") as f:
+        f.write("Extra")
+    shutil.move(archive / "RA-9999-99" / "t2", archive / "RA-0000-00" / "t2")
+    action_id, failed = reconcile_archive(validation_db, transfer_db, archive)
+    assert failed == 3
+    db = sqlite3.connect(validation_db)
+    errors = dict(
+        db.execute(
+            "SELECT BagPath, Errors FROM ValidationOutcome WHERE ValidationActionsId=?",
+            (action_id,),
+        ).fetchall()
+    )
+    assert "Payload-Oxum validation failed" in errors[
+        os.path.join(archive, "RA-9999-99", "t1")
+    ]
+    misfiled = errors[os.path.join(archive, "RA-0000-00", "t2")]
+    assert "Bag path not found in transfers database." in misfiled
+    assert os.path.join("RA-9999-99", "t2") in misfiled
+    assert "not found on system" in errors[os.path.join("RA-9999-99", "t2")]
+
+
+def test_get_latest_validation_action_ignores_reconciliation(
+    archive_with_transfers, validation_db
+):
+    archive, transfer_db = archive_with_transfers
+    configure_validation_db(validation_db)
+    action_id, failed = reconcile_archive(validation_db, transfer_db, archive)
+    today = datetime.now().strftime("%Y-%m-%d")
+    assert get_latest_validation_action(today, today, validation_db) is None
+
+
+def test_validation_writer_batches_outcomes(validation_db):
+    configure_validation_db(validation_db)
+    with ValidationWriter(validation_db, batch_size=2) as writer:
+        action_id = writer.start("now")
+        writer.add_outcome("1111", True, None, "bag/path/1", "now", "later")
+        writer.add_outcome("2222", False, "Error", "bag/path/2", "now", "later")
+        writer.add_outcome("3333", True, None, "bag/path/3", "now", "later")
+        db = sqlite3.connect(validation_db)
+        # the first two are written once the batch fills, the third is still buffered
+        assert db.execute("SELECT COUNT(*) FROM ValidationOutcome").fetchone() == (2,)
+        writer.end("later")
+    action = db.execute("SELECT * FROM ValidationActions").fetchall()
+    assert action == [(action_id, 2, 1, "now", "later", "Complete", "Full")]
+    assert db.execute("SELECT COUNT(*) FROM ValidationOutcome").fetchone() == (3,)
+
+
+def test_validation_writer_batches_fixity_rows(validation_db):
+    configure_validation_db(validation_db)
+    now = datetime.now()
+    records = {
+        f"data/{i}.txt": {"size": i, "mtime_ns": i, "inode": i, "digests": {}, "last_verified": now}
+        for i in range(5)
+    }
+    with ValidationWriter(validation_db, fixity_batch_size=2) as writer:
+        writer.start("now")
+        writer.add_fixity(BAG_DIR, records)
+        db = sqlite3.connect(validation_db)
+        assert db.execute("SELECT COUNT(*) FROM FileFixity").fetchone() == (4,)
+        assert len(writer.fixity) == 1
+    assert db.execute("SELECT COUNT(*) FROM FileFixity").fetchone() == (5,)
+
+
+def test_validation_writer_keeps_outcomes_when_locked(validation_db, monkeypatch):
+    configure_validation_db(validation_db)
+    db = sqlite3.connect(validation_db, timeout=0)
+    delays = []
+    monkeypatch.setattr(time, "sleep", delays.append)
+    with pytest.raises(RuntimeError):
+        with ValidationWriter(validation_db) as writer:
+            writer.con.execute("PRAGMA busy_timeout=0")
+            writer.start("now")
+            writer.add_outcome("1111", False, "Error", "bag/path/1", "now", "later")
+            db.execute("BEGIN IMMEDIATE")
+            with pytest.raises(sqlite3.OperationalError):
+                writer.flush()
+            assert delays == [1, 2, 4]
+            db.rollback()
+            writer.add_outcome("2222", False, "Error", "bag/path/2", "now", "later")
+            raise RuntimeError("validation stopped")
+    # nothing buffered is lost, and the action is marked failed rather than left running
+    assert db.execute("SELECT BagUUID FROM ValidationOutcome").fetchall() == [("1111",), ("2222",)]
+    action = db.execute("SELECT CountBagsWithErrors, Status FROM ValidationActions").fetchone()
+    assert action == (2, "Failed")
+
+
+def test_get_transfers_not_in_handles_many_paths(transfers_db_with_entry):
+    # more paths than SQLite allows as query parameters
+    paths = {f"collection/t{i}" for i in range(40000)}
+    missing = list(get_transfers_not_in(paths, transfers_db_with_entry))
+    assert [m[2] for m in missing] == [BAG_DIR]
+    paths.add(BAG_DIR)
+    assert list(get_transfers_not_in(paths, transfers_db_with_entry)) == []
+
+
+def test_configure_transfer_db_migrates_existing_db(database_path):
+    # a database created before indexes were added
+    db = sqlite3.connect(database_path)
+    db.execute(
+        "CREATE TABLE Transfers(TransferID INTEGER PRIMARY KEY AUTOINCREMENT, CollectionIdentifier, BagUUID, TransferDate, BagDate, PayloadOxum, ManifestSHA256Hash, StartTime, EndTime, OriginalFolderTitle, OutcomeFolderTitle, ContactName, SourceOrganisation)"
+    )
+    db.commit()
+    db.close()
+    configure_transfer_db(database_path)
+    db = sqlite3.connect(database_path)
+    assert db.execute("PRAGMA user_version").fetchone()[0] == len(
+        TRANSFER_DB_MIGRATIONS
+    )
+    plan = db.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM transfers WHERE ManifestSHA256Hash=?", ("x",)
+    ).fetchall()
+    assert "idx_transfers_manifest_hash" in plan[0][3]
+
+
+def test_migrate_database_twice_is_fine(validation_db):
+    configure_validation_db(validation_db)
+    version = migrate_database(validation_db, VALIDATION_DB_MIGRATIONS)
+    assert version == len(VALIDATION_DB_MIGRATIONS)
+
+
+def test_concurrent_migrations_apply_each_step_once(database_path):
+    sqlite3.connect(database_path).execute("CREATE TABLE Example(Id)").close()
+    migrations = [
+        ["ALTER TABLE Example ADD COLUMN First"],
+        ["ALTER TABLE Example ADD COLUMN Second"],
+    ]
+    barrier = threading.Barrier(4)
+    errors = []
+
+    def migrate():
+        barrier.wait()
+        try:
+            migrate_database(database_path, migrations)
+        except sqlite3.DatabaseError as e:
+            errors.append(e)
+        finally:
+            close_db_connections()
+
+    threads = [threading.Thread(target=migrate) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    db = sqlite3.connect(database_path)
+    assert db.execute("PRAGMA user_version").fetchone()[0] == 2
+
+
+def test_get_db_connection_uses_wal_and_reuses_connection(database_path):
+    with get_db_connection(database_path) as con:
+        assert con.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+    with get_db_connection(database_path) as again:
+        assert again is con
+
+
+def test_get_db_connection_rolls_back_on_error(database_path):
+    configure_transfer_db(database_path)
+    with pytest.raises(ValueError):
+        with get_db_connection(database_path) as con:
+            con.execute("INSERT INTO Collections(CollectionIdentifier) VALUES ('RA-1')")
+            raise ValueError("Failed part way through")
+    db = sqlite3.connect(database_path)
+    assert db.execute("SELECT * FROM Collections").fetchall() == []
+
+
+def test_insert_transfer_records_payload_size(existing_bag, database_path):
+    configure_transfer_db(database_path)
+    start = datetime(2024, 1, 1, 10, 0, 0)
+    insert_transfer(
+        BAG_DIR,
+        existing_bag,
+        "RA-9999-99",
+        "hash",
+        start,
+        start + timedelta(seconds=90),
+        database_path,
+    )
+    db = sqlite3.connect(database_path)
+    result = db.execute(
+        "SELECT PayloadBytes, PayloadFileCount, DurationSeconds FROM Transfers"
+    ).fetchall()
+    assert result == [(13, 1, 90.0)]
+
+
+def test_migration_backfills_payload_size(database_path):
+    db = sqlite3.connect(database_path)
+    db.execute(
+        "CREATE TABLE Transfers(TransferID INTEGER PRIMARY KEY AUTOINCREMENT, CollectionIdentifier, BagUUID, TransferDate, BagDate, PayloadOxum, ManifestSHA256Hash, StartTime, EndTime, OriginalFolderTitle, OutcomeFolderTitle, ContactName, SourceOrganisation)"
+    )
+    db.execute(
+        "INSERT INTO Transfers(PayloadOxum, StartTime, EndTime) VALUES ('2048.3', '2024-01-01 10:00:00.000000', '2024-01-01 10:01:30.500000')"
+    )
+    db.commit()
+    db.close()
+    configure_transfer_db(database_path)
+    db = sqlite3.connect(database_path)
+    result = db.execute(
+        "SELECT PayloadBytes, PayloadFileCount, DurationSeconds FROM Transfers"
+    ).fetchall()
+    assert result == [(2048, 3, 90.5)]
+
+
+def test_insert_transfer_updates_summary_tables(existing_bag, database_path):
+    configure_transfer_db(database_path)
+    start = datetime(2024, 1, 1, 10, 0, 0)
+    for folder in ["t1", "t2"]:
+        insert_transfer(
+            folder,
+            existing_bag,
+            "RA-9999-99",
+            "hash",
+            start,
+            start + timedelta(seconds=30),
+            database_path,
+        )
+    db = sqlite3.connect(database_path)
+    assert db.execute("SELECT * FROM CollectionSummary").fetchall() == [
+        ("RA-9999-99", 2, 26, 2, 60.0)
+    ]
+    assert db.execute("SELECT * FROM SourceSummary").fetchall() == [
+        ("Home", 2, 26, 2, 60.0)
+    ]
+    month = time.strftime("%Y-%m")
+    assert get_monthly_summary(month, month, database_path) == {
+        "TransferCount": 2,
+        "TotalBytes": 26,
+        "TotalFiles": 2,
+        "TotalSeconds": 60.0,
+    }
+
+
+def test_summary_tables_merge_missing_keys(existing_bag, database_path):
+    configure_transfer_db(database_path)
+    for folder in ["t1", "t2"]:
+        insert_transfer(
+            folder, existing_bag, None, "hash", datetime.now(), datetime.now(), database_path
+        )
+    db = sqlite3.connect(database_path)
+    assert db.execute("SELECT CollectionIdentifier, TransferCount FROM CollectionSummary").fetchall() == [
+        ("", 2)
+    ]
+
+
+def test_migration_builds_summary_tables_with_missing_keys(database_path):
+    # a database created before the summary tables, at user_version 0
+    db = sqlite3.connect(database_path)
+    db.execute(
+        "CREATE TABLE Transfers(TransferID INTEGER PRIMARY KEY AUTOINCREMENT, CollectionIdentifier, BagUUID, TransferDate, BagDate, PayloadOxum, ManifestSHA256Hash, StartTime, EndTime, OriginalFolderTitle, OutcomeFolderTitle, ContactName, SourceOrganisation)"
+    )
+    db.executemany(
+        "INSERT INTO Transfers(CollectionIdentifier, TransferDate, PayloadOxum) VALUES (?, ?, ?)",
+        [(None, "2024-07-01 10:00:00", "10.1"), (None, "2024-07-02 10:00:00", "20.2")],
+    )
+    db.commit()
+    db.close()
+    configure_transfer_db(database_path)
+    db = sqlite3.connect(database_path)
+    assert db.execute("SELECT CollectionIdentifier, TransferCount, TotalBytes FROM CollectionSummary").fetchall() == [
+        ("", 2, 30)
+    ]
+    assert get_monthly_summary("2024-07", "2024-07", database_path)["TotalFiles"] == 3
+
+
+def test_rebuild_summary_tables_matches_incremental(existing_bag, database_path):
+    configure_transfer_db(database_path)
+    start = datetime(2024, 1, 1, 10, 0, 0)
+    insert_transfer(
+        "t1", existing_bag, "RA-9999-99", "hash", start, start, database_path
+    )
+    db = sqlite3.connect(database_path)
+    before = db.execute("SELECT * FROM MonthlySummary").fetchall()
+    rebuild_summary_tables(database_path)
+    assert db.execute("SELECT * FROM MonthlySummary").fetchall() == before
+
+
+def test_dump_database_tables_to_html_pages(validation_db, stable_path):
+    configure_validation_db(validation_db)
+    with ValidationWriter(validation_db) as writer:
+        writer.start("now")
+        for i in range(5):
+            writer.add_outcome(f"<uuid{i}>", True, None, f"bag/{i}", "now", "later")
+        writer.end("later")
+    output_dir = stable_path / "dump"
+    index = dump_database_tables_to_html_pages(
+        str(output_dir),
+        db_paths={"transfer": None, "validation": validation_db},
+        db_tables={"validation": ["ValidationOutcome"]},
+        page_size=2,
+    )
+    with open(index) as f:
+        assert "5 rows in 3 pages" in f.read()
+    with open(output_dir / "validation_ValidationOutcome_2.html") as f:
+        page = f.read()
+    assert "&lt;uuid2&gt;" in page and "&lt;uuid4&gt;" not in page
+    assert 'href="validation_ValidationOutcome_3.html"' in page
+    assert not os.path.exists(output_dir / "validation_ValidationOutcome_4.html")
+
+
+def test_get_latest_validation_action(validation_db):
+    configure_validation_db(validation_db)
+    for start, end in [("2024-07-02 01:00:00", "later"), ("2024-09-30 01:00:00", None)]:
+        with ValidationWriter(validation_db) as writer:
+            writer.start(start)
+            if end is not None:
+                writer.end(end)
+    # the second action never completed
+    assert get_latest_validation_action("2024-07-01", "2024-09-30", validation_db) == 1
+    assert get_latest_validation_action("2024-10-01", "2024-12-31", validation_db) is None
@@ -126,4 +126,51 @@ def test_catches_missing_file(stable_path, mock_config, simple_transfer, monkeyp
         error = ",".join(f.readlines())
     assert os.path.exists(expected)
     assert error.startswith(expected_error)
-    assert os.path.isfile(droid_report)
\ No newline at end of file
+    assert os.path.isfile(droid_report)
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_get_hashes_keeps_order_and_errors(tmp_path, workers):
+    for i in range(10):
+        with open(tmp_path / f"file{i}.txt", "w") as f:
+            f.write(f"Text in file {i}.")
+    os.mkdir(tmp_path / "unreadable")
+    paths = [str(tmp_path / f"file{i}.txt") for i in range(10)] + ["unreadable", "missing.txt"]
+    hashes = get_hashes(paths, str(tmp_path), workers)
+    assert hashes[:10] == [getHash(path, str(tmp_path)) for path in paths[:10]]
+    assert hashes[10].startswith("Error getting hash:")
+    # a missing file isn't also reported as a read error
+    assert hashes[11] == MISSING_FILE
+
+
+def test_check_completeness(tmp_path):
+    os.mkdir(tmp_path / "sub")
+    for name in ["a.txt", os.path.join("sub", "a.txt"), "extra.txt", "report.csv"]:
+        with open(tmp_path / name, "w") as f:
+            f.write("text")
+    report_paths = [
+        str(tmp_path / "a.txt"),
+        str(tmp_path / "sub" / "a.txt"),
+        str(tmp_path / "gone.txt"),
+    ]
+    errors = check_completeness(report_paths, str(tmp_path), "report.csv")
+    assert errors == [
+        "Manifest does not contain file: extra.txt",
+        "Manifest lists file not found in folder: gone.txt",
+    ]
+
+
+def test_read_droid_report_handles_ragged_rows_in_chunks(tmp_path):
+    report = tmp_path / "report.csv"
+    with open(report, "w") as f:
+        f.write('"ID","PARENT_ID","URI","FILE_PATH","NAME","METHOD","STATUS","SIZE","TYPE","EXT","LAST_MODIFIED","EXTENSION_MISMATCH","MD5_HASH","PUID"\n')
+        f.write('"1","","file:/a/","/a","a","","Done","","Folder","","x","false","",""\n')
+        f.write('"2","1","file:/a/b,c.txt","/a/b,c.txt","b,c.txt","Extension","Done","5","File","txt","x","false","abc","fmt/1","fmt/2"\n')
+        f.write('"3","1","file:/a/d.txt","/a/d.txt"\n')
+    chunks = list(read_droid_report(report, chunk_size=2))
+    assert [len(c.index) for c in chunks] == [2, 1]
+    assert list(chunks[0].columns) == DROID_COLUMNS
+    assert chunks[0].iloc[1].FILE_PATH == "/a/b,c.txt"
+    assert chunks[0].iloc[1].MD5_HASH == "abc"
+    assert chunks[0]["TYPE"].dtype == "category"
+    assert chunks[0].iloc[1].SIZE == 5
+    assert list(chunks[1].index) == [2] and chunks[1].iloc[0].MD5_HASH == ""
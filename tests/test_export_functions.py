@@ -0,0 +1,112 @@
+from src.export_functions import *
+import pytest
+import sqlite3
+
+
+@pytest.fixture
+def validation_db(tmp_path):
+    database = tmp_path / "validation.db"
+    configure_validation_db(database)
+    with ValidationWriter(database) as writer:
+        writer.start("now")
+        for i in range(5):
+            writer.add_outcome(f"uuid{i}", True, None, f"bag/{i}", "now", "later")
+        writer.end("later")
+    yield database
+
+
+def test_get_export_formats():
+    assert get_export_formats(None) == ["csv", "jsonl"]
+    assert get_export_formats("jsonl, xml") == ["jsonl"]
+    assert get_export_formats("xml") == ["csv"]
+
+
+def test_export_table_writes_chunks(validation_db, tmp_path):
+    output = tmp_path / "exports"
+    output.mkdir()
+    count, last_key = export_table(
+        validation_db, "ValidationOutcome", output, ["csv", "jsonl"], chunk_size=2
+    )
+    assert (count, last_key) == (5, 5)
+    csv_files = sorted(f for f in os.listdir(output) if f.endswith(".csv"))
+    assert len(csv_files) == 3
+    with open(output / sorted(f for f in os.listdir(output) if f.endswith(".jsonl"))[2]) as f:
+        rows = [json.loads(line) for line in f]
+    assert rows == [
+        {
+            "OutcomeIdentifier": 5,
+            "ValidationActionsId": 1,
+            "BagUUID": "uuid4",
+            "Outcome": "Pass",
+            "Errors": None,
+            "BagPath": "bag/4",
+            "StartTime": "now",
+            "EndTime": "later",
+        }
+    ]
+
+
+def test_export_history_is_incremental(validation_db, tmp_path):
+    output = tmp_path / "exports"
+    db_paths = {"transfer": None, "validation": validation_db}
+    assert export_history(db_paths, output, ["csv"]) == {"ValidationOutcome": 5}
+    assert export_history(db_paths, output, ["csv"]) == {"ValidationOutcome": 0}
+    with ValidationWriter(validation_db) as writer:
+        writer.start("now")
+        writer.add_outcome("uuid5", False, "Error", "bag/5", "now", "later")
+    assert export_history(db_paths, output, ["csv"]) == {"ValidationOutcome": 1}
+    assert load_export_state(output) == {"ValidationOutcome": 6}
+    assert export_history(db_paths, output, ["csv"], incremental=False) == {
+        "ValidationOutcome": 6
+    }
+
+
+def test_full_export_replaces_incremental_chunks(validation_db, tmp_path):
+    output = tmp_path / "exports"
+    db_paths = {"transfer": None, "validation": validation_db}
+    export_history(db_paths, output, ["csv", "jsonl"])
+    with ValidationWriter(validation_db) as writer:
+        writer.start("now")
+        writer.add_outcome("uuid5", False, "Error", "bag/5", "now", "later")
+    export_history(db_paths, output, ["csv", "jsonl"])
+    (output / "notes.csv").write_text("kept")
+    export_history(db_paths, output, ["csv", "jsonl"], incremental=False)
+    keys = []
+    for name in sorted(os.listdir(output)):
+        if name.startswith("ValidationOutcome_") and name.endswith(".jsonl"):
+            with open(output / name) as f:
+                keys.extend(json.loads(line)["OutcomeIdentifier"] for line in f)
+    assert sorted(keys) == [1, 2, 3, 4, 5, 6]
+    assert len([f for f in os.listdir(output) if f.startswith("ValidationOutcome_")]) == 2
+    assert (output / "notes.csv").exists()
+
+
+def test_get_column_types(validation_db):
+    with get_db_connection(validation_db) as con:
+        column_types = get_column_types(con, "ValidationOutcome")
+    assert column_types["OutcomeIdentifier"] == "integer"
+    assert column_types["BagUUID"] == "text"
+    assert convert_value(1000, "text") == "1000"
+    assert convert_value("12", "integer") == 12
+    assert convert_value("many", "integer") is None
+    assert convert_value(None, "real") is None
+
+
+def test_parquet_chunks_share_a_schema(tmp_path):
+    pytest.importorskip("pyarrow")
+    database = tmp_path / "transfer.db"
+    configure_transfer_db(database)
+    with get_db_connection(database) as con:
+        con.executemany(
+            "INSERT INTO Transfers(ContactName, PayloadBytes) VALUES (?, ?)",
+            [("Name", 10), (1000, 20), (None, None), (None, None)],
+        )
+    output = tmp_path / "exports"
+    output.mkdir()
+    export_table(database, "Transfers", output, ["parquet"], chunk_size=2)
+    schemas = [
+        pyarrow.parquet.read_schema(output / name) for name in sorted(os.listdir(output))
+    ]
+    assert len(schemas) == 2 and schemas[0] == schemas[1]
+    assert schemas[0].field("ContactName").type == pyarrow.string()
+    assert schemas[0].field("PayloadBytes").type == pyarrow.int64()
@@ -367,6 +367,40 @@ def test_get_hash_algorithms(input, expected):
     assert result == expected
 
 
+@pytest.mark.parametrize(
+    "input, expected",
+    [
+        ("4", 4),
+        (None, 1),
+        ("0", 1),
+        ("many", 1),
+    ],
+)
+def test_get_worker_count(input, expected):
+    result = get_worker_count(input)
+    assert result == expected
+
+
+@pytest.mark.parametrize(
+    "input, expected",
+    [
+        ("7", 7),
+        (None, 30),
+        ("0", 0),
+        ("-1", 30),
+        ("week", 30),
+    ],
+)
+def test_get_non_negative_int(input, expected):
+    result = get_non_negative_int(input, 30, "HASH_CACHE_TRUST_DAYS")
+    assert result == expected
+
+
+def test_get_non_negative_int_names_setting(caplog):
+    get_non_negative_int("week", 30, "HASH_CACHE_TRUST_DAYS")
+    assert "HASH_CACHE_TRUST_DAYS week isn't an integer" in caplog.text
+
+
 # test bag validation
 
 
@@ -397,6 +431,14 @@ def test_validate_bag_at_two_uuids(existing_bag):
     )
 
 
+def test_validate_bag_at_unreadable_manifest_keeps_uuid(existing_bag):
+    with open(os.path.join(existing_bag.path, "manifest-sha256.txt"), "ab") as f:
+        f.write(b"\xff\xfe data/file.txt\n")
+    uuid, errors = validate_bag_at(existing_bag.path)
+    assert uuid == [SET_UUID_1]
+    assert len(errors) == 1
+
+
 def test_validate_bag_at_valid(existing_bag):
     result = validate_bag_at(existing_bag.path)
     assert result == ([SET_UUID_1], [])
@@ -425,6 +467,107 @@ def test_validate_bag_at_no_baginfo(existing_bag):
     )
 
 
+def test_read_bag_info_matches_bagit(existing_bag):
+    with open(os.path.join(existing_bag.path, "bag-info.txt"), "a") as f:
+        f.write("External-Identifier: RA-9999-98\nExternal-Description: Wrapped\n  over two lines\n")
+    bag = bagit.Bag(existing_bag.path)
+    assert read_bag_info(existing_bag.path) == bag.info
+
+
+def test_check_bag_metadata_at_valid(existing_bag):
+    bag_uuid, found, errors = check_bag_metadata_at(existing_bag.path)
+    assert bag_uuid == [SET_UUID_1]
+    assert found == (13, 1)
+    assert errors == []
+
+
+def test_check_bag_metadata_at_changed_payload(existing_bag):
+    with open(os.path.join(existing_bag.path, "data", "file.txt"), "a") as f:
+        f.write("More text.")
+    bag_uuid, found, errors = check_bag_metadata_at(existing_bag.path)
+    assert found == (23, 1)
+    assert errors == [
+        "Payload-Oxum validation failed. Expected 1 files and 13 bytes but found 1 files and 23 bytes"
+    ]
+
+
+def test_check_bag_metadata_at_no_baginfo(existing_bag):
+    os.remove(os.path.join(existing_bag.path, "bag-info.txt"))
+    bag_uuid, found, errors = check_bag_metadata_at(existing_bag.path)
+    assert bag_uuid == [] and found == (13, 1)
+    assert errors == [
+        "Bag UUID not present in bag-info.txt",
+        "Payload-Oxum missing or invalid in bag-info.txt",
+    ]
+
+
+def test_check_bag_metadata_at_fake_path():
+    bag_uuid, found, errors = check_bag_metadata_at("path")
+    assert found == (None, None)
+    assert errors[0].startswith("Expected bagit.txt does not exist")
+
+
+def test_get_metadata_from_bag_does_not_load_manifests(existing_bag, id_parser):
+    # a manifest bagit can't parse doesn't matter when only metadata is needed
+    with open(os.path.join(existing_bag.path, "manifest-sha256.txt"), "ab") as f:
+        f.write(b"\xff\xfe data/file.txt\n")
+    with pytest.raises(UnicodeDecodeError):
+        bagit.Bag(existing_bag.path)
+    metadata = BagTransfer().build_metadata(existing_bag.path, id_parser)
+    assert metadata[UUID_ID] == SET_UUID_1
+
+
+@pytest.fixture
+def nested_bag(tmp_path):
+    dir = tmp_path / "nested_bag"
+    for i in range(7):
+        folder = dir / f"folder{i % 3}"
+        folder.mkdir(parents=True, exist_ok=True)
+        (folder / f"file{i}.txt").write_text(f"Text in file {i}.")
+    yield bagit.make_bag(dir, {UUID_ID: SET_UUID_1}, checksums=["md5", "sha256"])
+
+
+def test_manifest_index_matches_bagit_entries(nested_bag):
+    # a small chunk size sorts the manifests through temporary files
+    index = ManifestIndex(nested_bag.path, chunk_size=2)
+    assert len(index) == len(nested_bag.entries)
+    assert {path: expected for path, _, expected in index.entries()} == nested_bag.entries
+    assert index.find(os.path.join("data", "folder1", "file4.txt")) >= 0
+    assert index.find(os.path.join("data", "folder1", "file5.txt")) == -1
+
+
+def test_manifest_index_rejects_conflicting_entries(nested_bag):
+    with open(os.path.join(nested_bag.path, "manifest-md5.txt"), "a") as f:
+        f.write(f"{'0' * 31}1  data/folder0/file0.txt\n")
+    with pytest.raises(bagit.BagError, match="conflicting values"):
+        ManifestIndex(nested_bag.path, chunk_size=2)
+
+
+def test_validate_bag_at_reports_same_errors_as_bagit(nested_bag):
+    data = os.path.join(nested_bag.path, "data")
+    os.remove(os.path.join(data, "folder0", "file0.txt"))
+    with open(os.path.join(data, "folder2", "extra.txt"), "w") as f:
+        f.write("Extra")
+    with pytest.raises(bagit.BagValidationError) as expected:
+        # keep the Payload-Oxum check from failing first
+        nested_bag.info.pop("Payload-Oxum")
+        nested_bag.save()
+        bagit.Bag(nested_bag.path).validate(completeness_only=True)
+    uuid, errors = validate_bag_at(nested_bag.path)
+    assert sorted(errors[0].split(": ", 1)[1].split("; ")) == sorted(
+        str(expected.value).split(": ", 1)[1].split("; ")
+    )
+
+
+def test_validate_bag_at_changed_file(nested_bag):
+    with open(os.path.join(nested_bag.path, "data", "folder1", "file1.txt"), "w") as f:
+        f.write("Changed file 1.")
+    uuid, errors = validate_bag_at(nested_bag.path, processes=2)
+    assert len(errors) == 1
+    assert errors[0].startswith("Bag validation failed:")
+    assert errors[0].count("validation failed: expected") == 2
+
+
 def test_transfer_unicode_normalisation_bag(unicode_bag, tmp_path):
     """Test that bags with files different by normalisation only
     are still valid"""
@@ -436,3 +579,333 @@ def test_transfer_unicode_normalisation_bag(unicode_bag, tmp_path):
     valid = bag.is_valid()
     dir_list = os.listdir(os.path.join(bag_path, "data"))
     assert (valid == True) and (len(dir_list) == 2)
+
+
+def test_stream_bag_is_valid(tmp_path):
+    source = tmp_path / "source"
+    (source / "sub").mkdir(parents=True)
+    (source / "file.txt").write_text("Text in file.")
+    (source / "sub" / "nested.txt").write_text("Nested text.")
+    output = tmp_path / "output"
+    metadata = {"External-Identifier": "RA-9999-99", UUID_ID: SET_UUID_1}
+    bag = stream_bag(str(source), str(output), metadata, ["md5", "sha256"])
+    assert bag.is_valid()
+    assert bag.info["Payload-Oxum"] == "25.2"
+    assert bag.info[UUID_ID] == SET_UUID_1
+    assert sorted(os.listdir(source)) == ["file.txt", "sub"]
+
+
+def test_stream_bag_matches_make_bag(tmp_path):
+    source = tmp_path / "source"
+    source.mkdir()
+    (source / "file.txt").write_text("Text in file.")
+    output = tmp_path / "output"
+    stream_bag(str(source), str(output), {}, ["sha256"])
+    bagit.make_bag(str(source), {}, checksums=["sha256"])
+    with open(output / "manifest-sha256.txt") as a, open(source / "manifest-sha256.txt") as b:
+        assert a.read() == b.read()
+
+
+def test_stream_bag_nested_matches_make_bag(nested_transfer_folder, tmp_path):
+    output = tmp_path / "output"
+    stream_bag(str(nested_transfer_folder), str(output), {}, ["sha256"])
+    bagit.make_bag(str(nested_transfer_folder), {}, checksums=["sha256"])
+    assert compute_manifest_hash(str(output)) == compute_manifest_hash(
+        str(nested_transfer_folder)
+    )
+
+
+def test_copy_and_hash_file(tmp_path):
+    source = tmp_path / "source.txt"
+    source.write_text("Text in file.")
+    destination = tmp_path / "destination.txt"
+    digests, byte_count = copy_and_hash_file(str(source), str(destination), ["md5"])
+    assert destination.read_text() == "Text in file."
+    assert byte_count == 13
+    assert digests == {"md5": hashlib.md5(b"Text in file.").hexdigest()}
+    assert os.stat(source).st_mtime == os.stat(destination).st_mtime
+
+
+@pytest.mark.parametrize(
+    "algorithms,size",
+    [
+        (["md5"], 1000),
+        (["md5"], 10000),
+        (["md5", "sha256", "sha512"], 10000),
+        (["sha256", "md5"], 4096 * 3),
+    ],
+)
+def test_hash_file_matches_hashlib(tmp_path, algorithms, size):
+    file = tmp_path / "file.bin"
+    data = os.urandom(size)
+    file.write_bytes(data)
+    # a small block size exercises the double-buffered path on multi-block files
+    digests = hash_file(str(file), algorithms, block_size=4096)
+    assert digests == {alg: hashlib.new(alg, data).hexdigest() for alg in algorithms}
+
+
+def test_hash_file_missing_file_raises(tmp_path):
+    with pytest.raises(OSError):
+        hash_file(str(tmp_path / "missing.bin"), ["md5"])
+
+
+def test_copy_tree_preserves_structure_and_times(tmp_path):
+    source = tmp_path / "source"
+    (source / "sub" / "empty").mkdir(parents=True)
+    (source / "file.txt").write_text("Text in file.")
+    (source / "sub" / "nested.txt").write_text("Nested text.")
+    os.utime(source / "file.txt", (1000000000, 1000000000))
+    output = tmp_path / "output"
+    output.mkdir()
+    result = copy_tree(str(source), str(output), workers=2)
+    assert result == (2, 25)
+    assert (output / "sub" / "nested.txt").read_text() == "Nested text."
+    assert os.path.isdir(output / "sub" / "empty")
+    assert os.stat(output / "file.txt").st_mtime == 1000000000
+
+
+def test_copy_file_fast_falls_back(tmp_path, monkeypatch):
+    def unsupported(*args, **kwargs):
+        raise OSError(18, "Invalid cross-device link")
+
+    monkeypatch.setattr(os, "copy_file_range", unsupported, raising=False)
+    monkeypatch.setattr(os, "sendfile", unsupported, raising=False)
+    source = tmp_path / "source.txt"
+    source.write_text("Text in file." * 1000)
+    destination = tmp_path / "destination.txt"
+    copied = copy_file_fast(str(source), str(destination))
+    assert copied == 13000
+    assert destination.read_text() == source.read_text()
+
+
+@pytest.mark.parametrize(
+    "input, working_os, expected",
+    [
+        (None, "Linux", "native"),
+        (None, "Windows", "system"),
+        ("System", "Linux", "system"),
+        ("nonsense", "Windows", "native"),
+    ],
+)
+def test_get_copy_engine(input, working_os, expected):
+    assert get_copy_engine(input, working_os) == expected
+
+
+def test_copy_journal_reloads_entries(tmp_path, existing_bag):
+    path = str(tmp_path / "journals" / "t1.journal")
+    journal = CopyJournal(path, SET_UUID_1)
+    source = os.path.join(existing_bag.path, "data", "file.txt")
+    journal.record(
+        os.path.join("data", "file.txt"), os.stat(source), {"md5": "abc"}, os.stat(source)
+    )
+    with open(path, "a") as f:
+        f.write('{"path": "incomplete')
+    reloaded = CopyJournal(path, SET_UUID_1)
+    assert reloaded.get(os.path.join("data", "file.txt"))["digests"] == {"md5": "abc"}
+    assert reloaded.is_verified(os.path.join("data", "file.txt"), os.stat(source), source)
+
+
+def test_copy_journal_rehashes_overwritten_copy(tmp_path):
+    source = tmp_path / "source.txt"
+    target = tmp_path / "target.txt"
+    source.write_text("Text in file.")
+    shutil.copy2(source, target)
+    journal = CopyJournal(str(tmp_path / "t1.journal"), SET_UUID_1)
+    journal.record("data/file.txt", os.stat(source), {"md5": "abc"}, os.stat(target))
+    assert journal.is_verified("data/file.txt", os.stat(source), str(target))
+    # same size, but rewritten since it was verified
+    target.write_text("Text in fil3.")
+    assert not journal.is_verified("data/file.txt", os.stat(source), str(target))
+    assert not journal.copy_unchanged("data/file.txt", str(target))
+
+
+def test_copy_journal_rejects_other_bag(tmp_path):
+    path = str(tmp_path / "t1.journal")
+    CopyJournal(path, SET_UUID_1)
+    with pytest.raises(ValueError):
+        CopyJournal(path, SET_UUID_2)
+
+
+def test_copy_tree_with_journal_skips_verified(existing_bag, tmp_path):
+    output = tmp_path / "output"
+    journal = CopyJournal(str(tmp_path / "t1.journal"), SET_UUID_1)
+    copy_tree(existing_bag.path, str(output), journal=journal)
+    assert journal.get(os.path.join("data", "file.txt")) is not None
+    files, byte_count = copy_tree(existing_bag.path, str(output), journal=journal)
+    # tag manifests aren't listed in a manifest so are always copied
+    tagmanifests = [f for f in os.listdir(existing_bag.path) if f.startswith("tagmanifest-")]
+    assert byte_count == sum(
+        os.path.getsize(os.path.join(existing_bag.path, f)) for f in tagmanifests
+    )
+    assert validate_copied_bag(str(output), journal).info[UUID_ID] == SET_UUID_1
+
+
+def test_validate_copied_bag_rehashes_unverified(existing_bag, tmp_path):
+    output = tmp_path / "output"
+    copy_tree(existing_bag.path, str(output))
+    with open(output / "data" / "file.txt", "w") as f:
+        f.write("Text in file!")
+    with pytest.raises(bagit.BagValidationError):
+        validate_copied_bag(str(output), CopyJournal(str(tmp_path / "j"), SET_UUID_1))
+
+
+@pytest.fixture
+def new_transfer_folder(tmp_path):
+    dir = tmp_path / "new_transfer"
+    (dir / "sub").mkdir(parents=True)
+    (dir / "file.txt").write_text("Text in file.")
+    (dir / "sub" / "nested.txt").write_text("Nested text.")
+    yield dir
+
+
+@pytest.fixture
+def nested_transfer_folder(tmp_path):
+    # sorted paths and bagit's os.walk order differ: z.txt is written before sub/
+    dir = tmp_path / "nested_transfer"
+    (dir / "sub" / "deeper").mkdir(parents=True)
+    (dir / "sub-folder").mkdir()
+    (dir / "z.txt").write_text("Top level text.")
+    (dir / "sub" / "a.txt").write_text("Nested text.")
+    (dir / "sub" / "z.txt").write_text("More nested text.")
+    (dir / "sub" / "deeper" / "b.txt").write_text("Deeper text.")
+    (dir / "sub-folder" / "c.txt").write_text("Sibling text.")
+    yield dir
+
+
+def test_make_bag_in_place_matches_make_bag(nested_transfer_folder, tmp_path):
+    copy = tmp_path / "copy"
+    shutil.copytree(nested_transfer_folder, copy)
+    bag, entries = make_bag_in_place(
+        str(nested_transfer_folder), {}, ["md5", "sha256"]
+    )
+    expected = bagit.make_bag(str(copy), {}, checksums=["md5", "sha256"])
+    assert bag.is_valid()
+    assert compute_manifest_hash(bag.path) == compute_manifest_hash(expected.path)
+    assert compute_manifest_hash(bag.path, "manifest-md5.txt") == compute_manifest_hash(
+        expected.path, "manifest-md5.txt"
+    )
+    assert bag.info["Payload-Oxum"] == expected.info["Payload-Oxum"]
+    assert entries["data/sub/a.txt"][1] == 12
+
+
+def test_new_transfer_check_bag_trusts_fresh_bag(new_transfer_folder):
+    transfer = NewTransfer()
+    bag = transfer.make_bag(str(new_transfer_folder), {})
+    assert transfer.check_bag(bag)
+
+
+def test_new_transfer_check_bag_catches_changed_size(new_transfer_folder):
+    transfer = NewTransfer()
+    bag = transfer.make_bag(str(new_transfer_folder), {})
+    with open(new_transfer_folder / "data" / "file.txt", "a") as f:
+        f.write("more")
+    assert not transfer.check_bag(bag)
+
+
+@pytest.mark.parametrize(
+    "input,expected",
+    [(None, "latest"), ("Aggregate", "aggregate"), ("full", "full"), ("never", "latest")],
+)
+def test_get_quarterly_validation_mode(input, expected):
+    assert get_quarterly_validation_mode(input) == expected
+
+
+@pytest.fixture
+def cached_file(tmp_path):
+    file = tmp_path / "file.txt"
+    with open(file, "w") as f:
+        f.write("Text in file.")
+    cache = HashCache(str(tmp_path / "cache.db"), timedelta(days=30))
+    yield (str(file), cache)
+    cache.close()
+
+
+def test_hash_file_cached_reuses_digests(cached_file):
+    file, cache = cached_file
+    digests = hash_file_cached(file, ["md5"], cache)
+    assert digests == hash_file(file, ["md5"])
+    # a digest only the cache knows proves the file wasn't read again
+    cache.store(os.stat(file), {"md5": "cached"})
+    assert hash_file_cached(file, ["md5"], cache) == {"md5": "cached"}
+    both = hash_file_cached(file, ["md5", "sha256"], cache)
+    assert both == {"md5": "cached", "sha256": hash_file(file, ["sha256"])["sha256"]}
+
+
+def test_hash_cache_misses_changed_file(cached_file):
+    file, cache = cached_file
+    cache.store(os.stat(file), {"md5": "cached"})
+    with open(file, "w") as f:
+        f.write("Text in fil3!")
+    os.utime(file, ns=(0, 12345))
+    assert cache.lookup(os.stat(file), ["md5"]) == {}
+
+
+def test_hash_cache_ignores_entries_outside_trust_window(cached_file, tmp_path):
+    file, cache = cached_file
+    cache.store(os.stat(file), {"md5": "cached"})
+    cache.flush()
+    untrusting = HashCache(str(tmp_path / "cache.db"), timedelta(seconds=-1))
+    assert untrusting.lookup(os.stat(file), ["md5"]) == {}
+    untrusting.close()
+
+
+def test_hash_cache_evicts_least_recently_used(tmp_path):
+    cache = HashCache(str(tmp_path / "cache.db"), timedelta(days=30), max_entries=2)
+    stats = []
+    for i in range(3):
+        file = tmp_path / f"file{i}.txt"
+        with open(file, "w") as f:
+            f.write(f"Text in file {i}.")
+        stats.append(os.stat(file))
+        cache.store(stats[-1], {"md5": f"digest{i}"})
+        cache.flush()
+    count = cache.con.execute("SELECT COUNT(*) FROM FileHashes").fetchone()[0]
+    assert count == 2
+    assert cache.lookup(stats[0], ["md5"]) == {}
+    assert cache.lookup(stats[2], ["md5"]) == {"md5": "digest2"}
+    cache.close()
+
+
+def test_get_hash_cache_from_config(tmp_path, monkeypatch):
+    monkeypatch.delenv("HASH_CACHE_DB", raising=False)
+    assert get_hash_cache() is None
+    monkeypatch.setenv("HASH_CACHE_DB", str(tmp_path / "cache.db"))
+    cache = get_hash_cache()
+    assert cache is get_hash_cache() and cache.trust_window == timedelta(days=30)
+
+
+def test_get_journal_mode():
+    assert get_journal_mode(None) == "WAL"
+    assert get_journal_mode("delete") == "DELETE"
+    assert get_journal_mode("fast") == "WAL"
+
+
+def test_hash_cache_uses_configured_journal_mode(tmp_path, monkeypatch):
+    monkeypatch.setenv("DB_JOURNAL_MODE", "DELETE")
+    cache = HashCache(str(tmp_path / "cache.db"), timedelta(days=30))
+    assert cache.con.execute("PRAGMA journal_mode").fetchone() == ("delete",)
+    cache.close()
+
+
+def test_zero_trust_days_disables_trust(tmp_path, monkeypatch):
+    file = tmp_path / "file.txt"
+    file.write_text("Text in file.")
+    monkeypatch.setenv("HASH_CACHE_DB", str(tmp_path / "untrusted.db"))
+    monkeypatch.setenv("HASH_CACHE_TRUST_DAYS", "0")
+    cache = get_hash_cache()
+    assert cache.trust_window == timedelta(0)
+    cache.store(os.stat(file), {"md5": "cached"})
+    assert cache.lookup(os.stat(file), ["md5"]) == {}
+    assert hash_file_cached(str(file), ["md5"], cache) == hash_file(str(file), ["md5"])
+
+
+def test_bag_transfer_make_bag_keeps_working_directory(tmp_path):
+    bag_dir = tmp_path / "bag"
+    bag_dir.mkdir()
+    (bag_dir / "file.txt").write_text("Text in file.")
+    bagit.make_bag(str(bag_dir), {"External-Identifier": "RA-9999-99"})
+    cwd = os.getcwd()
+    bag = BagTransfer().make_bag(str(bag_dir), {"Contact-Name": "Name"})
+    assert os.getcwd() == cwd
+    assert bag.info["Contact-Name"] == "Name"
+    assert bagit.Bag(str(bag_dir)).is_valid()
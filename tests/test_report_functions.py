@@ -0,0 +1,43 @@
+from src.report_functions import *
+import pytest
+import sqlite3
+
+
+@pytest.fixture
+def transfer_db(tmp_path):
+    dir = tmp_path / "test_bag"
+    dir.mkdir()
+    with open(dir / "file.txt", "w") as f:
+        f.write("Text in file.")
+    bag = bagit.make_bag(
+        dir,
+        {
+            "Source-Organization": "Home",
+            "Contact-Name": "Name",
+            "External-Identifier": "RA-9999-99",
+            "Internal-Sender-Identifier": "ce2c5343-0f5c-45e1-9cd1-5e10e748efef",
+        },
+    )
+    database = tmp_path / "transfer.db"
+    configure_transfer_db(database)
+    dates = ["2024-06-30 23:59:59", "2024-07-01 00:00:00", "2024-09-30 23:59:59", "2024-10-01 00:00:00"]
+    for i, date in enumerate(dates):
+        insert_transfer(
+            f"t{i}", bag, "RA-9999-99", f"hash{i}", datetime.now(), datetime.now(), database
+        )
+    db = sqlite3.connect(database)
+    db.executemany(
+        "UPDATE Transfers SET TransferDate=? WHERE OutcomeFolderTitle=?",
+        [(date, f"t{i}") for i, date in enumerate(dates)],
+    )
+    db.commit()
+    db.close()
+    yield database
+
+
+def test_transfer_report_between_includes_whole_end_day(transfer_db):
+    html = TransferReport().build_report_between(transfer_db, "2024-07-01", "2024-09-30")
+    assert "2024-07-01 00:00:00" in html
+    assert "2024-09-30 23:59:59" in html
+    assert "2024-06-30" not in html.split("<table")[1]
+    assert "2024-10-01" not in html.split("<table")[1]
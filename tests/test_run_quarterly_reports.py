@@ -0,0 +1,40 @@
+from run_quarterly_reports import *
+import pytest
+
+
+@pytest.fixture
+def mock_config(tmp_path):
+    config = {
+        "LOGGING_DIR": str(tmp_path / "logging"),
+        "DATABASE": str(tmp_path / "database" / "transfer.db"),
+        "VALIDATION_DB": str(tmp_path / "database" / "validation.db"),
+        "REPORT_DIR": str(tmp_path / "report"),
+        "ARCHIVE_DIR": str(tmp_path / "archive"),
+        "TRANSFER_DIR": str(tmp_path / "transfer"),
+        "QUARTERLY_VALIDATION": "aggregate",
+    }
+    for dir in ["logging", "database", "report", "archive", "transfer"]:
+        os.mkdir(tmp_path / dir)
+    return config
+
+
+def test_aggregate_report_ends_with_the_quarter(mock_config, monkeypatch):
+    validation_db = mock_config.get("VALIDATION_DB")
+    configure_validation_db(validation_db)
+    quarter_end = datetime.strptime(datetime.now().strftime("%Y-%m-01"), "%Y-%m-%d") - timedelta(days=1)
+    # one run on the last day of the quarter, and one after the quarter ended
+    for start, bag_uuid in [(quarter_end.replace(hour=12), "in-quarter"), (datetime.now(), "after-quarter")]:
+        with ValidationWriter(validation_db) as writer:
+            writer.start(start.strftime("%Y-%m-%d %H:%M:%S"))
+            writer.add_outcome(bag_uuid, True, None, f"bag/{bag_uuid}", "now", "later")
+            writer.end("later")
+
+    monkeypatch.setattr("run_quarterly_reports.load_config", lambda: mock_config)
+    with pytest.raises(SystemExit):
+        main()
+
+    report_dir = mock_config.get("REPORT_DIR")
+    [report_file] = [f for f in os.listdir(report_dir) if f.endswith("validation_report.html")]
+    with open(os.path.join(report_dir, report_file)) as f:
+        html = f.read()
+    assert "in-quarter" in html and "after-quarter" not in html
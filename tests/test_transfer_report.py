@@ -0,0 +1,42 @@
+from transfer_report import *
+import pytest
+import sqlite3
+
+
+@pytest.fixture
+def mock_config(tmp_path):
+    config = {
+        "LOGGING_DIR": str(tmp_path / "logging"),
+        "DATABASE": str(tmp_path / "database" / "database.db"),
+        "REPORT_DIR": str(tmp_path / "report"),
+    }
+    for dir in ["logging", "database", "report"]:
+        os.mkdir(tmp_path / dir)
+    return config
+
+
+def test_report_on_unmigrated_database(mock_config, monkeypatch):
+    # a database created before the numeric columns were added, at user_version 0
+    database = mock_config.get("DATABASE")
+    db = sqlite3.connect(database)
+    db.execute(
+        "CREATE TABLE Transfers(TransferID INTEGER PRIMARY KEY AUTOINCREMENT, CollectionIdentifier, BagUUID, TransferDate, BagDate, PayloadOxum, ManifestSHA256Hash, StartTime, EndTime, OriginalFolderTitle, OutcomeFolderTitle, ContactName, SourceOrganisation)"
+    )
+    db.execute(
+        "INSERT INTO Transfers(CollectionIdentifier, TransferDate, PayloadOxum, StartTime, EndTime, OutcomeFolderTitle) VALUES (?, ?, ?, ?, ?, ?)",
+        ("RA-9999-99", "2024-07-01 00:00:00", "2048.3", "2024-07-01 00:00:00", "2024-07-01 00:00:05", "RA-9999-99/t1"),
+    )
+    db.commit()
+    db.close()
+
+    monkeypatch.setattr("transfer_report.load_config", lambda: mock_config)
+    with pytest.raises(SystemExit):
+        main()
+
+    report_dir = mock_config.get("REPORT_DIR")
+    [report_file] = os.listdir(report_dir)
+    with open(os.path.join(report_dir, report_file)) as f:
+        html = f.read()
+    assert "2.000 KiB" in html
+    db = sqlite3.connect(database)
+    assert db.execute("PRAGMA user_version").fetchone()[0] == len(TRANSFER_DB_MIGRATIONS)
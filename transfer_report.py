@@ -25,6 +25,13 @@ def main():
     database_dir = os.path.dirname(transfer_db)
     runfile_check(database_dir)
 
+    # bring a database made by an earlier version up to date, the report reads newer columns
+    try:
+        configure_transfer_db(transfer_db)
+    except sqlite3.DatabaseError as e:
+        logger.error(f"Error configuring database: {e}")
+        runfile_cleanup(database_dir)
+
     report_builder = Report(TransferReport())
 
     html = report_builder.build_basic_report(transfer_db)
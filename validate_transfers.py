@@ -35,7 +35,14 @@ def main():
         runfile_cleanup(database_dir)
 
     # run validation process and get id for report
-    validation_action_id = run_validation(validation_db, transfer_db, archive_dir)
+    validation_action_id = run_validation(
+        validation_db,
+        transfer_db,
+        archive_dir,
+        get_fixity_max_age(config.get("FIXITY_MAX_AGE_DAYS")),
+        get_worker_count(config.get("VALIDATION_WORKERS")),
+        get_worker_count(config.get("VALIDATION_PROCESSES")),
+    )
 
     # build a basic report and output to html.
     report = Report(ValidationReport())